@@ -0,0 +1,95 @@
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import map_download
+from tile_server import LocalTileServer, FaultConfig
+
+# Small fixed area (central Barcelona) so tile counts are identical between runs
+BENCH_LOCATION = {
+    "name": "Bench_Area",
+    "min_lat": 41.37,
+    "max_lat": 41.41,
+    "min_lon": 2.14,
+    "max_lon": 2.19,
+}
+
+
+def run_benchmark(min_zoom, max_zoom, faults, work_dir):
+    """Runs map_download.main() against a local tile server and returns its job_done event."""
+    server = LocalTileServer(faults=faults).start_background()
+    try:
+        config_path = work_dir / "bench_job.json"
+        progress_path = work_dir / "progress.jsonl"
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"min_zoom": min_zoom, "max_zoom": max_zoom, "cities": [BENCH_LOCATION]}, f)
+        exit_code = map_download.main([
+            "--config", str(config_path), "--yes", "--delay", "0",
+            "--tile-url", server.url_template,
+            "--output-dir", str(work_dir / "tiles"),
+            "--progress-json", str(progress_path),
+        ])
+        with open(progress_path, "r", encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        server_counts = server.stats.to_dict()
+    finally:
+        server.stop()
+
+    job_done = next(event for event in reversed(events) if event["event"] == "job_done")
+    return {
+        "exit_code": exit_code,
+        "tiles": job_done["total"],
+        "failed": job_done["failed"],
+        "elapsed_sec": job_done["elapsed_sec"],
+        "tiles_per_sec": round(job_done["total"] / job_done["elapsed_sec"], 1) if job_done["elapsed_sec"] else None,
+        "http": job_done["http"],
+        "server": server_counts,
+        "faults": faults.to_dict(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark map_download.py against the local tile server.")
+    parser.add_argument("--min-zoom", type=int, default=13)
+    parser.add_argument("--max-zoom", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Append the result as one JSON line (for regression tracking)")
+    parser.add_argument("--quiet", action="store_true", help="Hide the downloader's per-tile log")
+    args = parser.parse_args(argv)
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                         args.retry_after, seed=args.seed)
+    # Retries must not sleep for real seconds unless the scenario asks for it
+    map_download.RETRY_BACKOFF = 0.0
+    with tempfile.TemporaryDirectory(prefix="tile_bench_") as tmp:
+        if args.quiet:
+            with open(Path(tmp) / "download.log", "w", encoding="utf-8") as log, \
+                    contextlib.redirect_stdout(log):
+                result = run_benchmark(args.min_zoom, args.max_zoom, faults, Path(tmp))
+        else:
+            result = run_benchmark(args.min_zoom, args.max_zoom, faults, Path(tmp))
+
+    http = result["http"]
+    print("\n--- Download Benchmark ---")
+    print(f"Tiles: {result['tiles']} ({result['failed']} failed) in {result['elapsed_sec']}s "
+          f"-> {result['tiles_per_sec']} tiles/s")
+    print(f"Latency: p50 {http['latency_p50_ms']} ms, p99 {http['latency_p99_ms']} ms")
+    print(f"Requests: {http['requests']}, retries: {http['retries']} "
+          f"(429: {http['rate_limited']}, 5xx: {http['server_errors']})")
+    print(f"Server outcomes: {result['server']}")
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0 if result["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Headless unless a display is asked for
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication, QTabWidget
+
+from car_control_tab import CarControlTab
+from telemetry_chart import CHART_FPS
+from telemetry_store import TelemetryStore
+from trip_computer import TripComputer
+from vehicle_alerts import EVAL_HZ, AlertBanner, AlertMonitor
+from vehicle_data import CanFrame, SimulatedVehicleSource, VehicleDataBus
+from vehicle_log import VehicleLogReader, log_info, write_log
+
+
+def build_tabs(bus, telemetry, trip_computer, alert_monitor):
+    """The tabs that react to vehicle data, wired as main.py wires them."""
+    tabs = QTabWidget()
+    tabs.addTab(CarControlTab(vehicle_data=bus, trip_computer=trip_computer, telemetry=telemetry), "Car Controls")
+    alert_banner = AlertBanner(tabs)
+    alert_monitor.alertRaised.connect(alert_banner.show_alert)
+    alert_monitor.alertCleared.connect(alert_banner.clear_alert)
+    return tabs
+
+
+def run_replay(log_path, speed, work_dir):
+    """
+    Replays a vehicle log through the bus, trip computer, alert rules and
+    tabs. Nothing runs on wall-clock timers: the bus worker is not started
+    and each periodic job (bus dispatch, trip computer, alert rules, chart
+    tick, paint) runs when the log clock passes its due time, so a log
+    always produces the same sequence of UI updates however fast the
+    machine is. speed 0 replays as fast as possible, otherwise log time is
+    paced to speed x real time.
+    """
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    reader = VehicleLogReader(log_path)
+    telemetry = TelemetryStore()
+    bus = VehicleDataBus(history=telemetry)
+    trip_computer = TripComputer(telemetry, state_path=Path(work_dir) / "trip_computer.json")
+    alert_monitor = AlertMonitor(telemetry, log_alerts=False)
+    alerts_raised = []
+    alert_monitor.alertRaised.connect(lambda alert: alerts_raised.append(alert.rule.name))
+    tabs = build_tabs(bus, telemetry, trip_computer, alert_monitor)
+    tabs.resize(800, 1000)
+    tabs.show()
+    car_tab = tabs.widget(0)
+    trip_computer.update_timer.stop()
+    trip_computer.snapshot_timer.stop()
+    alert_monitor.update_timer.stop()
+    car_tab.chart_panel.timer.stop()
+
+    jobs = [  # name, log-time interval, callable
+        ("dispatch", bus.dispatch_timer.interval() / 1000.0, bus.dispatch),
+        ("trip_computer", 1.0, trip_computer.update),
+        ("alerts", 1.0 / EVAL_HZ, alert_monitor.update),
+        ("charts", 1.0 / CHART_FPS, car_tab.chart_panel.tick),
+        ("paint", 1.0 / CHART_FPS, app.processEvents),
+    ]
+    durations = {name: [] for name, _, _ in jobs}
+    durations["feed"] = []
+    start_time = reader.start_time
+    due = [start_time + interval for _, interval, _ in jobs]
+    wall_start = time.perf_counter()
+
+    for times, ids, lengths, data in reader.blocks():
+        rows = data.tobytes()
+        frames = [CanFrame(t, can_id, rows[8 * i:8 * i + length])
+                  for i, (t, can_id, length) in enumerate(zip(times.tolist(), ids.tolist(), lengths.tolist()))]
+        position = 0
+        while position < len(frames):
+            next_due = min(due)
+            end = int(np.searchsorted(times, next_due, side="left"))
+            if end > position:
+                t0 = time.perf_counter()
+                bus.feed(frames[position:end])
+                durations["feed"].append(time.perf_counter() - t0)
+                position = end
+            if position == len(frames):
+                break  # The next block may still hold frames before next_due
+            if speed > 0:
+                delay = wall_start + (next_due - start_time) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            for index, (name, interval, job) in enumerate(jobs):
+                if due[index] <= next_due:
+                    t0 = time.perf_counter()
+                    job()
+                    durations[name].append(time.perf_counter() - t0)
+                    due[index] += interval
+    for name, _, job in jobs:  # Let every job see the end of the log
+        t0 = time.perf_counter()
+        job()
+        durations[name].append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - wall_start
+
+    log_seconds = reader.end_time - start_time
+    trip = trip_computer.trips["A"]
+    charts = car_tab.chart_panel.charts.values()
+    result = {
+        "log": str(log_path),
+        "frames": bus.frame_count,
+        "log_sec": round(log_seconds, 1),
+        "wall_sec": round(elapsed, 2),
+        "speedup": round(log_seconds / elapsed, 1),
+        "jobs": {name: {"calls": len(values), "total_ms": round(1000 * sum(values), 1),
+                        "p50_ms": round(1000 * float(np.percentile(values, 50)), 3),
+                        "p99_ms": round(1000 * float(np.percentile(values, 99)), 3),
+                        "max_ms": round(1000 * max(values), 3)}
+                 for name, values in durations.items() if values},
+        # Same log -> same numbers, so runs can be compared for behavior as well as speed
+        "final": {"trip_a_km": round(trip.distance_km, 4), "trip_a_fuel_l": round(trip.fuel_l, 4),
+                  "speed_label": car_tab.speed_value_label.text(),
+                  "range_label": car_tab.range_value_label.text(),
+                  "chart_redraws": [[chart.full_redraws, chart.partial_redraws] for chart in charts],
+                  "alerts_raised": len(alerts_raised), "alerts_active": sorted(alert_monitor.active)},
+    }
+    tabs.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a vehicle log headlessly through the vehicle data tabs.")
+    parser.add_argument("--log", type=Path, help="Vehicle log to replay (default: a simulated drive)")
+    parser.add_argument("--simulate-minutes", type=float, default=120.0, help="Length of the simulated drive")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed (1: real time, 0: as fast as possible)")
+    parser.add_argument("--output", type=Path, help="Append the result as one JSON line (for regression tracking)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="replay_bench_") as tmp:
+        log_path = args.log
+        if log_path is None:
+            log_path = Path(tmp) / "drive.vlog"
+            # Fixed start time so the simulated log, and with it the replay, is identical between runs
+            source = SimulatedVehicleSource(speed=0, duration_sec=60 * args.simulate_minutes, start_time=1.7e9)
+            write_log(log_path, source.frames(threading.Event()))
+        print(log_info(log_path))
+        result = run_replay(log_path, args.speed, tmp)
+
+    print("\n--- Replay Benchmark ---")
+    print(f"{result['frames']} frames, {result['log_sec'] / 60:.1f} min of driving replayed in "
+          f"{result['wall_sec']} s ({result['speedup']}x real time)")
+    for name, stats in result["jobs"].items():
+        print(f"  {name:>13}: {stats['calls']:7d} calls, {stats['total_ms']:9.1f} ms total, "
+              f"p50 {stats['p50_ms']:.3f} ms, p99 {stats['p99_ms']:.3f} ms, max {stats['max_ms']:.3f} ms")
+    print(f"Final state: {result['final']}")
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
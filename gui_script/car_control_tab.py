@@ -1,12 +1,26 @@
+import copy
 import sys
-import random  # Added for random data simulation
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QGridLayout, QPushButton, QSlider, QGroupBox, QRadioButton, QButtonGroup,
     QSizePolicy
 )
 from PyQt6.QtGui import QFont, QPalette, QColor
-from PyQt6.QtCore import Qt, QTimer  # Added QTimer
+from PyQt6.QtCore import Qt
+
+from telemetry_chart import TelemetryChartPanel
+
+# --- Seat Defaults (a driver without a stored profile starts from these) ---
+DEFAULT_SEAT_PRESETS = {
+    "Driver": {
+        1: {"fb": 2, "recline": 7, "height": 1},
+        2: {"fb": 8, "recline": 4, "height": 4}
+    },
+    "Front Passenger": {
+        1: {"fb": 3, "recline": 6, "height": 2},
+        2: {"fb": 7, "recline": 5, "height": 3}
+    }
+}
 
 
 class CarControlTab(QWidget):
@@ -15,7 +29,8 @@ class CarControlTab(QWidget):
     cruise information, performance modes, and seat position adjustments.
     """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, vehicle_data=None, trip_computer=None, telemetry=None, profile_store=None,
+                 seat_actuators=None):
         super().__init__(parent)
         self.setObjectName("CarControlTab")
 
@@ -70,15 +85,40 @@ class CarControlTab(QWidget):
         cruise_info_group.setLayout(cruise_info_main_layout)
         main_layout.addWidget(cruise_info_group)
 
-        self.cruise_data_timer = QTimer(self)
-        self.cruise_data_timer.timeout.connect(self.update_cruise_data)
-        self.cruise_data_timer.start(1500)
+        # --- Trip Computer Group ---
+        self.trip_computer = trip_computer
+        self.trip_value_labels = {}
+        if self.trip_computer:
+            trip_group = QGroupBox("Trips")
+            trip_group.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+            trip_layout = QGridLayout()
+            for row, (trip_name, title) in enumerate((("A", "Trip A"), ("B", "Trip B"), ("refuel", "Since Refuel"))):
+                trip_layout.addWidget(QLabel(title), row, 0)
+                value_label = QLabel("--")
+                self.trip_value_labels[trip_name] = value_label
+                trip_layout.addWidget(value_label, row, 1)
+                if trip_name != "refuel":
+                    reset_button = QPushButton("Reset")
+                    reset_button.clicked.connect(lambda checked, name=trip_name: self.trip_computer.reset_trip(name))
+                    trip_layout.addWidget(reset_button, row, 2)
+            trip_layout.setColumnStretch(1, 1)
+            trip_group.setLayout(trip_layout)
+            main_layout.addWidget(trip_group)
+            self.trip_computer.updated.connect(self.update_trip_display)
+
+        # --- History Charts ---
+        self.chart_panel = None
+        if telemetry is not None:
+            self.chart_panel = TelemetryChartPanel(telemetry)
+            self.chart_panel.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+            main_layout.addWidget(self.chart_panel, 1)
+
+        # Cruise values come from the vehicle data bus (coalesced to its display rate)
+        self.vehicle_data = vehicle_data
+        if self.vehicle_data:
+            self.vehicle_data.signalsUpdated.connect(self.update_cruise_data)
 
         self.current_speed = 0
-        self.base_avg_fuel_consumption = 7.5
-        self.base_estimated_range = 450
-        self.mode_avg_fuel_consumption = self.base_avg_fuel_consumption
-        self.mode_estimated_range = self.base_estimated_range
 
         # --- Performance Mode Group ---
         performance_group = QGroupBox("Performance Mode")
@@ -191,38 +231,50 @@ class CarControlTab(QWidget):
         main_layout.addWidget(self.seat_control_group)
         main_layout.addStretch(1)
 
-        self.seat_presets = {
-            "Driver": {
-                1: {"fb": 2, "recline": 7, "height": 1},
-                2: {"fb": 8, "recline": 4, "height": 4}
-            },
-            "Front Passenger": {
-                1: {"fb": 3, "recline": 6, "height": 2},
-                2: {"fb": 7, "recline": 5, "height": 3}
-            }
-        }
+        self.seat_presets = copy.deepcopy(DEFAULT_SEAT_PRESETS)
         self.active_preset_for_current_seat = None
-        self.last_interacted_preset_slot = {
-            "Driver": 1,
-            "Front Passenger": 1
-        }
+        self.last_interacted_preset_slot = {seat: 1 for seat in DEFAULT_SEAT_PRESETS}
+        # Presets and each seat's last position persist per driver
+        self.profile_store = profile_store
+        self.seat_positions = {}
+        if self.profile_store:
+            self.restore_seat_state(self.profile_store.get("seats"))
         self.update_preset_button_styles()
-        self.load_seat_preset(self.last_interacted_preset_slot[self.current_selected_seat])
-
-    def update_cruise_data(self):
-        speed_change = random.randint(-5, 5)
-        self.current_speed += speed_change
-        if self.current_speed < 0: self.current_speed = 0
-        if self.current_speed > 180: self.current_speed = 180
-        self.speed_value_label.setText(f"{self.current_speed} km/h")
-
-        current_display_fuel = self.mode_avg_fuel_consumption + random.uniform(-0.3, 0.3)
-        current_display_fuel = max(2.0, min(current_display_fuel, 20.0))
-        self.fuel_consumption_value_label.setText(f"{current_display_fuel:.1f} L/100km")
-
-        current_display_range = self.mode_estimated_range + random.randint(-10, 10)
-        current_display_range = max(0, current_display_range)
-        self.range_value_label.setText(f"{current_display_range} km")
+        # Sliders set where the seats should go; the actuator model moves them there and reports back
+        self.seat_actuators = seat_actuators
+        if self.seat_actuators:
+            self.command_seat_targets(jump=True)  # The seats are already where they were left
+            self.seat_actuators.positionsUpdated.connect(self.show_seat_motion)
+        self.show_seat_position(self.current_selected_seat)
+
+    def update_cruise_data(self, changed):
+        # Only the signals that changed since the last dispatch are present
+        if "speed_kmh" in changed:
+            speed = round(changed["speed_kmh"])
+            if speed != self.current_speed:
+                self.current_speed = speed
+                self.speed_value_label.setText(f"{speed} km/h")
+        if self.trip_computer:
+            return  # Average and range come from the trip computer instead of the ECU's own figures
+        if "avg_fuel_l100km" in changed and changed["avg_fuel_l100km"] > 0:
+            self.fuel_consumption_value_label.setText(f"{changed['avg_fuel_l100km']:.1f} L/100km")
+        if "range_km" in changed:
+            self.range_value_label.setText(f"{changed['range_km']} km")
+
+    def update_trip_display(self):
+        computer = self.trip_computer
+        for trip_name, label in self.trip_value_labels.items():
+            trip = computer.trips[trip_name]
+            consumption, avg_speed = trip.avg_consumption(), trip.avg_speed()
+            label.setText(f"{trip.distance_km:.1f} km   "
+                          f"{f'{consumption:.1f} L/100km' if consumption is not None else '-- L/100km'}   "
+                          f"{f'{avg_speed:.0f} km/h avg' if avg_speed is not None else ''}")
+        trip_a_consumption = computer.trips["A"].avg_consumption()
+        if trip_a_consumption is not None:
+            self.fuel_consumption_value_label.setText(f"{trip_a_consumption:.1f} L/100km")
+        range_km = computer.range_km()
+        if range_km is not None:
+            self.range_value_label.setText(f"{range_km:.0f} km")
 
     def handle_performance_mode_change(self, button):
         self.current_performance_mode = button.text()
@@ -231,17 +283,9 @@ class CarControlTab(QWidget):
         print(f"Performance Mode set to: {self.current_performance_mode}")
 
     def set_performance_mode_effects(self):
-        if self.current_performance_mode == "Eco":
-            self.mode_avg_fuel_consumption = self.base_avg_fuel_consumption * 0.8
-            self.mode_estimated_range = self.base_estimated_range * 1.2
-        elif self.current_performance_mode == "Sport":
-            self.mode_avg_fuel_consumption = self.base_avg_fuel_consumption * 1.3
-            self.mode_estimated_range = self.base_estimated_range * 0.7
-        else:  # Comfort
-            self.mode_avg_fuel_consumption = self.base_avg_fuel_consumption
-            self.mode_estimated_range = self.base_estimated_range
-        self.fuel_consumption_value_label.setText(f"{self.mode_avg_fuel_consumption:.1f} L/100km")
-        self.range_value_label.setText(f"{int(self.mode_estimated_range)} km")
+        # Range follows the consumption the trip computer has learned for this mode
+        if self.trip_computer:
+            self.trip_computer.set_mode(self.current_performance_mode)
 
     def update_performance_button_styles(self):
         default_style = "QPushButton { background-color: #4A4A4A; color: #FFF; border: 1px solid #555; } QPushButton:hover { background-color: #5A5A5A; } QPushButton:pressed { background-color: #3A3A3A; }"
@@ -266,9 +310,19 @@ class CarControlTab(QWidget):
         self.active_preset_for_current_seat = None
         if self.current_selected_seat not in self.last_interacted_preset_slot:
             self.last_interacted_preset_slot[self.current_selected_seat] = 1
-        self.load_seat_preset(self.last_interacted_preset_slot[self.current_selected_seat])
+        self.show_seat_position(self.current_selected_seat)
         self.update_preset_button_styles()
 
+    def show_seat_position(self, seat):
+        """Shows where the seat was last left, or its last used preset if it was never adjusted."""
+        position = self.seat_positions.get(seat)
+        if position:
+            self._set_seat_sliders(position)
+            self.active_preset_for_current_seat = None
+            self.update_preset_button_styles()
+        else:
+            self.load_seat_preset(self.last_interacted_preset_slot.get(seat, 1))
+
     def update_seat_selection_button_styles(self):
         default_style = "QPushButton { background-color: #4A4A4A; color: #FFF; border: 1px solid #555; } QPushButton:hover { background-color: #5A5A5A; } QPushButton:pressed { background-color: #3A3A3A; }"
         active_style = "QPushButton { background-color: #5DADE2; color: white; border: 1px solid #3498DB; font-weight: bold; } QPushButton:hover { background-color: #4A90E2; } QPushButton:pressed { background-color: #3071A9; }"
@@ -278,51 +332,50 @@ class CarControlTab(QWidget):
 
     def driver_seat_fb_changed(self, value):
         self.seat_fb_label.setText(str(value))
-        print(f"{self.current_selected_seat} Seat Forward/Backward: {value}")
-        self.active_preset_for_current_seat = None
-        self.update_preset_button_styles()
+        self.seat_target_changed()
 
     def driver_seat_recline_changed(self, value):
         self.seat_recline_label.setText(str(value))
-        print(f"{self.current_selected_seat} Seat Recline Angle: {value}")
-        self.active_preset_for_current_seat = None
-        self.update_preset_button_styles()
+        self.seat_target_changed()
 
     def driver_seat_height_changed(self, value):
         self.seat_height_label.setText(str(value))
-        print(f"{self.current_selected_seat} Seat Height: {value}")
-        self.active_preset_for_current_seat = None
-        self.update_preset_button_styles()
+        self.seat_target_changed()
+
+    def seat_target_changed(self):
+        # Runs for every value of a drag: no printing, and restyling only when a preset stops being active
+        if self.active_preset_for_current_seat is not None:
+            self.active_preset_for_current_seat = None
+            self.update_preset_button_styles()
+        self.remember_seat_position()
+
+    def command_seat_targets(self, jump=False):
+        """Sends every seat towards its last position, or its last used preset if it was never adjusted."""
+        for seat, presets in self.seat_presets.items():
+            position = self.seat_positions.get(seat) or presets.get(self.last_interacted_preset_slot.get(seat, 1))
+            if position:
+                self.seat_actuators.set_target(seat, position, jump=jump)
+
+    def show_seat_motion(self, moved):
+        """Shows the shown seat's motor positions while it travels to the slider values."""
+        position = moved.get(self.current_selected_seat)
+        if not position:
+            return
+        for axis, slider, label in (("fb", self.seat_fb_slider, self.seat_fb_label),
+                                    ("recline", self.seat_recline_slider, self.seat_recline_label),
+                                    ("height", self.seat_height_slider, self.seat_height_label)):
+            target = slider.value()
+            label.setText(str(target) if abs(position[axis] - target) < 0.05 else f"{position[axis]:.1f} → {target}")
 
     def load_seat_preset(self, preset_number):
         seat_specific_presets = self.seat_presets.get(self.current_selected_seat, {})
         preset = seat_specific_presets.get(preset_number)
         if preset:
-            slider_connections = [
-                (self.seat_fb_slider, self.driver_seat_fb_changed),
-                (self.seat_recline_slider, self.driver_seat_recline_changed),
-                (self.seat_height_slider, self.driver_seat_height_changed)
-            ]
-            for slider, handler in slider_connections:
-                try:
-                    slider.valueChanged.disconnect(handler)
-                except TypeError:
-                    pass
-
-            self.seat_fb_slider.setValue(preset["fb"])
-            self.seat_recline_slider.setValue(preset["recline"])
-            self.seat_height_slider.setValue(preset["height"])
-
-            self.seat_fb_label.setText(str(preset["fb"]))
-            self.seat_recline_label.setText(str(preset["recline"]))
-            self.seat_height_label.setText(str(preset["height"]))
-
-            for slider, handler in slider_connections:
-                slider.valueChanged.connect(handler)
-
+            self._set_seat_sliders(preset)
             self.active_preset_for_current_seat = preset_number
             self.last_interacted_preset_slot[self.current_selected_seat] = preset_number
             print(f"Loaded Preset {preset_number} for {self.current_selected_seat}")
+            self.remember_seat_position()
         else:
             print(f"Preset {preset_number} for {self.current_selected_seat} not found. Sliders unchanged.")
             self.active_preset_for_current_seat = None
@@ -343,6 +396,71 @@ class CarControlTab(QWidget):
         self.active_preset_for_current_seat = preset_to_save
         print(f"Saved current settings to Preset {preset_to_save} for {self.current_selected_seat}")
         self.update_preset_button_styles()
+        self.store_seat_state()
+
+    def _set_seat_sliders(self, position):
+        slider_connections = [
+            (self.seat_fb_slider, self.driver_seat_fb_changed),
+            (self.seat_recline_slider, self.driver_seat_recline_changed),
+            (self.seat_height_slider, self.driver_seat_height_changed)
+        ]
+        for slider, handler in slider_connections:
+            try:
+                slider.valueChanged.disconnect(handler)
+            except TypeError:
+                pass
+
+        self.seat_fb_slider.setValue(position["fb"])
+        self.seat_recline_slider.setValue(position["recline"])
+        self.seat_height_slider.setValue(position["height"])
+
+        self.seat_fb_label.setText(str(position["fb"]))
+        self.seat_recline_label.setText(str(position["recline"]))
+        self.seat_height_label.setText(str(position["height"]))
+
+        for slider, handler in slider_connections:
+            slider.valueChanged.connect(handler)
+
+    # --- Persistence ---
+
+    def remember_seat_position(self):
+        position = self.seat_positions[self.current_selected_seat] = {
+            "fb": self.seat_fb_slider.value(),
+            "recline": self.seat_recline_slider.value(),
+            "height": self.seat_height_slider.value()
+        }
+        if self.seat_actuators:
+            self.seat_actuators.set_target(self.current_selected_seat, position)  # Coalesced and rate limited there
+        self.store_seat_state()
+
+    def store_seat_state(self):
+        # Debounced by the store, so a slider drag is written once it settles
+        if not self.profile_store:
+            return
+        self.profile_store.set("seats", {
+            "presets": {seat: {str(number): preset for number, preset in presets.items()}
+                        for seat, presets in self.seat_presets.items()},
+            "last_preset": self.last_interacted_preset_slot,
+            "positions": self.seat_positions,
+        })
+
+    def restore_seat_state(self, state):
+        if not state:
+            return
+        for seat, presets in state.get("presets", {}).items():
+            self.seat_presets[seat] = {int(number): preset for number, preset in presets.items()}
+        self.last_interacted_preset_slot.update(state.get("last_preset", {}))
+        self.seat_positions.update(state.get("positions", {}))
+
+    def apply_driver_profile(self):
+        """Replaces all seat state with the current driver's and moves the shown seat to it."""
+        self.seat_presets = copy.deepcopy(DEFAULT_SEAT_PRESETS)
+        self.last_interacted_preset_slot = {seat: 1 for seat in DEFAULT_SEAT_PRESETS}
+        self.seat_positions = {}
+        self.restore_seat_state(self.profile_store.get("seats"))
+        if self.seat_actuators:
+            self.command_seat_targets()  # Both seats travel to the new driver's positions
+        self.show_seat_position(self.current_selected_seat)
 
     def update_preset_button_styles(self):
         default_style = "QPushButton { background-color: #4A4A4A; color: #FFF; border: 1px solid #555; } QPushButton:hover { background-color: #5A5A5A; } QPushButton:pressed { background-color: #3A3A3A; }"
@@ -396,10 +514,21 @@ if __name__ == '__main__':
         }
     """)
 
-    car_control_tab_widget = CarControlTab()
+    from vehicle_data import VehicleDataBus, source_from_spec
+    from telemetry_store import TelemetryStore
+    from trip_computer import TripComputer
+    import os
+    test_telemetry = TelemetryStore()
+    test_vehicle_data = VehicleDataBus(source_from_spec(os.environ.get("VEHICLE_SOURCE")), history=test_telemetry)
+    test_trip_computer = TripComputer(test_telemetry)
+    car_control_tab_widget = CarControlTab(vehicle_data=test_vehicle_data, trip_computer=test_trip_computer,
+                                           telemetry=test_telemetry)
+    test_vehicle_data.start()
+    app.aboutToQuit.connect(test_vehicle_data.stop)
+    app.aboutToQuit.connect(test_trip_computer.save)
     test_window = QMainWindow()
     test_window.setCentralWidget(car_control_tab_widget)
     test_window.setWindowTitle("Car Control Tab Test")
-    test_window.setGeometry(300, 300, 550, 600)
+    test_window.setGeometry(300, 300, 550, 850)
     test_window.show()
     sys.exit(app.exec())
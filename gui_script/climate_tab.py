@@ -24,7 +24,7 @@ class ClimateTab(QWidget):
     Manages the UI, state, and logic for the Climate Control Tab.
     """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profile_store=None):
         super().__init__(parent)
 
         # --- Climate-specific State Variables ---
@@ -60,6 +60,13 @@ class ClimateTab(QWidget):
         self._is_applying_profile = False
         self.profile_buttons = []  # Initialize before use
 
+        # Profiles and the last selected slot persist per driver
+        self.profile_store = profile_store
+        stored = self.profile_store.get("climate", {}) if self.profile_store else {}
+        if len(stored.get("profiles", [])) == len(self.climate_profiles):
+            self.climate_profiles = stored["profiles"]
+        initial_profile_index = stored.get("active_profile")
+
         # --- UI Setup ---
         main_layout = QHBoxLayout(self)
         main_layout.setSpacing(20)
@@ -247,7 +254,9 @@ class ClimateTab(QWidget):
         self.update_all_seat_button_styles()
 
         if self.profile_buttons:
-            self.profile_buttons[0].setChecked(True)
+            if initial_profile_index is None or not 0 <= initial_profile_index < len(self.profile_buttons):
+                initial_profile_index = 0
+            self.profile_buttons[initial_profile_index].setChecked(True)
 
     def _clear_active_profile_highlight(self):
         if self._is_applying_profile:
@@ -343,6 +352,7 @@ class ClimateTab(QWidget):
         self._is_applying_profile = False
         self.active_profile_index = profile_index
         self.update_profile_button_styles()
+        self.store_climate_profiles()
 
     def save_current_climate_profile(self):
         checked_button = self.profile_button_group.checkedButton()
@@ -368,6 +378,27 @@ class ClimateTab(QWidget):
 
         self.active_profile_index = profile_index
         self.update_profile_button_styles()
+        self.store_climate_profiles()
+
+    def apply_driver_profile(self):
+        """Loads the current driver's profiles and applies their last selected one."""
+        stored = self.profile_store.get("climate", {})
+        profiles = stored.get("profiles", [])
+        self.climate_profiles = profiles if len(profiles) == len(self.profile_buttons) else [None] * len(self.profile_buttons)
+        profile_index = stored.get("active_profile")
+        if profile_index is None or not 0 <= profile_index < len(self.climate_profiles):
+            profile_index = 0
+        # Checking the new slot's button would apply the profile a second time through the group
+        self.profile_button_group.blockSignals(True)
+        try:
+            self.apply_climate_profile(profile_index)
+        finally:
+            self.profile_button_group.blockSignals(False)
+
+    def store_climate_profiles(self):
+        if self.profile_store:
+            self.profile_store.set("climate", {"profiles": self.climate_profiles,
+                                               "active_profile": self.active_profile_index})
 
     def update_profile_button_styles(self):
         active_style = "QPushButton { background-color: #2ECC71; color: black; border: 1px solid #27AE60; font-weight: bold; }"
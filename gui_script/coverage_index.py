@@ -0,0 +1,149 @@
+import math
+from bisect import bisect_right
+
+# Leaflet layer that serves every downloaded city as one map. Expects
+# `tileSources` (CoverageIndex.leaflet_sources()) and `tileBaseUrl` to exist.
+MERGED_LAYER_JS = """
+                function tileSourceCity(coords) {
+                    var sources = tileSources[coords.z] || [];
+                    for (var i = 0; i < sources.length; i++) {
+                        var s = sources[i];
+                        if (coords.x >= s[0] && coords.x <= s[1] && coords.y >= s[2] && coords.y <= s[3]) return s[4];
+                    }
+                    return null;
+                }
+                var MergedTileLayer = L.TileLayer.extend({
+                    getTileUrl: function(coords) {
+                        var city = tileSourceCity(coords);
+                        if (!city) return L.Util.emptyImageUrl;
+                        return tileBaseUrl + '/' + encodeURIComponent(city) + '/' + coords.z + '/' + coords.x + '/' + coords.y + '.png';
+                    }
+                });
+"""
+
+
+def tile_nw_corner(x, y, zoom):
+    """Same as map_download.num2deg(): lat/lon of a tile's NW corner."""
+    n = 2.0 ** zoom
+    lon_deg = x / n * 360.0 - 180.0
+    lat_deg = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat_deg, lon_deg
+
+
+class CityCoverage:
+    """Zoom range and per-zoom x/y tile extents of one city folder."""
+
+    def __init__(self, name):
+        self.name = name
+        self.zooms = {}  # z -> (x_min, x_max, y_min, y_max, tile_count)
+
+    @property
+    def min_zoom(self):
+        return min(self.zooms) if self.zooms else None
+
+    @property
+    def max_zoom(self):
+        return max(self.zooms) if self.zooms else None
+
+    def contains_tile(self, z, x, y):
+        extent = self.zooms.get(z)
+        return extent is not None and extent[0] <= x <= extent[1] and extent[2] <= y <= extent[3]
+
+    def preference(self):
+        """Sort key: deeper zoom first, then more tiles."""
+        return (self.max_zoom or 0, sum(extent[4] for extent in self.zooms.values()))
+
+
+class CoverageIndex:
+    """
+    Which downloaded city tile set covers a coordinate, built once from the tile
+    store. Point lookup uses a slab decomposition of the per-zoom extents:
+    a bisect on longitude finds the slab, a bisect on latitude finds the cell,
+    and each cell stores its best city precomputed, so queries are O(log n).
+    """
+
+    def __init__(self, cities):
+        self.cities = {city.name: city for city in cities if city.zooms}
+        self._build_slabs()
+
+    # --- Construction ---
+
+    @classmethod
+    def from_storage(cls, storage):
+        """Builds from the TileStorageManager index, filling the index first if it is empty."""
+        if not storage.total_bytes():
+            storage.rebuild_index()
+        cities = {}
+        for city, z, x_min, x_max, y_min, y_max, count in storage.tile_extents():
+            cities.setdefault(city, CityCoverage(city)).zooms[z] = (x_min, x_max, y_min, y_max, count)
+        return cls(cities.values())
+
+    def _build_slabs(self):
+        rects = []  # (west, east, south, north, city, z)
+        for city in self.cities.values():
+            for z, (x_min, x_max, y_min, y_max, _) in city.zooms.items():
+                north, west = tile_nw_corner(x_min, y_min, z)
+                south, east = tile_nw_corner(x_max + 1, y_max + 1, z)
+                rects.append((west, east, south, north, city.name, z))
+
+        self._slab_lons = sorted({rect[0] for rect in rects} | {rect[1] for rect in rects})
+        self._slab_lats = []
+        self._slab_best = []
+        for left, right in zip(self._slab_lons, self._slab_lons[1:]):
+            active = [rect for rect in rects if rect[0] <= left and rect[1] >= right]
+            lats = sorted({rect[2] for rect in active} | {rect[3] for rect in active})
+            best = []
+            for bottom, top in zip(lats, lats[1:]):
+                zooms_by_city = {}
+                for _, _, south, north, name, z in active:
+                    if south <= bottom and north >= top:
+                        zooms_by_city.setdefault(name, []).append(z)
+                # Best coverage: most zoom levels at this spot, then the deepest zoom
+                best.append(max(zooms_by_city, key=lambda name: (len(zooms_by_city[name]),
+                                                                 max(zooms_by_city[name])))
+                            if zooms_by_city else None)
+            self._slab_lats.append(lats)
+            self._slab_best.append(best)
+
+    # --- Queries ---
+
+    def best_city(self, lat, lon):
+        """Name of the city tile set with the best coverage at lat/lon, or None."""
+        slab = bisect_right(self._slab_lons, lon) - 1
+        if slab < 0 or slab >= len(self._slab_best):
+            return None
+        lats = self._slab_lats[slab]
+        cell = bisect_right(lats, lat) - 1
+        if cell < 0 or cell >= len(self._slab_best[slab]):
+            return None
+        return self._slab_best[slab][cell]
+
+    def ranked_cities(self):
+        return sorted(self.cities.values(), key=CityCoverage.preference, reverse=True)
+
+    def city_for_tile(self, z, x, y, preferred=None):
+        """City folder holding z/x/y, trying the preferred city first."""
+        if preferred in self.cities and self.cities[preferred].contains_tile(z, x, y):
+            return preferred
+        for city in self.ranked_cities():
+            if city.contains_tile(z, x, y):
+                return city.name
+        return None
+
+    def zoom_range(self, city_name):
+        city = self.cities.get(city_name)
+        return (city.min_zoom, city.max_zoom) if city else (None, None)
+
+    def leaflet_sources(self, preferred=None):
+        """
+        Per-zoom extents for the merged tile layer, in lookup order:
+        {z: [[x_min, x_max, y_min, y_max, city], ...]}.
+        """
+        ordered = self.ranked_cities()
+        if preferred in self.cities:
+            ordered.sort(key=lambda city: city.name != preferred)
+        sources = {}
+        for city in ordered:
+            for z, (x_min, x_max, y_min, y_max, _) in city.zooms.items():
+                sources.setdefault(z, []).append([x_min, x_max, y_min, y_max, city.name])
+        return sources
@@ -0,0 +1,169 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+from tile_selection import estimate_location, format_bytes
+
+try:
+    import yaml  # Optional: only needed for .yaml/.yml job files
+except ImportError:
+    yaml = None
+
+SELECTION_KEYS = ("polygon", "corridor", "min_lat")
+MAX_ZOOM_LEVEL = 22  # Deepest zoom any tile server serves; the tile count quadruples per level
+
+
+class CityJob:
+    """One city (or area) to download, with its own zoom range and per-zoom tile plan."""
+
+    def __init__(self, location_info, min_zoom, max_zoom):
+        self.name = location_info["name"]
+        self.location_info = location_info
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.zoom_plans = []  # (zoom, TileCoverage, estimated_bytes), filled by plan()
+
+    def plan(self, avg_tile_bytes, base_dir=None):
+        self.zoom_plans = estimate_location(self.location_info, self.min_zoom, self.max_zoom,
+                                            avg_tile_bytes, base_dir=base_dir)
+        return self
+
+    @property
+    def total_tiles(self):
+        return sum(coverage.count() for _, coverage, _ in self.zoom_plans)
+
+    @property
+    def total_bytes(self):
+        return sum(estimated_bytes for _, _, estimated_bytes in self.zoom_plans)
+
+    def to_dict(self):
+        return {
+            "city": self.name,
+            "min_zoom": self.min_zoom,
+            "max_zoom": self.max_zoom,
+            "total_tiles": self.total_tiles,
+            "estimated_bytes": self.total_bytes,
+            "zooms": [{"zoom": z, "tiles": coverage.count(), "estimated_bytes": estimated_bytes}
+                      for z, coverage, estimated_bytes in self.zoom_plans],
+        }
+
+
+# --- Job Configuration ---
+
+def load_job_config(config_path):
+    """
+    Reads a job file (JSON, or YAML if PyYAML is installed). Expected layout:
+        {"min_zoom": 12, "max_zoom": 16, "request_delay": 0.5, "tile_url": "https://.../{z}/{x}/{y}.png",
+         "cities": [{"name": "Istanbul_Detailed", "min_lat": ..., "max_zoom": 15}, ...]}
+    Each city accepts the same keys as map_download.LOCATIONS plus optional
+    min_zoom/max_zoom overriding the file-wide values.
+    """
+    config_path = Path(config_path)
+    with open(config_path, "r", encoding="utf-8") as f:
+        if config_path.suffix.lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise ValueError(f"{config_path} is YAML but PyYAML is not installed.")
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    if not isinstance(config, dict) or not isinstance(config.get("cities"), list):
+        raise ValueError(f"{config_path} must contain a 'cities' list.")
+    return config
+
+
+def build_city_jobs(locations, default_min_zoom, default_max_zoom, only_cities=None):
+    """Validates location entries and returns CityJob objects (not yet planned)."""
+    jobs = []
+    for index, location_info in enumerate(locations):
+        name = location_info.get("name")
+        if not name:
+            raise ValueError(f"City entry #{index + 1} has no 'name'.")
+        if only_cities and name not in only_cities:
+            continue
+        if not any(key in location_info for key in SELECTION_KEYS):
+            raise ValueError(f"City '{name}' needs a bounding box, 'polygon' or 'corridor'.")
+        min_zoom = int(location_info.get("min_zoom", default_min_zoom))
+        max_zoom = int(location_info.get("max_zoom", default_max_zoom))
+        if not 0 <= min_zoom <= max_zoom <= MAX_ZOOM_LEVEL:
+            raise ValueError(f"City '{name}' has an invalid zoom range {min_zoom}-{max_zoom}.")
+        jobs.append(CityJob(location_info, min_zoom, max_zoom))
+    if only_cities:
+        unknown = set(only_cities) - {job.name for job in jobs}
+        if unknown:
+            raise ValueError(f"Unknown cities requested: {', '.join(sorted(unknown))}")
+    return jobs
+
+
+def print_plan(jobs, avg_tile_bytes):
+    """Human-readable dry-run table: exact tile counts and disk estimates per zoom."""
+    grand_tiles = 0
+    grand_bytes = 0
+    print(f"Average tile size used for estimates: {format_bytes(avg_tile_bytes)}")
+    for job in jobs:
+        print(f"\n{job.name} (zoom {job.min_zoom}-{job.max_zoom})")
+        for z, coverage, estimated_bytes in job.zoom_plans:
+            print(f"  z{z:<4} {coverage.count():>10} tiles  ~{format_bytes(estimated_bytes):>10}")
+        print(f"  {'total':<5} {job.total_tiles:>10} tiles  ~{format_bytes(job.total_bytes):>10}")
+        grand_tiles += job.total_tiles
+        grand_bytes += job.total_bytes
+    print(f"\nAll cities: {grand_tiles} tiles, ~{format_bytes(grand_bytes)}")
+
+
+# --- Machine-readable Progress ---
+
+class ProgressReporter:
+    """
+    Writes one JSON object per line so fleet tooling can follow long jobs.
+    Per-tile progress is throttled to one 'progress' event per interval.
+    A reporter without a stream does nothing.
+    """
+
+    def __init__(self, stream=None, interval=1.0):
+        self.stream = stream
+        self.interval = interval
+        self.total_tiles = 0
+        self.done_tiles = 0
+        self.failed_tiles = 0
+        self.started_at = time.monotonic()
+        self._last_progress_at = 0.0
+
+    def emit(self, event, **fields):
+        if self.stream is None:
+            return
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def job_started(self, jobs):
+        self.total_tiles = sum(job.total_tiles for job in jobs)
+        self.started_at = time.monotonic()
+        self.emit("job_start", cities=[job.to_dict() for job in jobs], total_tiles=self.total_tiles)
+
+    def tile_finished(self, city, zoom, success):
+        self.done_tiles += 1
+        if not success:
+            self.failed_tiles += 1
+        now = time.monotonic()
+        if now - self._last_progress_at >= self.interval or self.done_tiles == self.total_tiles:
+            self._last_progress_at = now
+            elapsed = now - self.started_at
+            rate = self.done_tiles / elapsed if elapsed > 0 else 0.0
+            remaining = self.total_tiles - self.done_tiles
+            self.emit("progress", city=city, zoom=zoom, done=self.done_tiles, failed=self.failed_tiles,
+                      total=self.total_tiles, tiles_per_sec=round(rate, 2),
+                      eta_sec=round(remaining / rate, 1) if rate > 0 else None)
+
+    def job_finished(self, http_stats=None):
+        self.emit("job_done", done=self.done_tiles, failed=self.failed_tiles, total=self.total_tiles,
+                  elapsed_sec=round(time.monotonic() - self.started_at, 2), http=http_stats)
+
+
+def open_progress_stream(target):
+    """'-' means stdout; anything else is a file path appended to."""
+    if target is None:
+        return None
+    if target == "-":
+        return sys.stdout
+    return open(target, "a", encoding="utf-8")
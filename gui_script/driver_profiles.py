@@ -0,0 +1,204 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QObject, QTimer, pyqtSignal
+
+# --- Constants ---
+SWITCH_HISTORY = 50  # Timings kept for the most recent switches
+LAYOUT_PASSES = 8  # A size change reaches the window one nested layout per posted event
+
+
+class DriverProfileManager(QObject):
+    """
+    Switches the whole cabin from one driver's profile to another's. Each
+    participating tab registers an apply callable that re-reads its sections
+    from the profile store with its own change handlers held off (the same
+    disconnect-and-set pattern the tabs use for presets), so nothing cascades
+    or writes back. All of them run in one pass with updates disabled on
+    every participating tab, so each tab repaints once with the new driver's
+    state instead of once per changed control (a hidden tab when it is next
+    shown).
+
+    Each switch is timed end to end: the apply pass, and the time until the
+    visible tab has finished painting the result.
+    """
+    driverChanged = pyqtSignal(str)
+
+    def __init__(self, profile_store, parent=None):
+        super().__init__(parent)
+        self.store = profile_store
+        self.participants = []  # (name, widget or None, apply callable)
+        self.switch_timings = deque(maxlen=SWITCH_HISTORY)
+        self.paint_counts = {}  # Participant name -> paint events since the last switch
+        self._pending_timing = None
+        self._watched_widget = None
+
+    def register(self, name, apply, widget=None):
+        """
+        Adds a participant; apply() is called after the store has switched
+        driver, with updates on widget (its tab) held until all have run.
+        """
+        self.participants.append((name, widget, apply))
+        if widget is not None:
+            widget.installEventFilter(self)
+
+    def switch_to(self, driver):
+        driver = driver.strip()
+        if not driver or driver == self.store.driver:
+            return False
+        started = time.perf_counter()
+        previous = self.store.driver
+        apply_ms = {}
+        # Per tab rather than on the window: re-enabling a top-level window repaints it twice
+        widgets = [widget for _, widget, _ in self.participants if widget is not None]
+        for widget in widgets:
+            widget.setUpdatesEnabled(False)
+        try:
+            self.store.set_driver(driver)
+            for name, _, apply in self.participants:
+                t0 = time.perf_counter()
+                try:
+                    apply()
+                except Exception as e:
+                    print(f"DriverProfiles: Could not apply '{name}' for {driver}: {e}")
+                apply_ms[name] = 1000 * (time.perf_counter() - t0)
+        finally:
+            # Relayout now for labels and styles that changed size, or that would trigger a second repaint
+            for _ in range(LAYOUT_PASSES):
+                QCoreApplication.sendPostedEvents(None, QEvent.Type.LayoutRequest.value)
+            for widget in widgets:
+                widget.setUpdatesEnabled(True)  # Schedules the tab's single repaint
+        applied = time.perf_counter()
+
+        timing = {"driver": driver, "from": previous, "apply_ms": 1000 * (applied - started),
+                  "participants_ms": apply_ms, "painted_ms": None}
+        self.switch_timings.append(timing)
+        self.paint_counts = {name: 0 for name, widget, _ in self.participants if widget is not None}
+        self._pending_timing = (timing, started)
+        self._watched_widget = self._visible_participant()
+        if self._watched_widget is None:
+            self._report(timing)
+            self._pending_timing = None
+        self.driverChanged.emit(driver)
+        return True
+
+    def _visible_participant(self):
+        for _, widget, _ in self.participants:
+            if widget is not None and widget.isVisible():
+                return widget
+        return None
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            for name, widget, _ in self.participants:
+                if widget is obj:
+                    self.paint_counts[name] = self.paint_counts.get(name, 0) + 1
+            if self._pending_timing and obj is self._watched_widget:
+                # Runs once this paint and the rest of its update pass are done
+                QTimer.singleShot(0, self._switch_painted)
+        return False
+
+    def _switch_painted(self):
+        if not self._pending_timing:
+            return
+        timing, started = self._pending_timing
+        self._pending_timing = None
+        timing["painted_ms"] = 1000 * (time.perf_counter() - started)
+        self._report(timing)
+
+    def _report(self, timing):
+        slowest = max(timing["participants_ms"].items(), key=lambda item: item[1], default=("-", 0.0))
+        painted = f"{timing['painted_ms']:.1f} ms" if timing["painted_ms"] is not None else "n/a"
+        print(f"DriverProfiles: Switched {timing['from']} -> {timing['driver']}: applied in "
+              f"{timing['apply_ms']:.1f} ms (slowest: {slowest[0]} {slowest[1]:.1f} ms), painted after {painted}")
+
+    def latency_summary(self):
+        """Median and worst apply and apply-to-painted times over the recent switches."""
+        applied = [t["apply_ms"] for t in self.switch_timings]
+        painted = [t["painted_ms"] for t in self.switch_timings if t["painted_ms"] is not None]
+        summary = {"switches": len(applied)}
+        for key, values in (("apply", applied), ("painted", painted)):
+            if values:
+                summary[f"{key}_p50_ms"] = round(statistics.median(values), 2)
+                summary[f"{key}_max_ms"] = round(max(values), 2)
+        return summary
+
+
+# --- Benchmark ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure driver profile switch latency on the seat and climate tabs.")
+    parser.add_argument("--switches", type=int, default=200, help="Number of switches between two drivers")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget
+    from car_control_tab import CarControlTab
+    from climate_tab import ClimateTab
+    from profile_store import ProfileStore
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    with tempfile.TemporaryDirectory(prefix="driver_profiles_") as tmp:
+        store = ProfileStore(profile_dir=tmp, driver="alice")
+        window = QMainWindow()  # Hosted as in main.py; repaint behavior differs for a bare top-level tab widget
+        tabs = QTabWidget()
+        window.setCentralWidget(tabs)
+        car_tab = CarControlTab(profile_store=store)
+        climate_tab = ClimateTab(profile_store=store)
+        tabs.addTab(car_tab, "Car Controls")
+        tabs.addTab(climate_tab, "Climate")
+        window.resize(800, 1000)
+        window.show()
+        app.processEvents()
+
+        # Give the two drivers different seats and climate settings
+        car_tab.seat_fb_slider.setValue(9)
+        car_tab.seat_height_slider.setValue(8)
+        climate_tab.temp_slider.setValue(26)
+        climate_tab.save_current_climate_profile()
+        manager = DriverProfileManager(store)
+        manager.register("seats", car_tab.apply_driver_profile, car_tab)
+        manager.register("climate", climate_tab.apply_driver_profile, climate_tab)
+        manager.switch_to("bob")
+        car_tab.seat_fb_slider.setValue(1)
+        climate_tab.temp_slider.setValue(18)
+        climate_tab.save_current_climate_profile()
+        store.flush()
+        app.processEvents()
+
+        writes_before = store.write_count
+        paints = {"seats": [], "climate": []}
+        for index in range(args.switches):
+            if index == args.switches // 2:
+                tabs.setCurrentIndex(1)  # Half the switches with the climate tab showing
+            manager.switch_to("alice" if index % 2 == 0 else "bob")
+            while manager._pending_timing:
+                app.processEvents()
+            app.processEvents()  # Any repaint still queued would be counted here
+            for name, count in manager.paint_counts.items():
+                paints[name].append(count)
+        store.flush()
+        expected = (9, 26) if args.switches % 2 else (1, 18)
+        state = (car_tab.seat_fb_slider.value(), climate_tab.temp_slider.value())
+        window.close()
+
+    summary = manager.latency_summary()
+    print("\n--- Driver Switch Benchmark ---")
+    print(f"{args.switches} switches, last {summary['switches']} timed")
+    print(f"  apply:   p50 {summary['apply_p50_ms']:.2f} ms, max {summary['apply_max_ms']:.2f} ms")
+    if "painted_p50_ms" in summary:
+        print(f"  painted: p50 {summary['painted_p50_ms']:.2f} ms, max {summary['painted_max_ms']:.2f} ms")
+    for name, counts in paints.items():
+        print(f"  {name} tab paints per switch: max {max(counts)}, total {sum(counts)}")
+    print(f"  profile writes caused by switching: {store.write_count - writes_before} (active driver only)")
+    print(f"  final state {state}, expected {expected}: {'ok' if state == expected else 'MISMATCH'}")
+    return 0 if state == expected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
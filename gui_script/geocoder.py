@@ -0,0 +1,383 @@
+import argparse
+import bz2
+import gzip
+import math
+import mmap
+import re
+import struct
+import sys
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+# --- Constants ---
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent.parent / "media" / "maps" / "geocoder.idx"
+INDEX_MAGIC = b"GEOIDX02"  # 02: apostrophes split words (d'Aragó -> d arago)
+HEADER = struct.Struct("<8sIIIII")  # magic, entries, tokens, postings, name bytes, token bytes
+INDEX_LAYOUT = (  # (name, typecode, length key) in file order
+    ("lat", "d", "entries"), ("lon", "d", "entries"), ("kind", "B", "entries"), ("word_count", "B", "entries"),
+    ("first_word", "I", "entries"), ("name_offsets", "I", "entries+1"), ("token_offsets", "I", "tokens+1"),
+    ("posting_offsets", "I", "tokens+1"), ("postings", "I", "postings"),
+    ("names", "B", "name_bytes"), ("tokens", "B", "token_bytes"),
+)
+KIND_STREET, KIND_POI, KIND_PLACE, KIND_SAVED = 0, 1, 2, 3
+KIND_LABELS = {KIND_STREET: "Street", KIND_POI: "Place", KIND_PLACE: "Area", KIND_SAVED: "Saved"}
+KIND_BOOST = {KIND_STREET: 1.0, KIND_POI: 1.5, KIND_PLACE: 2.5, KIND_SAVED: 4.0}
+POI_TAG_KEYS = ("amenity", "shop", "tourism", "leisure", "historic")
+PLACE_VALUES = ("city", "town", "village", "suburb", "quarter", "neighbourhood", "hamlet")
+STREET_MERGE_DEG = 0.01  # Same-named way pieces within this grid cell become one street
+
+# Letters that do not decompose into base letter + combining mark
+_FOLD_TABLE = str.maketrans({
+    "ı": "i", "İ": "i", "ß": "ss", "ø": "o", "Ø": "o", "æ": "ae", "Æ": "ae",
+    "œ": "oe", "Œ": "oe", "ł": "l", "Ł": "l", "đ": "d", "Đ": "d",
+    "·": "", "•": "", "'": " ", "’": " ",  # Catalan l·l; elided articles (d'Aragó) are words of their own
+})
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+_GEMINATE_L_RE = re.compile(r"l[.\-]l")  # Catalan l·l is often typed as l.l or l-l
+
+
+def normalize_text(text):
+    """Lower-case ASCII search form: 'Sant Ramon Nonat/Şişli Çarşı' -> 'sant ramon nonat sisli carsi'."""
+    folded = unicodedata.normalize("NFKD", text.translate(_FOLD_TABLE).casefold())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    folded = _GEMINATE_L_RE.sub("ll", folded)
+    return " ".join(_TOKEN_RE.findall(folded))
+
+
+# --- Building ---
+
+def _open_osm_xml(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_osm_places(path):
+    """
+    Streams an .osm(.gz/.bz2) extract and yields (name, kind, lat, lon) for
+    named streets, POIs and places. Streets are placed at their middle node
+    and same-named pieces close together are merged.
+    """
+    node_ids, node_lats, node_lons = array("q"), array("d"), array("d")
+    streets = {}
+    with _open_osm_xml(Path(path)) as stream:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        nodes_sorted = True
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+                if node_ids and node_id < node_ids[-1]:
+                    nodes_sorted = False
+                node_ids.append(node_id)
+                node_lats.append(lat)
+                node_lons.append(lon)
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                name = tags.get("name")
+                if name:
+                    if tags.get("place") in PLACE_VALUES:
+                        yield name, KIND_PLACE, lat, lon
+                    elif any(tags.get(key) for key in POI_TAG_KEYS):
+                        yield name, KIND_POI, lat, lon
+                root.clear()
+            elif elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                name = tags.get("name")
+                if name and tags.get("highway"):
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                    if refs:
+                        streets.setdefault(name, []).append(refs[len(refs) // 2])
+                root.clear()
+            elif elem.tag == "relation":
+                root.clear()
+
+    if not nodes_sorted:
+        order = sorted(range(len(node_ids)), key=node_ids.__getitem__)
+        node_ids = array("q", (node_ids[i] for i in order))
+        node_lats = array("d", (node_lats[i] for i in order))
+        node_lons = array("d", (node_lons[i] for i in order))
+    for name, middle_refs in streets.items():
+        cells = set()
+        for ref in middle_refs:
+            index = bisect_left(node_ids, ref)
+            if index == len(node_ids) or node_ids[index] != ref:
+                continue
+            lat, lon = node_lats[index], node_lons[index]
+            cell = (int(lat // STREET_MERGE_DEG), int(lon // STREET_MERGE_DEG))
+            if cell not in cells:
+                cells.add(cell)
+                yield name, KIND_STREET, lat, lon
+
+
+def write_index(path, places):
+    """
+    Writes a prefix-searchable index of (name, kind, lat, lon) places:
+    per-entry coordinates/kind/name, then every distinct normalized word in
+    sorted order with the ids of the entries containing it. Any prefix of a
+    word maps to one contiguous run of words, and so to one contiguous run
+    of postings.
+    """
+    lats, lons, kinds, word_counts = array("d"), array("d"), array("B"), array("B")
+    name_offsets, names = array("I", [0]), bytearray()
+    first_words = []
+    word_entries = {}
+    for entry_id, (name, kind, lat, lon) in enumerate(places):
+        words = normalize_text(name).split()
+        lats.append(lat)
+        lons.append(lon)
+        kinds.append(kind)
+        word_counts.append(min(len(words), 255))
+        first_words.append(words[0] if words else "")
+        names += name.encode("utf-8")
+        name_offsets.append(len(names))
+        for word in set(words):
+            word_entries.setdefault(word, []).append(entry_id)
+
+    token_offsets, token_blob = array("I", [0]), bytearray()
+    posting_offsets, postings = array("I", [0]), array("I")
+    token_ids = {}
+    for word in sorted(word_entries):
+        token_ids[word] = len(token_ids)
+        token_blob += word.encode("ascii")
+        token_offsets.append(len(token_blob))
+        postings.extend(word_entries[word])
+        posting_offsets.append(len(postings))
+    first_word_ids = array("I", (token_ids.get(word, 0xFFFFFFFF) for word in first_words))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, len(lats), len(token_offsets) - 1, len(postings), len(names), len(token_blob)))
+        for part in (lats, lons, kinds, word_counts, first_word_ids, name_offsets, token_offsets, posting_offsets,
+                     postings, names, token_blob):
+            f.write(b"\0" * (-f.tell() % 8))
+            f.write(part if isinstance(part, bytearray) else part.tobytes())
+    tmp_path.replace(path)
+    return len(lats), len(token_offsets) - 1
+
+
+class GeocodeResult:
+    def __init__(self, name, kind, lat, lon, score):
+        self.name = name
+        self.kind = kind
+        self.lat = lat
+        self.lon = lon
+        self.score = score
+
+    @property
+    def label(self):
+        return f"{self.name} ({KIND_LABELS.get(self.kind, '')})"
+
+
+class Geocoder:
+    """
+    Offline place search over a memory-mapped index file, plus a few runtime
+    entries (saved locations). Every query word is matched as a word prefix,
+    which selects one contiguous slice of postings; slices are intersected
+    and candidates scored with NumPy over zero-copy views of the mapping, and
+    only the top results' names are decoded.
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        self.index_path = Path(index_path) if index_path else None
+        self.extra_entries = []  # (name, kind, lat, lon, normalized words)
+        self.entry_count = self.token_count = 0
+        self._map = None
+        if self.index_path and self.index_path.exists():
+            self._open_index()
+
+    def _open_index(self):
+        self._file = open(self.index_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, entries, tokens, postings, name_bytes, token_bytes = HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC:
+            if magic[:6] == INDEX_MAGIC[:6]:
+                raise ValueError(f"{self.index_path} was built by an older version, rebuild it with --build")
+            raise ValueError(f"{self.index_path} is not a geocoder index")
+        self.entry_count, self.token_count = entries, tokens
+        lengths = {"entries": entries, "entries+1": entries + 1, "tokens+1": tokens + 1, "postings": postings,
+                   "name_bytes": name_bytes, "token_bytes": token_bytes}
+        dtypes = {"d": np.float64, "B": np.uint8, "I": np.uint32}
+        offset = HEADER.size
+        for name, typecode, length_key in INDEX_LAYOUT:
+            offset += -offset % 8
+            length = lengths[length_key]
+            setattr(self, name, np.frombuffer(self._map, dtype=dtypes[typecode], count=length, offset=offset))
+            offset += length * struct.calcsize(typecode)
+        self._kind_boost = np.array([KIND_BOOST[kind] for kind in sorted(KIND_BOOST)])
+
+    def set_extra_entries(self, places):
+        """Runtime places such as saved locations: iterable of (name, lat, lon)."""
+        self.extra_entries = [(name, KIND_SAVED, lat, lon, normalize_text(name).split()) for name, lat, lon in places]
+
+    # --- Lookup ---
+
+    def _token(self, index):
+        return self.tokens[self.token_offsets[index]:self.token_offsets[index + 1]].tobytes()
+
+    def _token_range(self, prefix):
+        """Index range [low, high) of indexed words starting with prefix."""
+        prefix = prefix.encode("ascii")
+        low, high = 0, self.token_count
+        while low < high:
+            mid = (low + high) // 2
+            if self._token(mid) < prefix:
+                low = mid + 1
+            else:
+                high = mid
+        start = low
+        high = self.token_count
+        upper = prefix + b"\xff"
+        while low < high:
+            mid = (low + high) // 2
+            if self._token(mid) < upper:
+                low = mid + 1
+            else:
+                high = mid
+        return start, low
+
+    def _entry_name(self, entry_id):
+        return self.names[self.name_offsets[entry_id]:self.name_offsets[entry_id + 1]].tobytes().decode("utf-8")
+
+    @staticmethod
+    def _near_bonus(lats, lons, near):
+        if near is None:
+            return 0.0
+        dlat = lats - near[0]
+        dlon = (lons - near[1]) * math.cos(math.radians(near[0]))
+        distance_km = np.hypot(dlat, dlon) * 111.2
+        return 1.5 / (1.0 + distance_km / 5.0)
+
+    def _search_index(self, query_words, limit, near):
+        ranges = [self._token_range(word) for word in query_words]
+        slices = [(int(self.posting_offsets[low]), int(self.posting_offsets[high])) for low, high in ranges]
+        if not all(stop > start for start, stop in slices):
+            return []
+        # Every word must match: AND together per-entry masks (linear, no sorting)
+        matched = None
+        for start, stop in slices:
+            mask = np.zeros(self.entry_count, dtype=bool)
+            mask[self.postings[start:stop]] = True
+            matched = mask if matched is None else (matched & mask)
+        candidates = np.flatnonzero(matched)
+        if not len(candidates):
+            return []
+
+        score = self._kind_boost[self.kind[candidates]] - 0.02 * self.word_count[candidates]
+        for word, (low, high) in zip(query_words, ranges):
+            if high > low and self._token(low) == word.encode("ascii"):
+                exact = np.zeros(self.entry_count, dtype=bool)
+                exact[self.postings[self.posting_offsets[low]:self.posting_offsets[low + 1]]] = True
+                score = score + exact[candidates]  # Whole-word match beats a prefix match
+        first_low, first_high = ranges[0]
+        first_word = self.first_word[candidates]
+        score = score + 0.5 * ((first_word >= first_low) & (first_word < first_high))  # Name starts with the query
+        score = score + self._near_bonus(self.lat[candidates], self.lon[candidates], near)
+
+        top = np.argpartition(-score, limit)[:limit] if len(score) > limit else np.arange(len(score))
+        top = top[np.argsort(-score[top], kind="stable")]
+        return [(float(score[i]), self._entry_name(int(candidates[i])), int(self.kind[candidates[i]]),
+                 float(self.lat[candidates[i]]), float(self.lon[candidates[i]])) for i in top]
+
+    def search(self, query, limit=10, near=None):
+        """Ranked GeocodeResults for a partially typed query; near is an optional (lat, lon) bias."""
+        query_words = normalize_text(query).split()
+        if not query_words:
+            return []
+        scored = []
+        for name, kind, lat, lon, words in self.extra_entries:
+            if all(any(word.startswith(q) for word in words) for q in query_words):
+                score = KIND_BOOST[kind] - 0.02 * len(words) + sum(q in words for q in query_words)
+                score += 0.5 * words[0].startswith(query_words[0])
+                score += float(self._near_bonus(np.array(lat), np.array(lon), near))
+                scored.append((score, name, kind, lat, lon))
+        if self._map is not None:
+            scored.extend(self._search_index(query_words, limit, near))
+        scored.sort(key=lambda item: -item[0])
+        return [GeocodeResult(name, kind, lat, lon, score) for score, name, kind, lat, lon in scored[:limit]]
+
+    def close(self):
+        if self._map is not None:
+            for name, _, _ in INDEX_LAYOUT:
+                setattr(self, name, None)  # Drop the NumPy views so the mapping can close
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+
+# --- Benchmark ---
+
+def synthetic_places(count, seed=1):
+    import random
+    rng = random.Random(seed)
+    first = ["Sant", "Carrer de", "Avinguda", "Plaça", "İstiklal", "Şehit", "Büyükdere", "Çırağan",
+             "Passeig de", "Rambla", "Gül", "Ortaköy", "Sagrada", "Lluís", "Ramon", "Kadıköy"]
+    second = ["Família", "Caddesi", "Sokağı", "Gràcia", "Nonat", "Companys", "Muhtar", "Bağdat",
+              "Catalunya", "Çiçek", "Paral·lel", "Meydanı", "Mallorca", "Joan", "Yıldız", "Pau"]
+    for i in range(count):
+        kind = rng.choice((KIND_STREET, KIND_STREET, KIND_POI, KIND_PLACE))
+        name = f"{rng.choice(first)} {rng.choice(second)} {i % 997}"
+        yield name, kind, 41.0 + rng.uniform(-0.5, 0.5), 2.17 + rng.uniform(-0.5, 0.5)
+
+
+def benchmark(count, index_path):
+    started = time.perf_counter()
+    entries, tokens = write_index(index_path, synthetic_places(count))
+    print(f"Indexed {entries} places / {tokens} words in {time.perf_counter() - started:.1f}s "
+          f"({index_path.stat().st_size / 1e6:.1f} MB)")
+    started = time.perf_counter()
+    geocoder = Geocoder(index_path)
+    print(f"Opened index in {(time.perf_counter() - started) * 1000.0:.2f} ms")
+    for query in ("sa", "sagr", "sagrada fam", "istik", "İstiklal Cad", "ciragan", "placa cat", "paral.lel 12",
+                  "kadikoy yildiz 40"):
+        timings = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            results = geocoder.search(query, near=(41.0, 2.17))
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        timings.sort()
+        top = results[0].name if results else "-"
+        print(f"{query!r:>22}: p50 {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms -> {top}")
+    geocoder.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the offline geocoder index.")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--build", type=Path, nargs="+", metavar="OSM", help="OSM extracts (.osm, .osm.gz, .osm.bz2)")
+    parser.add_argument("--search", help="Print results for a query")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="Time queries over COUNT synthetic places")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        import tempfile
+        with tempfile.TemporaryDirectory(prefix="geocoder_bench_") as tmp:
+            benchmark(args.benchmark, Path(tmp) / "bench.idx")
+        return 0
+    if args.build:
+        started = time.perf_counter()
+        entries, tokens = write_index(args.index, (place for path in args.build for place in iter_osm_places(path)))
+        print(f"Geocoder index: {entries} places, {tokens} words -> {args.index} "
+              f"in {time.perf_counter() - started:.1f}s")
+    if args.search:
+        geocoder = Geocoder(args.index)
+        for result in geocoder.search(args.search):
+            print(f"{result.score:5.2f}  {result.label}  {result.lat:.5f}, {result.lon:.5f}")
+        geocoder.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
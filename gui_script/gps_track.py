@@ -0,0 +1,445 @@
+import argparse
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+from poi_store import haversine_m
+
+# --- Constants ---
+DEFAULT_TRACK_DIR = Path(__file__).resolve().parent.parent / "media" / "maps" / "tracks"
+TRACK_MAGIC = b"GPSTRK02"
+UNCHECKED_MAGIC = b"GPSTRK01"  # Earlier tracks, without record check bytes; still readable
+HEADER = struct.Struct("<8sI")  # magic, coordinate scale (units per degree)
+COORD_SCALE = 1000000  # 1e-6 deg, about 0.1 m
+KEYFRAME_EVERY = 300   # Absolute record every N fixes, so a damaged stretch only loses up to the next one
+FSYNC_INTERVAL_SEC = 5.0
+KNOTS_TO_MPS = 0.514444
+
+# time: seconds since the epoch; speed: m/s; heading: degrees clockwise from north
+Fix = namedtuple("Fix", "time lat lon speed heading")
+
+
+# --- Sources ---
+
+def _nmea_checksum_ok(line):
+    body, _, checksum = line[1:].partition("*")
+    if not checksum:
+        return True  # Checksum is optional in NMEA 0183
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    try:
+        return value == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_degrees(value, hemisphere):
+    degrees_len = value.index(".") - 2
+    degrees = float(value[:degrees_len]) + float(value[degrees_len:]) / 60.0
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+
+def parse_rmc(line):
+    """Fix from a $..RMC sentence, or None for other sentences, void fixes and bad checksums."""
+    line = line.strip()
+    if not line.startswith("$") or line[3:6] != "RMC" or not _nmea_checksum_ok(line):
+        return None
+    fields = line.split("*")[0].split(",")
+    if len(fields) < 10 or fields[2] != "A" or not fields[1] or not fields[9]:
+        return None
+    try:
+        hhmmss, ddmmyy = fields[1], fields[9]
+        year = int(ddmmyy[4:6])
+        stamp = datetime(year + (2000 if year < 80 else 1900), int(ddmmyy[2:4]), int(ddmmyy[0:2]),
+                         int(hhmmss[0:2]), int(hhmmss[2:4]), int(hhmmss[4:6]), tzinfo=timezone.utc)
+        seconds = stamp.timestamp() + (float(hhmmss[6:]) if len(hhmmss) > 6 else 0.0)
+        lat = _nmea_degrees(fields[3], fields[4])
+        lon = _nmea_degrees(fields[5], fields[6])
+        speed = float(fields[7] or 0.0) * KNOTS_TO_MPS
+        heading = float(fields[8] or 0.0)
+    except ValueError:
+        return None
+    return Fix(seconds, lat, lon, speed, heading)
+
+
+class NmeaFileSource:
+    """Fixes from the RMC sentences of an NMEA log, e.g. captured from a USB GPS."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def fixes(self):
+        with open(self.path, "r", encoding="ascii", errors="replace") as f:
+            for line in f:
+                fix = parse_rmc(line)
+                if fix:
+                    yield fix
+
+
+class SimulatedSource:
+    """
+    A plausible drive from a start point: speed wanders between stops and
+    cruising, heading drifts with occasional turns. Deterministic per seed.
+    """
+
+    def __init__(self, lat, lon, duration_sec=3600, rate_hz=1.0, seed=1, start_time=None):
+        self.lat = lat
+        self.lon = lon
+        self.duration_sec = duration_sec
+        self.rate_hz = rate_hz
+        self.seed = seed
+        self.start_time = time.time() if start_time is None else start_time
+
+    def fixes(self):
+        import random
+        rng = random.Random(self.seed)
+        lat, lon, speed, heading = self.lat, self.lon, 0.0, rng.uniform(0, 360)
+        target_speed, turn_rate = 13.0, 0.0
+        dt = 1.0 / self.rate_hz
+        for i in range(int(self.duration_sec * self.rate_hz)):
+            if rng.random() < 0.01 * dt:
+                target_speed = rng.choice((0.0, 8.0, 13.0, 17.0, 25.0))
+            if rng.random() < 0.02 * dt:
+                turn_rate = rng.choice((-30.0, 30.0, -90.0, 90.0)) / 5.0  # A turn spread over ~5 s
+            elif rng.random() < 0.2 * dt:
+                turn_rate = rng.gauss(0.0, 1.0)
+            speed += max(-3.0 * dt, min(2.0 * dt, target_speed - speed))
+            heading = (heading + turn_rate * dt * min(1.0, speed / 5.0)) % 360.0
+            step = speed * dt
+            lat += step * math.cos(math.radians(heading)) / 111320.0
+            lon += step * math.sin(math.radians(heading)) / (111320.0 * math.cos(math.radians(lat)))
+            yield Fix(self.start_time + i * dt, lat, lon, speed, heading)
+
+
+class TrackFileSource:
+    """Fixes from a recorded track, for replay."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def fixes(self):
+        return read_track(self.path)
+
+
+# --- Storage ---
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _check_byte(record):
+    return zlib.crc32(record) % 255 + 1  # Never 0, so zero-filled space cannot complete a record
+
+
+def _quantize_fix(fix):
+    return (int(round(fix.time * 1000)), int(round(fix.lat * COORD_SCALE)), int(round(fix.lon * COORD_SCALE)),
+            int(round(fix.speed * 100)), int(round(fix.heading * 100)) % 36000)
+
+
+class TrackWriter:
+    """
+    Append-only track file. Each record is five varints: time in ms (shifted
+    left, low bit set for keyframes), then lat/lon in 1e-6 deg, speed in cm/s
+    and heading in 0.01 deg, zigzag encoded, and a non-zero check byte from
+    the record's CRC-32, so a torn record followed by zero-filled space is
+    never mistaken for a fix. Keyframes hold absolute values, other records
+    deltas from the previous fix, so a 1 Hz fix takes about 8 bytes. Data is
+    flushed and fsynced every fsync_interval seconds, so a power cut loses at
+    most that much of the drive.
+    """
+
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL_SEC, keyframe_every=KEYFRAME_EVERY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.keyframe_every = keyframe_every
+        if self.path.exists() and self.path.stat().st_size >= HEADER.size:
+            data = self.path.read_bytes()
+            if data[:8] != TRACK_MAGIC:
+                raise ValueError(f"{self.path} is not a current track file, not appending to it")
+            valid_end = _valid_length(data)
+            self.file = open(self.path, "r+b")
+            self.file.truncate(valid_end)  # Drop a record torn by a crash before appending after it
+            self.file.seek(valid_end)
+        else:
+            self.file = open(self.path, "wb")
+            self.file.write(HEADER.pack(TRACK_MAGIC, COORD_SCALE))
+        self.buffer = bytearray()
+        self.previous = None  # First record after opening is always a keyframe
+        self.since_keyframe = 0
+        self.count = 0
+        self.last_sync = time.monotonic()
+
+    def append(self, fix):
+        values = _quantize_fix(fix)
+        previous = self.previous
+        if previous is not None and values[0] == previous[0]:
+            return  # Same timestamp as the last fix; a zero time delta also marks a zero-filled tail
+        keyframe = previous is None or values[0] < previous[0] or self.since_keyframe >= self.keyframe_every
+        start = len(self.buffer)
+        if keyframe:
+            _put_varint(self.buffer, (values[0] << 1) | 1)
+            for value in values[1:]:
+                _put_varint(self.buffer, _zigzag(value))
+            self.since_keyframe = 0
+        else:
+            _put_varint(self.buffer, (values[0] - previous[0]) << 1)
+            _put_varint(self.buffer, _zigzag(values[1] - previous[1]))
+            _put_varint(self.buffer, _zigzag(values[2] - previous[2]))
+            _put_varint(self.buffer, _zigzag(values[3] - previous[3]))
+            _put_varint(self.buffer, _zigzag((values[4] - previous[4] + 18000) % 36000 - 18000))
+            self.since_keyframe += 1
+        self.buffer.append(_check_byte(self.buffer[start:]))
+        self.previous = values
+        self.count += 1
+        if time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
+
+
+def _decode_records(data):
+    """Yields (end offset, quantized values) per complete record after the header."""
+    if len(data) < HEADER.size or data[:8] not in (TRACK_MAGIC, UNCHECKED_MAGIC):
+        raise ValueError("not a track file")
+    checked = data[:8] == TRACK_MAGIC
+    pos, end = HEADER.size, len(data)
+    previous = None
+    while pos < end:
+        start = pos
+        fields = []
+        while len(fields) < 5:
+            value, shift = 0, 0
+            while True:
+                if pos >= end:
+                    return  # Torn last record
+                byte = data[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            if byte == 0 and shift > 7:
+                return  # Never written (varints end on a non-zero byte): a torn varint ended by zero fill
+            fields.append(value)
+        if checked:
+            if pos >= end or data[pos] != _check_byte(data[start:pos]):
+                return  # Torn or zero-filled record
+            pos += 1
+        head = fields[0]
+        rest = [(value >> 1) ^ -(value & 1) for value in fields[1:]]
+        if head & 1:
+            values = [head >> 1] + rest
+        elif previous is None or head == 0:
+            return  # Delta without a keyframe, or zero-filled space after a crash
+        else:
+            values = [previous[0] + (head >> 1), previous[1] + rest[0], previous[2] + rest[1],
+                      previous[3] + rest[2], (previous[4] + rest[3]) % 36000]
+        previous = values
+        yield pos, values
+
+
+def _valid_length(data):
+    length = HEADER.size
+    for length, _ in _decode_records(data):
+        pass
+    return length
+
+
+def read_track(path):
+    """All fixes of a track file; a torn or zero-filled tail is ignored."""
+    data = Path(path).read_bytes()
+    scale = HEADER.unpack_from(data)[1] if len(data) >= HEADER.size else COORD_SCALE
+    return [Fix(t / 1000.0, lat / scale, lon / scale, speed / 100.0, heading / 100.0)
+            for _, (t, lat, lon, speed, heading) in _decode_records(data)]
+
+
+def new_track_path(track_dir=DEFAULT_TRACK_DIR):
+    return Path(track_dir) / f"track_{datetime.now().strftime('%Y%m%d_%H%M%S')}.gtrk"
+
+
+def latest_track_path(track_dir=DEFAULT_TRACK_DIR):
+    tracks = sorted(Path(track_dir).glob("track_*.gtrk"))
+    return tracks[-1] if tracks else None
+
+
+# --- Display ---
+
+class TrackDownsampler:
+    """
+    Keeps the fixes worth drawing: one every min_distance_m, plus any where
+    the heading turned by more than max_turn_deg since the last kept fix.
+    Zoom-dependent simplification is left to the polyline levels.
+    """
+
+    def __init__(self, min_distance_m=10.0, max_turn_deg=20.0):
+        self.min_distance_m = min_distance_m
+        self.max_turn_deg = max_turn_deg
+        self.lats = []
+        self.lons = []
+        self.last_fix = None
+        self.kept_heading = None
+
+    def add(self, fix):
+        """Returns True if the fix was kept."""
+        self.last_fix = fix
+        if self.lats:
+            distance = haversine_m(self.lats[-1], self.lons[-1], fix.lat, fix.lon)
+            turn = abs((fix.heading - self.kept_heading + 180.0) % 360.0 - 180.0)
+            if distance < self.min_distance_m and not (turn > self.max_turn_deg and distance > 1.0):
+                return False
+        self.lats.append(fix.lat)
+        self.lons.append(fix.lon)
+        self.kept_heading = fix.heading
+        return True
+
+    def clear(self):
+        self.lats, self.lons = [], []
+        self.last_fix = None
+        self.kept_heading = None
+
+
+# --- Feed ---
+
+class PacedFeed:
+    """
+    Plays a source's fixes into callback(fix) on a background thread, spaced
+    by their timestamps divided by speed (speed 0: as fast as possible).
+    on_finished() is called when the source runs out or stop() is called.
+    """
+
+    def __init__(self, source, callback, speed=1.0, on_finished=None):
+        self.source = source
+        self.callback = callback
+        self.speed = speed
+        self.on_finished = on_finished
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="PacedFeed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        started = None
+        try:
+            for fix in self.source.fixes():
+                if self._stop.is_set():
+                    break
+                if self.speed > 0:
+                    if started is None:
+                        started = (time.monotonic(), fix.time)
+                    delay = started[0] + (fix.time - started[1]) / self.speed - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                self.callback(fix)
+        except (OSError, ValueError) as e:
+            print(f"PacedFeed: Source failed: {e}")
+        finally:
+            if self.on_finished:
+                self.on_finished()
+
+
+# --- Command Line ---
+
+def track_info(path):
+    fixes = read_track(path)
+    size = Path(path).stat().st_size
+    if not fixes:
+        return f"{path}: empty ({size} bytes)"
+    distance = sum(haversine_m(a.lat, a.lon, b.lat, b.lon) for a, b in zip(fixes, fixes[1:]))
+    duration = fixes[-1].time - fixes[0].time
+    return (f"{path}: {len(fixes)} fixes, {duration / 60:.1f} min, {distance / 1000:.2f} km, "
+            f"{size} bytes ({(size - HEADER.size) / len(fixes):.1f} bytes/fix)")
+
+
+def benchmark(path, seconds):
+    fixes = list(SimulatedSource(41.0086, 28.9800, duration_sec=seconds, start_time=1.7e9).fixes())
+    if path.exists():
+        path.unlink()
+    t0 = time.perf_counter()
+    writer = TrackWriter(path, fsync_interval=FSYNC_INTERVAL_SEC)
+    for fix in fixes:
+        writer.append(fix)
+    writer.close()
+    t1 = time.perf_counter()
+    restored = read_track(path)
+    t2 = time.perf_counter()
+    downsampler = TrackDownsampler()
+    kept = sum(downsampler.add(fix) for fix in restored)
+    t3 = time.perf_counter()
+    error = max(max(abs(a.lat - b.lat), abs(a.lon - b.lon)) for a, b in zip(fixes, restored))
+    print(f"{len(fixes)} fixes: write {1000 * (t1 - t0):.0f} ms, read {1000 * (t2 - t1):.0f} ms, "
+          f"downsample {1000 * (t3 - t2):.0f} ms ({kept} kept for display)")
+    print(f"{path.stat().st_size} bytes ({(path.stat().st_size - HEADER.size) / len(fixes):.1f} bytes/fix, "
+          f"raw doubles: 40 bytes/fix), max coordinate error {error:.2e} deg")
+    path.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record, import and inspect GPS tracks.")
+    parser.add_argument("--import-nmea", type=Path, help="NMEA log to convert into a track file")
+    parser.add_argument("--simulate", type=int, metavar="SECONDS", help="Write a simulated drive of this length")
+    parser.add_argument("--start", type=float, nargs=2, metavar=("LAT", "LON"), default=(41.0086, 28.9800))
+    parser.add_argument("--out", type=Path, help="Output track file (default: a new file in the track folder)")
+    parser.add_argument("--info", type=Path, help="Print a summary of a track file")
+    parser.add_argument("--benchmark", type=int, metavar="SECONDS", help="Write/read a simulated drive of this length")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(Path(f"gps_track_bench_{os.getpid()}.gtrk"), args.benchmark)
+        return 0
+    if args.info:
+        print(track_info(args.info))
+        return 0
+    if args.import_nmea or args.simulate:
+        source = NmeaFileSource(args.import_nmea) if args.import_nmea else \
+            SimulatedSource(args.start[0], args.start[1], duration_sec=args.simulate)
+        out = args.out or new_track_path()
+        writer = TrackWriter(out)
+        for fix in source.fixes():
+            writer.append(fix)
+        writer.close()
+        print(track_info(out))
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
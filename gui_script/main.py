@@ -1,4 +1,5 @@
 import sys
+import os
 import random
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -17,6 +18,13 @@ from phone_tab import PhoneTab
 from climate_tab import ClimateTab
 from maps_tab import MapsTab
 from settings_tab import create_settings_tab
+from vehicle_data import VehicleDataBus, source_from_spec
+from telemetry_store import TelemetryStore
+from trip_computer import TripComputer
+from profile_store import ProfileStore
+from driver_profiles import DriverProfileManager
+from seat_actuators import SeatActuatorModel, SeatCommandLog
+from vehicle_alerts import AlertBanner, AlertMonitor, load_rules
 
 
 # from maps_tab_ui import MapsTab # Commented out Maps Tab
@@ -171,6 +179,12 @@ class InfotainmentSystem(QMainWindow):
         self.setGeometry(100, 100, 800, 480)
         self.current_theme_name = "Dark"
 
+        # Per-driver settings (seats, climate profiles, media paths, theme), saved debounced
+        self.profile_store = ProfileStore(parent=self)
+        saved_theme = self.profile_store.get("theme", "Dark")
+        if saved_theme != self.current_theme_name:
+            self.apply_theme(saved_theme)
+
         # Central widget is now directly the QTabWidget container
         self.central_tab_widget_container = QWidget()
         self.setCentralWidget(self.central_tab_widget_container)
@@ -181,25 +195,75 @@ class InfotainmentSystem(QMainWindow):
         self.tabs.setObjectName("MainAppTabs")
         main_layout.addWidget(self.tabs)
 
+        # Vehicle signals (VEHICLE_SOURCE: sim, canlog:<file>[@speed], vlog:<file>[@speed], udp://host:port, unix:///path)
+        self.telemetry = TelemetryStore()  # Per-signal history rings, filled by the bus worker thread
+        self.vehicle_data = VehicleDataBus(source_from_spec(os.environ.get("VEHICLE_SOURCE")),
+                                           history=self.telemetry, parent=self)
+        self.trip_computer = TripComputer(self.telemetry, parent=self)
+        # Seat motors: rate-limited commands, logged to media/vehicle/seat_commands.log in place of the body bus
+        try:
+            seat_command_log = SeatCommandLog()
+        except OSError as e:
+            print(f"Warning: Seat command log unavailable, seats are simulated without it: {e}")
+            seat_command_log = None
+        self.seat_actuators = SeatActuatorModel(seat_command_log, parent=self)
+        # Alert rules (VEHICLE_ALERTS=<rules file>, else the built-in low fuel/overspeed/... set)
+        self.alert_monitor = AlertMonitor(self.telemetry, load_rules(os.environ.get("VEHICLE_ALERTS")), parent=self)
+
         # --- Create and Add Functional Tabs ---
-        self.car_control_tab_instance = CarControlTab(parent=self)
+        self.car_control_tab_instance = CarControlTab(parent=self, vehicle_data=self.vehicle_data,
+                                                      trip_computer=self.trip_computer, telemetry=self.telemetry,
+                                                      profile_store=self.profile_store,
+                                                      seat_actuators=self.seat_actuators)
         self.tabs.addTab(self.car_control_tab_instance, "Car Controls")
 
-        self.media_tab_instance = MediaTab(parent=self)
+        self.media_tab_instance = MediaTab(parent=self, profile_store=self.profile_store)
         self.tabs.addTab(self.media_tab_instance, "Media")
 
         self.phone_tab_instance = PhoneTab(parent=self)
         self.tabs.addTab(self.phone_tab_instance, "Phone")
 
-        self.climate_tab_instance = ClimateTab(parent=self)
+        self.climate_tab_instance = ClimateTab(parent=self, profile_store=self.profile_store)
         self.tabs.addTab(self.climate_tab_instance, "Climate")
 
         settings_tab_content = create_settings_tab(self.media_tab_instance, self)
         self.tabs.addTab(settings_tab_content, "Settings")
 
-        self.maps_tab_instance = MapsTab(parent=self) # Commented out Maps Tab
+        self.maps_tab_instance = MapsTab(parent=self, profile_store=self.profile_store)
         self.tabs.addTab(self.maps_tab_instance, "Maps")
 
+        # Switching driver re-applies every tab from the new driver's profile in one pass (picked in Settings)
+        self.driver_profiles = DriverProfileManager(self.profile_store, parent=self)
+        self.driver_profiles.register("theme", self.apply_driver_theme)
+        self.driver_profiles.register("seats", self.car_control_tab_instance.apply_driver_profile,
+                                      self.car_control_tab_instance)
+        self.driver_profiles.register("media", self.media_tab_instance.apply_driver_profile, self.media_tab_instance)
+        self.driver_profiles.register("climate", self.climate_tab_instance.apply_driver_profile,
+                                      self.climate_tab_instance)
+        self.driver_profiles.register("map", self.maps_tab_instance.apply_driver_profile, self.maps_tab_instance)
+        self.driver_profiles.register("settings", settings_tab_content.apply_driver_profile, settings_tab_content)
+
+        # Alerts show over whichever tab is active
+        self.alert_banner = AlertBanner(self.tabs)
+        self.alert_monitor.alertRaised.connect(self.alert_banner.show_alert)
+        self.alert_monitor.alertCleared.connect(self.alert_banner.clear_alert)
+
+        # VEHICLE_RECORD=1 logs every incoming frame to media/vehicle/logs (or VEHICLE_RECORD=<path>)
+        record_path = os.environ.get("VEHICLE_RECORD")
+        if record_path:
+            self.vehicle_data.start_recording(None if record_path == "1" else record_path)
+        self.vehicle_data.start()
+        self.seat_actuators.start()
+        QApplication.instance().aboutToQuit.connect(self.vehicle_data.stop)
+        QApplication.instance().aboutToQuit.connect(self.vehicle_data.stop_recording)
+        QApplication.instance().aboutToQuit.connect(self.trip_computer.save)
+        QApplication.instance().aboutToQuit.connect(self.seat_actuators.stop)
+        if seat_command_log:
+            QApplication.instance().aboutToQuit.connect(seat_command_log.close)
+        QApplication.instance().aboutToQuit.connect(self.profile_store.flush)
+        QApplication.instance().aboutToQuit.connect(self.maps_tab_instance.stop_track_feed)  # Closes a track being recorded
+        QApplication.instance().aboutToQuit.connect(self.maps_tab_instance.dump_metrics)  # Final MAPS_METRICS_DUMP
+
         # Home button tab and QStackedWidget for home page are removed/commented
         # home_button_tab = QWidget()
         # self.tabs.addTab(home_button_tab, "Home")
@@ -214,8 +278,15 @@ class InfotainmentSystem(QMainWindow):
         else:  # Default to Dark
             QApplication.instance().setPalette(get_dark_palette())
             QApplication.instance().setStyleSheet(DARK_STYLESHEET)
+        self.profile_store.set("theme", theme_name)
         print(f"Theme applied: {theme_name}")
 
+    def apply_driver_theme(self):
+        # Restyling the whole application is costly, so only when the new driver's theme differs
+        theme_name = self.profile_store.get("theme", "Dark")
+        if theme_name != self.current_theme_name:
+            self.apply_theme(theme_name)
+
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+import json
+
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+
+# JavaScript injected into generated map pages. Expects `map`, `tileLayer` and
+# `tileSourceCity(coords)` to exist and exposes `bridge` once the QWebChannel is connected.
+BRIDGE_JS = """
+                var bridge = null;
+                function tileKey(coords) { return coords.z + '/' + coords.x + '/' + coords.y; }
+                function reportViewport() {
+                    if (!bridge) return;
+                    var b = map.getBounds(), c = map.getCenter();
+                    bridge.reportViewport(JSON.stringify({
+                        zoom: map.getZoom(), west: b.getWest(), south: b.getSouth(),
+                        east: b.getEast(), north: b.getNorth(), lat: c.lat, lon: c.lng
+                    }));
+                }
+                new QWebChannel(qt.webChannelTransport, function(channel) {
+                    bridge = channel.objects.mapBridge;
+                    reportViewport();
+                });
+
+                // Tile views (storage LRU) and blank-tile time (tile created -> image shown)
+                var pendingTileViews = [], tileStartTimes = {}, blankSamples = [];
+                // Page stats for the metrics registry: tile counts, first tile time, frame times while moving
+                var pageStats = { requested: 0, served: 0, missing: 0, firstTileMs: null, frames: [] };
+                var firstTileSent = false;
+                tileLayer.on('tileloadstart', function(e) {
+                    tileStartTimes[tileKey(e.coords)] = performance.now();
+                    pageStats.requested++;
+                });
+                tileLayer.on('tileload tileerror', function(e) {
+                    var key = tileKey(e.coords), started = tileStartTimes[key];
+                    if (started !== undefined) {
+                        blankSamples.push(Math.round(performance.now() - started));
+                        delete tileStartTimes[key];
+                    }
+                    // Tiles outside every city resolve to the empty image; count them as missing
+                    if (e.type === 'tileerror' || e.tile.src === L.Util.emptyImageUrl) {
+                        pageStats.missing++;
+                    } else {
+                        pageStats.served++;
+                        if (pageStats.firstTileMs === null && !firstTileSent) pageStats.firstTileMs = Math.round(performance.now());
+                    }
+                    if (e.type === 'tileload') pendingTileViews.push(tileSourceCity(e.coords) + ':' + key);
+                });
+                var frameLoopUntil = 0, lastFrameTime = null;
+                function sampleFrame(now) {
+                    if (lastFrameTime !== null) pageStats.frames.push(Math.round((now - lastFrameTime) * 10) / 10);
+                    lastFrameTime = now;
+                    if (now < frameLoopUntil) {
+                        requestAnimationFrame(sampleFrame);
+                    } else {
+                        lastFrameTime = null;
+                    }
+                }
+                // Sample only while the map moves (and briefly after), so an idle page costs nothing
+                map.on('movestart zoomstart move', function() {
+                    var running = lastFrameTime !== null;
+                    frameLoopUntil = performance.now() + 500;
+                    if (!running) requestAnimationFrame(sampleFrame);
+                });
+                setInterval(function() {
+                    if (!bridge) return;
+                    if (pendingTileViews.length) {
+                        bridge.reportTileAccess(pendingTileViews.join(','));
+                        pendingTileViews = [];
+                    }
+                    if (blankSamples.length) {
+                        bridge.reportBlankTimes(blankSamples.join(','));
+                        blankSamples = [];
+                    }
+                    if (pageStats.requested || pageStats.served || pageStats.missing || pageStats.frames.length) {
+                        if (pageStats.firstTileMs !== null) firstTileSent = true;
+                        bridge.reportPageStats(JSON.stringify(pageStats));
+                        pageStats = { requested: 0, served: 0, missing: 0, firstTileMs: null, frames: [] };
+                    }
+                }, 2000);
+
+                // Heartbeat for the render-process watchdog; stops arriving if the page hangs
+                setInterval(function() { if (bridge) bridge.heartbeat(); }, 1000);
+
+                // Low-priority prefetch into the browser cache, cancelled whenever the view moves
+                var prefetchQueue = [], prefetchActive = [], prefetchKept = [];
+                var scheduleIdle = window.requestIdleCallback
+                    ? function(fn) { window.requestIdleCallback(fn, { timeout: 500 }); }
+                    : function(fn) { setTimeout(fn, 50); };
+                function cancelPrefetch() {
+                    prefetchQueue = [];
+                    prefetchActive.forEach(function(img) { img.onload = img.onerror = null; img.src = ''; });
+                    prefetchActive = [];
+                }
+                function pumpPrefetch() {
+                    while (prefetchActive.length < 4 && prefetchQueue.length) {
+                        var img = new Image();
+                        img.fetchPriority = 'low';
+                        img.decoding = 'async';
+                        img.onload = img.onerror = function() {
+                            var index = prefetchActive.indexOf(this);
+                            if (index >= 0) prefetchActive.splice(index, 1);
+                            prefetchKept.push(this);  // Keep decoded images referenced
+                            if (prefetchKept.length > 300) prefetchKept.shift();
+                            scheduleIdle(pumpPrefetch);
+                        };
+                        img.src = prefetchQueue.shift();
+                        prefetchActive.push(img);
+                    }
+                }
+                function prefetchTiles(urls) {
+                    cancelPrefetch();
+                    prefetchQueue = urls.slice();
+                    scheduleIdle(pumpPrefetch);
+                }
+                map.on('movestart zoomstart', cancelPrefetch);
+
+                // POI clusters computed in Python and sent as viewport diffs.
+                // Rows: [key, lat, lon, count, poiId or -1, HTML-escaped name]
+                var clusterLayer = L.layerGroup().addTo(map), clusterMarkers = {}, poiMarkers = {}, pendingFocusPoi = null;
+                function clusterMarker(c) {
+                    if (c[3] === 1) {
+                        var marker = L.circleMarker([c[1], c[2]], { radius: 5, weight: 1, fillOpacity: 0.8 });
+                        if (c[5]) marker.bindPopup(c[5]);
+                        poiMarkers[c[4]] = marker;
+                        return marker;
+                    }
+                    var size = c[3] < 10 ? 26 : (c[3] < 100 ? 32 : 40);
+                    return L.marker([c[1], c[2]], {
+                        icon: L.divIcon({ className: 'poi-cluster', html: '<div>' + c[3] + '</div>', iconSize: [size, size] })
+                    }).on('click', function() { map.setView([c[1], c[2]], map.getZoom() + 2); });
+                }
+                function updateClusters(reset, added, removedKeys) {
+                    if (reset) {
+                        clusterLayer.clearLayers();
+                        clusterMarkers = {};
+                        poiMarkers = {};
+                    }
+                    removedKeys.forEach(function(key) {
+                        var marker = clusterMarkers[key];
+                        if (!marker) return;
+                        clusterLayer.removeLayer(marker);
+                        delete clusterMarkers[key];
+                    });
+                    added.forEach(function(c) {
+                        var marker = clusterMarker(c).addTo(clusterLayer);
+                        clusterMarkers[c[0]] = marker;
+                        if (c[4] === pendingFocusPoi) {
+                            marker.openPopup();
+                            pendingFocusPoi = null;
+                        }
+                    });
+                }
+                function focusPoi(id, lat, lon, zoom) {
+                    var marker = poiMarkers[id];
+                    if (marker && map.hasLayer(marker) && map.getZoom() >= zoom) {
+                        map.panTo([lat, lon]);
+                        marker.openPopup();
+                        return;
+                    }
+                    pendingFocusPoi = id;
+                    map.setView([lat, lon], Math.max(map.getZoom(), zoom));
+                }
+                map.on('moveend', reportViewport);
+
+                // Offline routing: right-click picks start/destination, Python draws the result
+                var routeLayer = L.layerGroup().addTo(map);
+                map.on('contextmenu', function(e) {
+                    if (bridge) bridge.requestRoutePoint(e.latlng.lat, e.latlng.lng);
+                });
+                function showPlace(lat, lon, label) {
+                    map.setView([lat, lon], Math.max(map.getZoom(), 16));
+                    L.popup().setLatLng([lat, lon]).setContent(label).openOn(map);
+                }
+                function showRouteEnds(start, end) {
+                    routeLayer.clearLayers();
+                    if (start) L.circleMarker(start, { radius: 7, color: '#107c10', fillOpacity: 1 }).addTo(routeLayer);
+                    if (end) L.circleMarker(end, { radius: 7, color: '#d13438', fillOpacity: 1 }).addTo(routeLayer);
+                }
+
+                // Vehicle position from the GPS track feed (live or replayed)
+                var vehicleMarker = null;
+                function showVehicle(lat, lon, follow) {
+                    if (!vehicleMarker) {
+                        vehicleMarker = L.circleMarker([lat, lon], { radius: 8, color: '#fff', weight: 2,
+                                                                     fillColor: '#8a2be2', fillOpacity: 1 }).addTo(map);
+                    } else {
+                        vehicleMarker.setLatLng([lat, lon]);
+                    }
+                    if (follow && !map.getBounds().pad(-0.2).contains([lat, lon])) map.panTo([lat, lon]);
+                }
+                function hideVehicle() {
+                    if (vehicleMarker) map.removeLayer(vehicleMarker);
+                    vehicleMarker = null;
+                }
+
+                // Polylines (routes, tracks) arrive as encoded points plus one level char per point;
+                // a point is drawn once the map zoom reaches its level
+                var polylines = {};
+                function decodePolyline(encoded, precision) {
+                    var factor = Math.pow(10, precision), points = [], lat = 0, lon = 0, index = 0;
+                    while (index < encoded.length) {
+                        var deltas = [0, 0];
+                        for (var k = 0; k < 2; k++) {
+                            var result = 0, shift = 0, chunk;
+                            do {
+                                chunk = encoded.charCodeAt(index++) - 63;
+                                result |= (chunk & 31) << shift;
+                                shift += 5;
+                            } while (chunk >= 32);
+                            deltas[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+                        }
+                        lat += deltas[0];
+                        lon += deltas[1];
+                        points.push([lat / factor, lon / factor]);
+                    }
+                    return points;
+                }
+                function decodeLevels(levels) {
+                    var out = new Array(levels.length);
+                    for (var i = 0; i < levels.length; i++) out[i] = levels.charCodeAt(i) - 63;
+                    return out;
+                }
+                function renderPolyline(line) {
+                    var zoom = map.getZoom(), latlngs = [];
+                    for (var i = 0; i < line.points.length; i++) {
+                        if (line.levels[i] <= zoom) latlngs.push(line.points[i]);
+                    }
+                    line.layer.setLatLngs(latlngs);
+                }
+                function setPolyline(name, encoded, levels, precision, style) {
+                    removePolyline(name);
+                    var line = polylines[name] = {
+                        precision: precision, points: decodePolyline(encoded, precision), levels: decodeLevels(levels),
+                        layer: L.polyline([], style).addTo(map)
+                    };
+                    renderPolyline(line);
+                }
+                function splicePolyline(name, start, removeCount, encoded, levels) {
+                    var line = polylines[name];
+                    if (!line) return;
+                    var points = decodePolyline(encoded, line.precision), pointLevels = decodeLevels(levels);
+                    line.points.splice.apply(line.points, [start, removeCount].concat(points));
+                    line.levels.splice.apply(line.levels, [start, removeCount].concat(pointLevels));
+                    renderPolyline(line);
+                }
+                function removePolyline(name) {
+                    if (!polylines[name]) return;
+                    map.removeLayer(polylines[name].layer);
+                    delete polylines[name];
+                }
+                map.on('zoomend', function() {
+                    for (var name in polylines) renderPolyline(polylines[name]);
+                });
+"""
+
+
+class MapBridge(QObject):
+    """
+    Object published to the Leaflet page over QWebChannel as `mapBridge`.
+    Page calls arrive as slots and are re-emitted as Qt signals for MapsTab.
+    """
+    tilesViewed = pyqtSignal(list)  # [(city, z, x, y), ...]
+    viewportChanged = pyqtSignal(dict)  # zoom, west, south, east, north, lat, lon
+    blankTimesReported = pyqtSignal(list)  # [ms, ...]
+    routePointPicked = pyqtSignal(float, float)  # lat, lon
+    heartbeatReceived = pyqtSignal()
+    pageStatsReported = pyqtSignal(dict)  # requested, served, missing, firstTileMs, frames
+
+    @pyqtSlot(str)
+    def reportTileAccess(self, tile_keys):
+        tiles = []
+        for key in tile_keys.split(","):
+            city, _, path = key.rpartition(":")
+            try:
+                z, x, y = (int(part) for part in path.split("/"))
+            except ValueError:
+                continue
+            tiles.append((city, z, x, y))
+        if tiles:
+            self.tilesViewed.emit(tiles)
+
+    @pyqtSlot(str)
+    def reportViewport(self, viewport_json):
+        try:
+            self.viewportChanged.emit(json.loads(viewport_json))
+        except ValueError as e:
+            print(f"MapBridge: bad viewport payload: {e}")
+
+    @pyqtSlot(float, float)
+    def requestRoutePoint(self, lat, lon):
+        self.routePointPicked.emit(lat, lon)
+
+    @pyqtSlot(str)
+    def reportPageStats(self, stats_json):
+        try:
+            self.pageStatsReported.emit(json.loads(stats_json))
+        except ValueError as e:
+            print(f"MapBridge: bad page stats payload: {e}")
+
+    @pyqtSlot()
+    def heartbeat(self):
+        self.heartbeatReceived.emit()
+
+    @pyqtSlot(str)
+    def reportBlankTimes(self, samples_csv):
+        samples = [float(value) for value in samples_csv.split(",") if value]
+        if samples:
+            self.blankTimesReported.emit(samples)
@@ -1,13 +1,24 @@
+import argparse
+import contextlib
 import math
 import os
+import sys
 import time
 import requests  # For making HTTP requests to download tiles
 from pathlib import Path
-from PIL import Image  # For checking if downloaded content is a valid image
-from io import BytesIO
+from tile_verify import check_tile_bytes, load_report, TileCorrupt  # Header/CRC check instead of a PIL decode
+from tile_selection import average_tile_bytes, format_bytes
+from map_storage import TileStorageManager
+from download_jobs import (
+    build_city_jobs, load_job_config, print_plan, ProgressReporter, open_progress_stream, MAX_ZOOM_LEVEL
+)
 
 # --- Configuration for Locations ---
-# Define a list of locations, each with a name and its bounding box
+# Define a list of locations, each with a name and its bounding box.
+# Instead of a bounding box an entry can select tiles by shape (see tile_selection.py):
+#   {"name": "Bosphorus_Coast", "polygon": "areas/bosphorus.geojson"}
+#   {"name": "Commute", "corridor": "routes/commute.geojson", "buffer_m": 400}
+# GeoJSON paths are relative to this script's directory.
 LOCATIONS = [
     {
         "name": "Istanbul_Detailed",
@@ -35,7 +46,7 @@ LOCATIONS = [
 # Define the range of zoom levels to download for each city
 # Be very careful with higher zoom levels for large areas - it's exponential!
 # For city-level detail, you might want higher zoom levels but for smaller areas.
-# This is a global setting for all cities in this version.
+# These are defaults; a city entry (or --config job file) can set its own min_zoom/max_zoom.
 MIN_ZOOM = 12  # Good for city overview
 MAX_ZOOM = 16  # Detailed city view (adjust as needed, 14 can be many tiles for a dense city)
 
@@ -53,6 +64,11 @@ BASE_OUTPUT_DIR = BASE_PROJECT_GUI_PATH / "media" / "maps" / "tiles_by_city"
 # Delay between tile requests in seconds (to be respectful to the server)
 REQUEST_DELAY = 0.5  # Increase if you get rate-limited or for larger downloads
 
+# Retries for rate limiting (429) and server errors (5xx); Retry-After is honoured up to the cap
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # Seconds, doubled on each retry when the server sends no Retry-After
+MAX_RETRY_AFTER = 30.0
+
 # User-Agent for requests
 HEADERS = {
     'User-Agent': 'MyMultiCityTileDownloader/1.0 (Educational Use; contact:youremail@example.com)'
@@ -79,9 +95,83 @@ def num2deg(xtile, ytile, zoom):
     return (lat_deg, lon_deg)
 
 
-def download_tile(z, x, y, city_output_dir):
-    """Downloads a single tile and saves it to the city's specific directory."""
-    tile_url = TILE_SERVER_URL_TEMPLATE.format(z=z, x=x, y=y)
+class TileFetcher:
+    """
+    HTTP side of the downloader: one keep-alive session, retries on 429/5xx
+    and per-request latency/retry statistics for progress reports and benchmarks.
+    """
+
+    def __init__(self, url_template=TILE_SERVER_URL_TEMPLATE, max_retries=MAX_RETRIES, timeout=15):
+        self.url_template = url_template
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.requests_sent = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.latencies_ms = []
+
+    def tile_url(self, z, x, y):
+        return self.url_template.format(z=z, x=x, y=y)
+
+    def fetch(self, z, x, y):
+        """Returns the tile body, retrying throttled/failed requests. Raises requests exceptions."""
+        tile_url = self.tile_url(z, x, y)
+        for attempt in range(self.max_retries + 1):
+            started_at = time.perf_counter()
+            response = self.session.get(tile_url, timeout=self.timeout)
+            self.latencies_ms.append((time.perf_counter() - started_at) * 1000.0)
+            self.requests_sent += 1
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if not retryable or attempt == self.max_retries:
+                response.raise_for_status()
+                return response.content
+            if response.status_code == 429:
+                self.rate_limited += 1
+            else:
+                self.server_errors += 1
+            self.retries += 1
+            try:
+                wait = min(float(response.headers.get("Retry-After")), MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                wait = RETRY_BACKOFF * (2 ** attempt)
+            print(f"  HTTP {response.status_code} for {tile_url}, retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+    def summary(self):
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))], 2)
+
+        return {
+            "requests": self.requests_sent,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "latency_p50_ms": percentile(50),
+            "latency_p99_ms": percentile(99),
+        }
+
+
+_default_fetcher = None
+
+
+def download_tile(z, x, y, city_output_dir, storage=None, fetcher=None):
+    """
+    Downloads a single tile and saves it to the city's specific directory.
+    New tiles are registered in the storage index when one is given.
+    """
+    global _default_fetcher
+    if fetcher is None:
+        if _default_fetcher is None:
+            _default_fetcher = TileFetcher()
+        fetcher = _default_fetcher
+    tile_url = fetcher.tile_url(z, x, y)
     # Tiles are saved under city_output_dir/z/x/y.png
     tile_path_dir = city_output_dir / str(z) / str(x)
     tile_path_dir.mkdir(parents=True, exist_ok=True)
@@ -93,17 +183,18 @@ def download_tile(z, x, y, city_output_dir):
 
     print(f"Downloading tile: {tile_url} to {tile_filepath}")
     try:
-        response = requests.get(tile_url, headers=HEADERS, timeout=15)  # Increased timeout
-        response.raise_for_status()
+        content = fetcher.fetch(z, x, y)
 
         try:
-            Image.open(BytesIO(response.content)).verify()
-        except Exception as img_e:
+            check_tile_bytes(content)
+        except TileCorrupt as img_e:
             print(f"Warning: Downloaded content for {tile_url} is not a valid image. Error: {img_e}. Skipping.")
             return False
 
         with open(tile_filepath, 'wb') as f:
-            f.write(response.content)
+            f.write(content)
+        if storage is not None:
+            storage.record_tile(city_output_dir.name, z, x, y, len(content))
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error downloading tile {tile_url}: {e}")
@@ -114,79 +205,216 @@ def download_tile(z, x, y, city_output_dir):
 
 
 # --- Main Download Logic ---
-def main():
+def describe_selection(location_info):
+    if "polygon" in location_info:
+        source = location_info["polygon"]
+        return f"Polygon: {source if isinstance(source, str) else 'inline GeoJSON'}"
+    if "corridor" in location_info:
+        source = location_info["corridor"]
+        return (f"Corridor: {source if isinstance(source, str) else 'inline GeoJSON'}"
+                f" buffered by {location_info.get('buffer_m', 500)} m")
+    return (f"Bounding Box: LAT=({location_info['min_lat']}, {location_info['max_lat']}), "
+            f"LON=({location_info['min_lon']}, {location_info['max_lon']})")
+
+
+def run_city_job(job, city_output_dir, request_delay, reporter, storage=None, fetcher=None):
+    """Downloads every planned tile for one city. Returns (processed, failed) counts."""
+    city_downloaded_count = 0
+    city_failed_count = 0
+    reporter.emit("city_start", city=job.name, total_tiles=job.total_tiles)
+
+    for z, coverage, _ in job.zoom_plans:
+        print(f"\n  Processing zoom level: {z} for {job.name}")
+        if coverage.count():
+            (xtile_start, xtile_end), (ytile_start, ytile_end) = coverage.x_range(), coverage.y_range()
+            print(
+                f"    Tile range for zoom {z}: X from {xtile_start} to {xtile_end}, Y from {ytile_start} to {ytile_end}")
+
+        for x, y in coverage:
+            success = download_tile(z, x, y, city_output_dir, storage, fetcher)
+            if success:
+                city_downloaded_count += 1
+            else:
+                city_failed_count += 1
+            reporter.tile_finished(job.name, z, success)
+            time.sleep(request_delay)
+
+    reporter.emit("city_done", city=job.name, succeeded=city_downloaded_count, failed=city_failed_count)
+    return city_downloaded_count, city_failed_count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Download OpenStreetMap tiles per city for offline use in the Maps tab.")
+    parser.add_argument("--config", help="JSON or YAML job file with a 'cities' list (default: LOCATIONS in this script)")
+    parser.add_argument("--city", action="append", dest="cities", metavar="NAME",
+                        help="Only process this city (can be repeated)")
+    parser.add_argument("--min-zoom", type=int, help="Override the minimum zoom for every city")
+    parser.add_argument("--max-zoom", type=int, help="Override the maximum zoom for every city")
+    parser.add_argument("--output-dir", type=Path, help=f"Tile output directory (default: {BASE_OUTPUT_DIR})")
+    parser.add_argument("--tile-url", help=f"Tile URL template (default: {TILE_SERVER_URL_TEMPLATE})")
+    parser.add_argument("--delay", type=float, help=f"Delay between tile requests in seconds (default: {REQUEST_DELAY})")
+    parser.add_argument("--dry-run", action="store_true", help="Print tile counts and disk estimates, download nothing")
+    parser.add_argument("--yes", "-y", action="store_true", help="Do not ask for confirmation per city")
+    parser.add_argument("--progress-json", metavar="PATH",
+                        help="Write JSON-lines progress events to PATH ('-' for stdout; log output then goes to stderr)")
+    parser.add_argument("--redownload-from", metavar="REPORT", type=Path,
+                        help="Re-download the corrupt tiles listed in a tile_verify.py JSON report")
+    parser.add_argument("--quota-mb", type=int,
+                        help="After downloading, evict least-recently-viewed high-zoom tiles to fit this budget")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    output_dir = args.output_dir or BASE_OUTPUT_DIR
+    request_delay = REQUEST_DELAY
+    tile_url = TILE_SERVER_URL_TEMPLATE
+    locations = LOCATIONS
+    default_min_zoom, default_max_zoom = MIN_ZOOM, MAX_ZOOM
+    geojson_base_dir = SCRIPT_DIR
+    try:
+        if args.config:
+            config = load_job_config(args.config)
+            locations = config["cities"]
+            default_min_zoom = config.get("min_zoom", MIN_ZOOM)
+            default_max_zoom = config.get("max_zoom", MAX_ZOOM)
+            request_delay = config.get("request_delay", REQUEST_DELAY)
+            tile_url = config.get("tile_url", TILE_SERVER_URL_TEMPLATE)
+            if "output_dir" in config and not args.output_dir:
+                output_dir = Path(config["output_dir"])
+            geojson_base_dir = Path(args.config).resolve().parent
+        if args.delay is not None:
+            request_delay = args.delay
+        if args.tile_url:
+            tile_url = args.tile_url
+        jobs = build_city_jobs(locations, default_min_zoom, default_max_zoom, only_cities=args.cities)
+        for job in jobs:
+            if args.min_zoom is not None:
+                job.min_zoom = args.min_zoom
+            if args.max_zoom is not None:
+                job.max_zoom = args.max_zoom
+            if not 0 <= job.min_zoom <= job.max_zoom <= MAX_ZOOM_LEVEL:  # Same check as for config values
+                raise ValueError(f"City '{job.name}' has an invalid zoom range {job.min_zoom}-{job.max_zoom}.")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    progress_stream = open_progress_stream(args.progress_json)
+    reporter = ProgressReporter(progress_stream)
+    # Keep stdout clean for the JSON stream when it is the progress target
+    log_stream = sys.stderr if args.progress_json == "-" else sys.stdout
+    try:
+        with contextlib.redirect_stdout(log_stream):
+            avg_tile_bytes = average_tile_bytes(output_dir)  # Sampled from tiles already on disk
+            for job in jobs:
+                job.plan(avg_tile_bytes, base_dir=geojson_base_dir)
+
+            if args.redownload_from:
+                storage = TileStorageManager(output_dir)
+                result = redownload_corrupt_tiles(args.redownload_from, output_dir, request_delay, reporter, storage,
+                                                  TileFetcher(tile_url))
+                storage.close()
+                return result
+
+            if args.dry_run:
+                print_plan(jobs, avg_tile_bytes)
+                reporter.emit("plan", cities=[job.to_dict() for job in jobs])
+                return 0
+
+            storage = TileStorageManager(output_dir)
+            result = download_jobs(jobs, output_dir, request_delay, args.yes, reporter, avg_tile_bytes, storage,
+                                   TileFetcher(tile_url))
+            if args.quota_mb is not None:
+                evicted, freed = storage.enforce_quota(args.quota_mb * 1024 * 1024)
+                reporter.emit("quota", quota_bytes=args.quota_mb * 1024 * 1024, evicted=evicted, freed_bytes=freed)
+            storage.close()
+    finally:
+        # Also on the early returns (--redownload-from, --dry-run)
+        if progress_stream not in (None, sys.stdout):
+            progress_stream.close()
+    return result
+
+
+def redownload_corrupt_tiles(report_path, output_dir, request_delay, reporter, storage=None, fetcher=None):
+    """Deletes the tiles a verification report flagged and downloads them again."""
+    try:
+        reports = load_report(report_path)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read report {report_path}: {e}", file=sys.stderr)
+        return 2
+    reporter.total_tiles = sum(len(report.get("corrupt", [])) for report in reports)
+    failed_count = 0
+    for report in reports:
+        city_output_dir = output_dir / report["city"]
+        print(f"\n--- Re-downloading {len(report['corrupt'])} corrupt tiles for {report['city']} ---")
+        for tile in report["corrupt"]:
+            z, x, y = tile["z"], tile["x"], tile["y"]
+            suffix = Path(tile.get("path", "")).suffix or ".png"  # The file that was flagged, .png or .webp
+            (city_output_dir / str(z) / str(x) / f"{y}{suffix}").unlink(missing_ok=True)
+            success = download_tile(z, x, y, city_output_dir, storage, fetcher)
+            if not success:
+                failed_count += 1
+            reporter.tile_finished(report["city"], z, success)
+            time.sleep(request_delay)
+    reporter.job_finished(fetcher.summary() if fetcher else None)
+    print(f"\nRe-download finished: {reporter.total_tiles - failed_count} repaired, {failed_count} failed.")
+    return 1 if failed_count else 0
+
+
+def download_jobs(jobs, output_dir, request_delay, assume_yes, reporter, avg_tile_bytes, storage=None, fetcher=None):
     print(f"Starting map tile download for multiple cities...")
-    print(f"Base output directory: {BASE_OUTPUT_DIR.resolve()}")
-    print(f"Global Zoom Levels: {MIN_ZOOM} to {MAX_ZOOM}")
-    print(f"Request Delay: {REQUEST_DELAY} seconds")
+    print(f"Base output directory: {output_dir.resolve()}")
+    print(f"Request Delay: {request_delay} seconds")
     print("WARNING: This can download a very large number of files and take a long time.")
     print("Please ensure you comply with the tile server's usage policy.")
 
-    BASE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
 
     overall_downloaded_count = 0
     overall_failed_count = 0
 
-    for location_info in LOCATIONS:
-        city_name = location_info["name"]
-        min_lat = location_info["min_lat"]
-        max_lat = location_info["max_lat"]
-        min_lon = location_info["min_lon"]
-        max_lon = location_info["max_lon"]
-
+    confirmed_jobs = []
+    for job in jobs:
+        print(f"\n--- City: {job.name} ---")
+        print(f"  Output directory: {(output_dir / job.name).resolve()}")
+        print(f"  {describe_selection(job.location_info)}")
+        for z, coverage, estimated_bytes in job.zoom_plans:
+            print(f"  Zoom level {z}: {coverage.count()} tiles in {len(coverage.rows)} rows (~{format_bytes(estimated_bytes)})")
+        print(f"  Total tiles to potentially download for {job.name}: {job.total_tiles} "
+              f"(~{format_bytes(job.total_bytes)}, {format_bytes(avg_tile_bytes)} per tile)")
+        if not assume_yes:
+            confirm = input(f"  Do you want to proceed with {job.name}? (yes/no): ")
+            if confirm.lower() != 'yes':
+                print(f"  Download for {job.name} cancelled by user.")
+                continue  # Skip to the next city
+        confirmed_jobs.append(job)
+
+    reporter.job_started(confirmed_jobs)
+    for job in confirmed_jobs:
         # Create a specific output directory for this city
-        city_output_dir = BASE_OUTPUT_DIR / city_name
+        city_output_dir = output_dir / job.name
         city_output_dir.mkdir(parents=True, exist_ok=True)
+        print(f"\n--- Processing City: {job.name} ---")
 
-        print(f"\n--- Processing City: {city_name} ---")
-        print(f"  Output directory: {city_output_dir.resolve()}")
-        print(f"  Bounding Box: LAT=({min_lat}, {max_lat}), LON=({min_lon}, {max_lon})")
-
-        total_tiles_for_city = 0
-        for z in range(MIN_ZOOM, MAX_ZOOM + 1):
-            xmin, ymax = deg2num(max_lat, min_lon, z)
-            xmax, ymin = deg2num(min_lat, max_lon, z)
-            num_x_tiles = xmax - xmin + 1
-            num_y_tiles = ymin - ymax + 1
-            tiles_in_zoom = num_x_tiles * num_y_tiles
-            total_tiles_for_city += tiles_in_zoom
-            print(f"  Zoom level {z}: {num_x_tiles} x {num_y_tiles} = {tiles_in_zoom} tiles")
-
-        print(f"  Total tiles to potentially download for {city_name}: {total_tiles_for_city}")
-        confirm = input(f"  Do you want to proceed with {city_name}? (yes/no): ")
-        if confirm.lower() != 'yes':
-            print(f"  Download for {city_name} cancelled by user.")
-            continue  # Skip to the next city
-
-        city_downloaded_count = 0
-        city_failed_count = 0
-
-        for z in range(MIN_ZOOM, MAX_ZOOM + 1):
-            print(f"\n  Processing zoom level: {z} for {city_name}")
-            xtile_start, ytile_start = deg2num(max_lat, min_lon, z)
-            xtile_end, ytile_end = deg2num(min_lat, max_lon, z)
-
-            print(
-                f"    Tile range for zoom {z}: X from {xtile_start} to {xtile_end}, Y from {ytile_start} to {ytile_end}")
+        city_downloaded_count, city_failed_count = run_city_job(job, city_output_dir, request_delay, reporter,
+                                                                storage, fetcher)
 
-            for x in range(xtile_start, xtile_end + 1):
-                for y in range(ytile_start, ytile_end + 1):
-                    if download_tile(z, x, y, city_output_dir):  # Pass city_output_dir
-                        city_downloaded_count += 1
-                    else:
-                        city_failed_count += 1
-                    time.sleep(REQUEST_DELAY)
-
-        print(f"\n  Download complete for {city_name}.")
-        print(f"  Successfully processed/verified for {city_name}: {city_downloaded_count} tiles.")
-        print(f"  Failed to download for {city_name}: {city_failed_count} tiles.")
+        print(f"\n  Download complete for {job.name}.")
+        print(f"  Successfully processed/verified for {job.name}: {city_downloaded_count} tiles.")
+        print(f"  Failed to download for {job.name}: {city_failed_count} tiles.")
         overall_downloaded_count += city_downloaded_count
         overall_failed_count += city_failed_count
+    reporter.job_finished(fetcher.summary() if fetcher else None)
 
     print(f"\n--- Overall Download Summary ---")
     print(f"Total tiles successfully processed/verified across all cities: {overall_downloaded_count}")
     print(f"Total tiles failed to download across all cities: {overall_failed_count}")
+    if fetcher and fetcher.requests_sent:
+        print(f"HTTP requests: {fetcher.requests_sent}, retries: {fetcher.retries}")
+    return 1 if overall_failed_count else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default upper bounds (seconds) for latency-style histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative on export), plus count and sum."""
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+                seen += bucket_count
+                if seen >= rank:
+                    return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Named counters and histograms, created on first use."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._rate_base = None  # (time, {counter name: value}) from the previous rates() call
+
+    def counter(self, name, help_text=""):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name, help_text)
+            return metric
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help_text, buckets)
+            return metric
+
+    def snapshot(self):
+        """Plain dict of every metric, e.g. for printing or JSON."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                result[metric.name] = metric.value
+            else:
+                p50, p95 = metric.quantile(0.5), metric.quantile(0.95)
+                result[metric.name] = {
+                    "count": metric.count, "sum": round(metric.sum, 6),
+                    # Above the largest bucket: "+Inf" keeps the snapshot valid JSON
+                    "p50": "+Inf" if p50 == float("inf") else p50,
+                    "p95": "+Inf" if p95 == float("inf") else p95,
+                }
+        return result
+
+    def rates(self):
+        """Per-second increase of every counter since the previous call (empty on the first)."""
+        now = time.monotonic()
+        with self._lock:
+            values = {m.name: m.value for m in self._metrics.values() if isinstance(m, Counter)}
+            base, self._rate_base = self._rate_base, (now, values)
+        if base is None or now <= base[0]:
+            return {}
+        elapsed = now - base[0]
+        return {name: round((value - base[1].get(name, 0)) / elapsed, 3) for name, value in values.items()}
+
+    def prometheus_text(self):
+        """Prometheus text exposition format, for scraping."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {metric.name} counter")
+                lines.append(f"{metric.name} {metric.value}")
+                continue
+            lines.append(f"# TYPE {metric.name} histogram")
+            with metric._lock:
+                counts, total, count = list(metric.counts), metric.sum, metric.count
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f'{metric.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric.name}_sum {total}")
+            lines.append(f"{metric.name}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """
+        Writes snapshot() plus counter rates since the previous dump to path
+        (atomically, so a reader never sees half a file).
+        """
+        tmp_path = f"{path}.tmp"
+        document = {"time": time.time(), "metrics": self.snapshot(), "rates_per_sec": self.rates()}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+# --- Scrape Endpoint ---
+
+def serve_metrics(registry, port, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    Returns the server; call shutdown() on it to stop.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood stdout
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics: serving http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,199 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from tile_selection import format_bytes
+
+# --- Constants ---
+DEFAULT_TILES_ROOT = Path(__file__).resolve().parent.parent / "media" / "maps" / "tiles_by_city"
+INDEX_FILENAME = "tile_index.sqlite"
+DEFAULT_PROTECTED_MAX_ZOOM = 12  # Overview zooms are never evicted
+EVICTION_BATCH_SIZE = 500
+ACCESS_FLUSH_THRESHOLD = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tiles (
+    city TEXT NOT NULL, z INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL,
+    bytes INTEGER NOT NULL, last_access INTEGER NOT NULL DEFAULT 0,
+    access_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (city, z, x, y)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usage (
+    city TEXT NOT NULL, z INTEGER NOT NULL, tiles INTEGER NOT NULL, bytes INTEGER NOT NULL,
+    PRIMARY KEY (city, z)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS tiles_insert AFTER INSERT ON tiles BEGIN
+    INSERT INTO usage (city, z, tiles, bytes) VALUES (NEW.city, NEW.z, 1, NEW.bytes)
+    ON CONFLICT (city, z) DO UPDATE SET tiles = tiles + 1, bytes = bytes + NEW.bytes;
+END;
+CREATE TRIGGER IF NOT EXISTS tiles_delete AFTER DELETE ON tiles BEGIN
+    UPDATE usage SET tiles = tiles - 1, bytes = bytes - OLD.bytes WHERE city = OLD.city AND z = OLD.z;
+END;
+CREATE TRIGGER IF NOT EXISTS tiles_resize AFTER UPDATE OF bytes ON tiles BEGIN
+    UPDATE usage SET bytes = bytes - OLD.bytes + NEW.bytes WHERE city = OLD.city AND z = OLD.z;
+END;
+"""
+
+
+class TileStorageManager:
+    """
+    Tracks offline tile storage in a small SQLite index next to the tiles, so
+    per-city/per-zoom usage is a lookup instead of a directory walk.
+    Usage totals are maintained by triggers; access stats from the map view are
+    buffered in memory and written in batches.
+    Quota enforcement evicts tiles by an age score weighted towards high zooms.
+    """
+
+    def __init__(self, tiles_root=DEFAULT_TILES_ROOT, protected_max_zoom=DEFAULT_PROTECTED_MAX_ZOOM):
+        self.tiles_root = Path(tiles_root)
+        self.protected_max_zoom = protected_max_zoom
+        self.tiles_root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.tiles_root / INDEX_FILENAME
+        self.conn = sqlite3.connect(str(self.index_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._pending_access = {}
+
+    def close(self):
+        self.flush_access()
+        self.conn.close()
+
+    def tile_path(self, city, z, x, y):
+        return self.tiles_root / city / str(z) / str(x) / f"{y}.png"
+
+    # --- Index Maintenance ---
+
+    def record_tile(self, city, z, x, y, size_bytes):
+        self.record_tiles([(city, z, x, y, size_bytes)])
+
+    def record_tiles(self, tiles):
+        """tiles: iterable of (city, z, x, y, size_bytes)."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO tiles (city, z, x, y, bytes) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (city, z, x, y) DO UPDATE SET bytes = excluded.bytes",
+                tiles)
+
+    def rebuild_index(self):
+        """One full walk of the tile tree; only needed for tiles written before the index existed."""
+        with self.conn:
+            self.conn.execute("DELETE FROM tiles")
+            self.conn.execute("DELETE FROM usage")
+        batch = []
+        for city_dir in self.tiles_root.iterdir():
+            if not city_dir.is_dir():
+                continue
+            for tile_file in city_dir.glob("*/*/*.png"):
+                try:
+                    z = int(tile_file.parent.parent.name)
+                    x = int(tile_file.parent.name)
+                    y = int(tile_file.stem)
+                except ValueError:
+                    continue
+                batch.append((city_dir.name, z, x, y, tile_file.stat().st_size))
+                if len(batch) >= 5000:
+                    self.record_tiles(batch)
+                    batch = []
+        if batch:
+            self.record_tiles(batch)
+        return self.total_bytes()
+
+    # --- Access Stats (fed from the map view) ---
+
+    def record_access(self, city, tiles):
+        """tiles: iterable of (z, x, y) shown by the map. Buffered until flush_access()."""
+        now = int(time.time())
+        for z, x, y in tiles:
+            key = (city, z, x, y)
+            previous = self._pending_access.get(key)
+            self._pending_access[key] = (now, (previous[1] if previous else 0) + 1)
+        if len(self._pending_access) >= ACCESS_FLUSH_THRESHOLD:
+            self.flush_access()
+
+    def flush_access(self):
+        if not self._pending_access:
+            return
+        rows = [(last_access, count, city, z, x, y)
+                for (city, z, x, y), (last_access, count) in self._pending_access.items()]
+        self._pending_access = {}
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE tiles SET last_access = ?, access_count = access_count + ? "
+                "WHERE city = ? AND z = ? AND x = ? AND y = ?", rows)
+
+    # --- Usage Reporting ---
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM usage").fetchone()[0]
+
+    def usage_by_city(self):
+        """Returns {city: {"tiles": n, "bytes": n, "zooms": {z: (tiles, bytes)}}}."""
+        report = {}
+        for city, z, tiles, size in self.conn.execute(
+                "SELECT city, z, tiles, bytes FROM usage WHERE tiles > 0 ORDER BY city, z"):
+            entry = report.setdefault(city, {"tiles": 0, "bytes": 0, "zooms": {}})
+            entry["tiles"] += tiles
+            entry["bytes"] += size
+            entry["zooms"][z] = (tiles, size)
+        return report
+
+    def tile_extents(self):
+        """Per city and zoom: (city, z, x_min, x_max, y_min, y_max, tile_count), straight from the index."""
+        return self.conn.execute(
+            "SELECT city, z, MIN(x), MAX(x), MIN(y), MAX(y), COUNT(*) FROM tiles GROUP BY city, z").fetchall()
+
+    def usage_report_lines(self, quota_bytes=None):
+        lines = []
+        for city, entry in self.usage_by_city().items():
+            lines.append(f"{city}: {entry['tiles']} tiles, {format_bytes(entry['bytes'])}")
+            for z, (tiles, size) in entry["zooms"].items():
+                lines.append(f"    z{z}: {tiles} tiles, {format_bytes(size)}")
+        total = self.total_bytes()
+        quota_text = f" of {format_bytes(quota_bytes)} quota" if quota_bytes else ""
+        lines.append(f"Total: {format_bytes(total)}{quota_text}")
+        return lines
+
+    # --- Quota Enforcement ---
+
+    def enforce_quota(self, quota_bytes):
+        """
+        Deletes tiles until total usage fits in quota_bytes. Candidates above the
+        protected zoom are ordered by time since last view, doubled per zoom level,
+        so stale high-zoom tiles go first. Returns (evicted_tiles, freed_bytes).
+        """
+        self.flush_access()
+        evicted_tiles = 0
+        freed_bytes = 0
+        excess = self.total_bytes() - quota_bytes
+        now = int(time.time())
+        while excess > 0:
+            candidates = self.conn.execute(
+                "SELECT city, z, x, y, bytes FROM tiles WHERE z > ? "
+                "ORDER BY (? - last_access) * (1 << (z - ?)) DESC LIMIT ?",
+                (self.protected_max_zoom, now, self.protected_max_zoom, EVICTION_BATCH_SIZE)).fetchall()
+            if not candidates:
+                print(f"TileStorage: quota not reachable, {format_bytes(excess)} left in protected zooms.")
+                break
+            victims = []
+            for city, z, x, y, size in candidates:
+                if excess <= 0:
+                    break
+                try:
+                    self.tile_path(city, z, x, y).unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"TileStorage: could not delete {city}/{z}/{x}/{y}: {e}")
+                    continue
+                victims.append((city, z, x, y))
+                excess -= size
+                freed_bytes += size
+            with self.conn:
+                self.conn.executemany("DELETE FROM tiles WHERE city = ? AND z = ? AND x = ? AND y = ?", victims)
+            evicted_tiles += len(victims)
+            if not victims:
+                break
+        if evicted_tiles:
+            print(f"TileStorage: evicted {evicted_tiles} tiles, freed {format_bytes(freed_bytes)}.")
+        return evicted_tiles, freed_bytes
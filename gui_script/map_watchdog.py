@@ -0,0 +1,122 @@
+import os
+import signal
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWidgets import QApplication
+
+# --- Constants ---
+HEARTBEAT_TIMEOUT_SEC = 10.0   # No heartbeat for this long while visible = hung page
+CHECK_INTERVAL_MS = 2000
+RESTART_BACKOFF_START_SEC = 0.5
+RESTART_BACKOFF_MAX_SEC = 30.0
+STABLE_AFTER_SEC = 60.0        # Healthy this long after a recovery resets the backoff
+
+
+class MapWatchdog(QObject):
+    """
+    Watches the map page's render process. A crash (renderProcessTerminated)
+    or a hang (page heartbeat overdue while the view is visible) schedules a
+    restart through restart_callback(), with exponential backoff between
+    consecutive failures. Counts and recovery time go into the metrics registry.
+    """
+
+    def __init__(self, view, restart_callback, metrics, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.restart_callback = restart_callback
+        self.crashes = metrics.counter("map_render_crashes_total", "Render process terminations")
+        self.hangs = metrics.counter("map_render_hangs_total", "Pages that stopped sending heartbeats")
+        self.restarts = metrics.counter("map_page_restarts_total", "Automatic page restarts")
+        self.recovery_time = metrics.histogram("map_recovery_seconds", "Failure detected -> first heartbeat of the new page")
+        self.last_heartbeat = None  # None until the current page has reported once
+        self.failure_started = None
+        self.consecutive_failures = 0
+        self.recovered_at = None
+        self.killed_renderer = False  # Next termination is our own hang kill, already counted as a hang
+
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.timeout.connect(self._restart)
+        self.check_timer = QTimer(self)
+        self.check_timer.timeout.connect(self._check_heartbeat)
+        self.check_timer.start(CHECK_INTERVAL_MS)
+
+    # --- Signals from the page ---
+
+    def heartbeat(self):
+        now = time.monotonic()
+        self.last_heartbeat = now
+        if self.failure_started is not None:
+            self.recovery_time.observe(now - self.failure_started)
+            print(f"MapWatchdog: Map recovered in {now - self.failure_started:.2f}s")
+            self.failure_started = None
+            self.recovered_at = now
+        elif self.recovered_at is not None and now - self.recovered_at > STABLE_AFTER_SEC:
+            self.consecutive_failures = 0
+            self.recovered_at = None
+
+    def page_loading(self):
+        """A new page is being loaded on purpose; it gets a fresh heartbeat grace period."""
+        self.last_heartbeat = None
+
+    def render_process_terminated(self, status, exit_code):
+        if QApplication.closingDown():
+            return
+        if self.killed_renderer:
+            self.killed_renderer = False
+            print(f"MapWatchdog: Hung render process stopped (status {status}, exit code {exit_code})")
+        else:
+            self.crashes.inc()
+            print(f"MapWatchdog: Render process terminated (status {status}, exit code {exit_code})")
+        self._failure()
+
+    # --- Detection and restart ---
+
+    def _check_heartbeat(self):
+        if self.restart_timer.isActive():
+            return
+        now = time.monotonic()
+        if not self.view.isVisible():
+            # Hidden pages get their timers throttled; only judge a page that is on screen
+            if self.last_heartbeat is not None:
+                self.last_heartbeat = now
+            return
+        if self.last_heartbeat is None:
+            self.last_heartbeat = now  # Grace period starts when the page first becomes visible
+            return
+        if now - self.last_heartbeat > HEARTBEAT_TIMEOUT_SEC:
+            self.hangs.inc()
+            print(f"MapWatchdog: No heartbeat for {now - self.last_heartbeat:.0f}s, restarting the map page")
+            self._kill_render_process()
+            self._failure()
+
+    def _kill_render_process(self):
+        # A wedged renderer may ignore navigation; killing it makes Qt start a fresh one
+        pid = self.view.page().renderProcessPid()
+        if pid > 0:
+            try:
+                os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+                self.killed_renderer = True
+            except OSError as e:
+                print(f"MapWatchdog: Could not kill render process {pid}: {e}")
+
+    def _failure(self):
+        if self.restart_timer.isActive():
+            return  # Already scheduled (a kill also reports a termination)
+        if self.failure_started is None:
+            self.failure_started = time.monotonic()
+        self.recovered_at = None
+        self.consecutive_failures += 1
+        delay = min(RESTART_BACKOFF_MAX_SEC, RESTART_BACKOFF_START_SEC * 2 ** (self.consecutive_failures - 1))
+        self.last_heartbeat = None
+        self.view.setHtml(
+            "<html><body style='font-family: sans-serif; background: #353535; color: #ddd; padding: 20px;'>"
+            f"<h2>Map renderer stopped</h2><p>Restarting in {delay:.1f}s "
+            f"(attempt {self.consecutive_failures})...</p></body></html>")
+        self.restart_timer.start(int(delay * 1000))
+
+    def _restart(self):
+        self.killed_renderer = False  # In case the kill was never reported
+        self.restarts.inc()
+        self.restart_callback()
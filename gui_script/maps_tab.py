@@ -1,17 +1,36 @@
 import sys
 import os
+import html
+import json
+import threading
+import time
 from pathlib import Path
 # Folium is not directly used to generate the HTML anymore, but the concept was inspired by it.
 # We are manually creating Leaflet HTML.
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QListWidget, QListWidgetItem, QSplitter, QSizePolicy,
-    QLineEdit
+    QLineEdit, QComboBox
 )
 from PyQt6.QtGui import QFont, QPalette, QColor
-from PyQt6.QtCore import Qt, QUrl
+from PyQt6.QtCore import Qt, QUrl, QTimer, pyqtSignal
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineProfile
+from PyQt6.QtWebChannel import QWebChannel
+
+from map_bridge import MapBridge, BRIDGE_JS
+from map_storage import TileStorageManager
+from coverage_index import CoverageIndex, MERGED_LAYER_JS
+from poi_store import PoiStore
+from marker_cluster import MarkerClusterIndex, ClusterViewDiff
+from road_graph import RoadGraph, graph_path_for_city
+from polyline_tools import PolylineSync
+from geocoder import Geocoder
+from map_metrics import MetricsRegistry, serve_metrics
+from map_watchdog import MapWatchdog
+from gps_track import (NmeaFileSource, SimulatedSource, TrackFileSource, TrackWriter, TrackDownsampler,
+                       PacedFeed, new_track_path, latest_track_path)
+from tile_prefetch import PrefetchPlanner, BlankTileStats
 
 
 # For remote debugging QWebEngineView (optional, but very helpful)
@@ -22,10 +41,12 @@ class MapsTab(QWidget):
     Displays a Leaflet map in a QWebEngineView, using locally stored
     OpenStreetMap tiles from city-specific folders.
     """
+    poiClustersBuilt = pyqtSignal(object)  # MarkerClusterIndex, from the worker thread that built it
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profile_store=None):
         super().__init__(parent)
         self.setObjectName("MapsTabWidgetCityTiles")
+        self.profile_store = profile_store  # The last view and shown place persist per driver
 
         self.current_map_html_file = None
 
@@ -35,6 +56,9 @@ class MapsTab(QWidget):
 
         # Base path for all city-specific tile sets
         self.base_tiles_path = self.base_project_gui_path / "media" / "maps" / "tiles_by_city"
+        abs_tiles_path_str = str(self.base_tiles_path.resolve()).replace(os.sep, '/')
+        # Ensure correct file:/// prefixing (Unix paths already start with '/')
+        self.tiles_base_url = f"file://{abs_tiles_path_str}" if abs_tiles_path_str.startswith('/') else f"file:///{abs_tiles_path_str}"
 
         self.local_leaflet_js_path = self.base_project_gui_path / "libs" / "leaflet" / "leaflet.js"
         self.local_leaflet_css_path = self.base_project_gui_path / "libs" / "leaflet" / "leaflet.css"
@@ -52,15 +76,126 @@ class MapsTab(QWidget):
         self.temp_maps_dir = self.script_dir / "temp_leaflet_maps"
         self.temp_maps_dir.mkdir(parents=True, exist_ok=True)
 
-        # Saved locations now include a 'city_folder' key
+        # Tile index used for quota enforcement; fed with tile views from the page
+        self.current_city_folder = None
+        try:
+            self.tile_storage = TileStorageManager(self.base_tiles_path)
+        except Exception as e:
+            print(f"Warning: Tile storage index unavailable: {e}")
+            self.tile_storage = None
+        # Which city tile set covers which coordinates, built once from the tile index
+        self.coverage_index = CoverageIndex([])
+        if self.tile_storage:
+            try:
+                self.coverage_index = CoverageIndex.from_storage(self.tile_storage)
+            except Exception as e:
+                print(f"Warning: Tile coverage index unavailable: {e}")
+        self.access_flush_timer = QTimer(self)
+        self.access_flush_timer.timeout.connect(self.flush_tile_access_stats)
+        self.access_flush_timer.start(30000)
+
+        # Viewport-driven prefetch; MAPS_PREFETCH=0 disables it to measure the baseline
+        self.prefetch_enabled = os.environ.get("MAPS_PREFETCH", "1") != "0"
+        self.prefetch_planner = PrefetchPlanner(tile_exists=self.local_tile_exists)
+        self.blank_tile_stats = BlankTileStats()
+        self.pending_viewport = None
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(150)  # Let a fling settle before planning
+        self.prefetch_timer.timeout.connect(self.run_prefetch)
+
+        # Offline POIs for the current view (side panel list + map markers)
+        try:
+            self.poi_store = PoiStore()
+        except Exception as e:
+            print(f"Warning: POI store unavailable: {e}")
+            self.poi_store = None
+        self.nearby_list_size = 20
+        self.poi_clusters = None  # Built once on a worker thread (seconds for 1M POIs); views only query it
+        self.poi_cluster_diff = None
+        self.poi_view = None  # Last page-reported viewport the POIs were refreshed for
+        self.poiClustersBuilt.connect(self.set_poi_clusters)
+        if self.poi_store:
+            threading.Thread(target=self.build_poi_clusters, args=(self.poi_store.db_path,),
+                             name="PoiClusters", daemon=True).start()
+        self.pending_poi_viewport = None
+        self.poi_timer = QTimer(self)
+        self.poi_timer.setSingleShot(True)
+        self.poi_timer.setInterval(200)
+        self.poi_timer.timeout.connect(self.refresh_nearby_pois)
+
+        # Offline routing over per-city road graphs (media/maps/routing/<city>.rgraph)
+        self.road_graphs = {}  # city -> RoadGraph, or None if the city has no graph
+        self.route_start = None
+        self.current_route = None
+        self.route_line = PolylineSync("route", style={"color": "#0078d7", "weight": 5, "opacity": 0.85})
+
+        # GPS track: live source (MAPS_GPS_NMEA=<log> replays a capture, else a simulated drive) or replay
+        self.track_feed = None
+        self.track_writer = None
+        self.track_downsampler = TrackDownsampler()
+        self.track_line = PolylineSync("track", style={"color": "#8a2be2", "weight": 4, "opacity": 0.8})
+        self.track_lock = threading.Lock()
+        self.pending_fixes = []  # Filled by the feed thread, drained on the GUI thread
+        self.track_timer = QTimer(self)
+        self.track_timer.setInterval(1000)  # Redraw rate for the track line, whatever the fix rate
+        self.track_timer.timeout.connect(self.update_track_display)
+
+        # Offline place search (media/maps/geocoder.idx, built with geocoder.py --build)
+        self.last_viewport = None
+        self.shown_place = None
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(60)  # Coalesce keystrokes while typing fast
+        self.search_timer.timeout.connect(self.run_place_search)
+
+        # The tile set for a location is picked from the coverage index by its coordinates;
+        # an explicit 'city_folder' key still wins if that folder has tiles
         self.saved_locations = {
-            "Istanbul Hagia Sophia": {"coords": (41.0086, 28.9800), "city_folder": "Istanbul", "popup": "Hagia Sophia"},
-            "Barcelona Sagrada Familia": {"coords": (41.4036, 2.1744), "city_folder": "Barcelona", "popup": "Sagrada Familia"},
-            "San Jose City Hall": {"coords": (37.3352, -121.8894), "city_folder": "SanJose_CA", "popup": "San Jose City Hall"}
+            "Istanbul Hagia Sophia": {"coords": (41.0086, 28.9800), "popup": "Hagia Sophia"},
+            "Barcelona Sagrada Familia": {"coords": (41.4036, 2.1744), "popup": "Sagrada Familia"},
+            "San Jose City Hall": {"coords": (37.3352, -121.8894), "popup": "San Jose City Hall"}
         }
-        self.default_city_folder = "Istanbul"  # Default city to show
+        self.fallback_city_folder = "Istanbul_Detailed"  # Used only when no tiles are indexed yet
         self.default_map_center = self.saved_locations.get("Istanbul Hagia Sophia", {}).get("coords", [41.0082, 28.9784])
         self.default_zoom = 12
+        self.page_args = {}  # Last generate_and_load_map arguments, reused when the page is restarted
+
+        # Map instrumentation; scrape with MAPS_METRICS_PORT=<port>, dump with MAPS_METRICS_DUMP=<file.json>
+        self.metrics = MetricsRegistry()
+        frame_buckets = (8, 16.7, 33.3, 50, 100, 250, 500, 1000)
+        self.page_loads = self.metrics.counter("map_page_loads_total", "Map page loads finished")
+        self.page_load_failures = self.metrics.counter("map_page_load_failures_total", "Map page loads that failed")
+        self.page_load_time = self.metrics.histogram("map_page_load_seconds", "Map page load start -> loadFinished")
+        self.first_tile_time = self.metrics.histogram("map_first_tile_seconds", "Page navigation -> first tile image shown")
+        self.tiles_requested = self.metrics.counter("map_tiles_requested_total", "Tile images Leaflet started loading")
+        self.tiles_served = self.metrics.counter("map_tiles_served_total", "Tile images shown")
+        self.tiles_missing = self.metrics.counter("map_tiles_missing_total", "Tiles that failed or have no coverage")
+        self.frame_time = self.metrics.histogram("map_frame_time_ms", "Page frame intervals while the map moves", frame_buckets)
+        self.tile_blank_time = self.metrics.histogram("map_tile_blank_ms", "Tile created -> image shown",
+                                                      (10, 25, 50, 100, 250, 500, 1000, 2500))
+        self.page_load_started = None
+        self.metrics_server = None
+        metrics_port = os.environ.get("MAPS_METRICS_PORT")
+        if metrics_port:
+            try:
+                self.metrics_server = serve_metrics(self.metrics, int(metrics_port))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not start metrics endpoint on port {metrics_port}: {e}")
+        self.metrics_dump_path = os.environ.get("MAPS_METRICS_DUMP")
+        self.metrics_dump_timer = QTimer(self)
+        self.metrics_dump_timer.setInterval(10000)
+        self.metrics_dump_timer.timeout.connect(self.dump_metrics)
+        if self.metrics_dump_path:
+            self.metrics_dump_timer.start()
+
+        try:
+            self.geocoder = Geocoder()
+        except (OSError, ValueError) as e:
+            print(f"Warning: Geocoder index unavailable: {e}")
+            self.geocoder = Geocoder(index_path=None)  # Saved locations stay searchable
+        self.geocoder.set_extra_entries((name, data["coords"][0], data["coords"][1])
+                                        for name, data in self.saved_locations.items())
 
         # --- UI Setup ---
         main_maps_layout = QHBoxLayout(self)
@@ -85,6 +220,19 @@ class MapsTab(QWidget):
         side_panel_layout.setContentsMargins(5, 5, 5, 5)
         side_panel_layout.setSpacing(5)
 
+        self.place_search_input = QLineEdit()
+        self.place_search_input.setObjectName("PlaceSearchInput")
+        self.place_search_input.setPlaceholderText("Search streets and places...")
+        self.place_search_input.setClearButtonEnabled(True)
+        self.place_search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.place_search_input.returnPressed.connect(self.open_first_search_result)
+        side_panel_layout.addWidget(self.place_search_input)
+        self.search_results_list = QListWidget()
+        self.search_results_list.setObjectName("PlaceSearchResults")
+        self.search_results_list.itemClicked.connect(self.handle_search_result_selected)
+        self.search_results_list.setVisible(False)
+        side_panel_layout.addWidget(self.search_results_list, 1)
+
         side_panel_layout.addWidget(QLabel("Saved Locations"))
         self.locations_list_widget = QListWidget()
         self.locations_list_widget.setObjectName("SavedLocationsList")
@@ -92,6 +240,46 @@ class MapsTab(QWidget):
         self.locations_list_widget.itemClicked.connect(self.handle_location_selected)
         side_panel_layout.addWidget(self.locations_list_widget, 1)
 
+        side_panel_layout.addWidget(QLabel("Nearby Places"))
+        self.nearby_list_widget = QListWidget()
+        self.nearby_list_widget.setObjectName("NearbyPlacesList")
+        self.nearby_list_widget.itemClicked.connect(self.handle_nearby_selected)
+        side_panel_layout.addWidget(self.nearby_list_widget, 1)
+
+        side_panel_layout.addWidget(QLabel("Route"))
+        self.route_status_label = QLabel("Right-click the map to set a start, then a destination.")
+        self.route_status_label.setObjectName("RouteStatusLabel")
+        self.route_status_label.setWordWrap(True)
+        side_panel_layout.addWidget(self.route_status_label)
+        self.clear_route_button = QPushButton("Clear Route")
+        self.clear_route_button.setObjectName("ClearRouteButton")
+        self.clear_route_button.clicked.connect(self.clear_route)
+        side_panel_layout.addWidget(self.clear_route_button)
+
+        side_panel_layout.addWidget(QLabel("Track"))
+        self.track_status_label = QLabel("No track recording.")
+        self.track_status_label.setObjectName("TrackStatusLabel")
+        self.track_status_label.setWordWrap(True)
+        side_panel_layout.addWidget(self.track_status_label)
+        track_buttons_layout = QHBoxLayout()
+        self.record_track_button = QPushButton("Record")
+        self.record_track_button.setObjectName("RecordTrackButton")
+        self.record_track_button.setCheckable(True)
+        self.record_track_button.toggled.connect(self.toggle_track_recording)
+        track_buttons_layout.addWidget(self.record_track_button)
+        self.replay_track_button = QPushButton("Replay")
+        self.replay_track_button.setObjectName("ReplayTrackButton")
+        self.replay_track_button.setCheckable(True)
+        self.replay_track_button.toggled.connect(self.toggle_track_replay)
+        track_buttons_layout.addWidget(self.replay_track_button)
+        self.replay_speed_combo = QComboBox()
+        self.replay_speed_combo.setObjectName("ReplaySpeedCombo")
+        for speed in (1, 10, 60, 300):
+            self.replay_speed_combo.addItem(f"{speed}x", speed)
+        self.replay_speed_combo.setCurrentIndex(1)
+        track_buttons_layout.addWidget(self.replay_speed_combo)
+        side_panel_layout.addLayout(track_buttons_layout)
+
         self.maps_splitter.addWidget(self.locations_side_panel)
 
         map_content_panel = QWidget()
@@ -106,9 +294,21 @@ class MapsTab(QWidget):
         profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies)
 
         self.map_view.loadFinished.connect(self.on_map_load_finished)
-        self.map_view.loadStarted.connect(lambda: print("MapView: Load started..."))
+        self.map_view.loadStarted.connect(self.handle_load_started)
         self.map_view.renderProcessTerminated.connect(self.handle_render_process_terminated)
-        self.map_view.loadProgress.connect(lambda progress: print(f"MapView: Load progress: {progress}%"))
+        self.watchdog = MapWatchdog(self.map_view, self.restore_map_page, self.metrics, self)
+
+        # Page -> Python bridge (tile views now, more map events later)
+        self.map_bridge = MapBridge(self)
+        self.map_bridge.tilesViewed.connect(self.handle_tiles_viewed)
+        self.map_bridge.viewportChanged.connect(self.handle_viewport_changed)
+        self.map_bridge.blankTimesReported.connect(self.handle_blank_times)
+        self.map_bridge.routePointPicked.connect(self.handle_route_point)
+        self.map_bridge.heartbeatReceived.connect(self.watchdog.heartbeat)
+        self.map_bridge.pageStatsReported.connect(self.handle_page_stats)
+        self.web_channel = QWebChannel(self.map_view.page())
+        self.web_channel.registerObject("mapBridge", self.map_bridge)
+        self.map_view.page().setWebChannel(self.web_channel)
 
         map_view_layout.addWidget(self.map_view, 1)
 
@@ -117,24 +317,77 @@ class MapsTab(QWidget):
 
         main_maps_layout.addWidget(self.maps_splitter)
 
-        self.generate_and_load_map(
-            city_folder=self.default_city_folder,
-            location=self.default_map_center,
-            zoom_start=self.default_zoom,
-            popup_text="Welcome to İstanbul!"
-        )
+        if self.profile_store and self.profile_store.get("map"):
+            self.apply_driver_profile()
+        else:
+            self.generate_and_load_map(
+                location=self.default_map_center,
+                zoom_start=self.default_zoom,
+                popup_text="Welcome to İstanbul!"
+            )
 
     def handle_render_process_terminated(self, terminationStatus, exitCode):
-        print(f"CRITICAL: QWebEngineView render process terminated!")
-        print(f"  Termination Status: {terminationStatus}")
-        print(f"  Exit Code: {exitCode}")
-        self.map_view.setHtml(
-            f"<h1 style='color:red;'>Map Renderer Crashed</h1><p>Status: {terminationStatus}, Exit Code: {exitCode}</p>")
+        # The watchdog shows a notice and restarts the page with backoff
+        self.watchdog.render_process_terminated(terminationStatus, exitCode)
+
+    def restore_map_page(self):
+        """Reloads the map after a renderer crash or hang, at the last view the page reported."""
+        args = dict(self.page_args)
+        view = self.last_viewport
+        if view:
+            args["location"] = (view["lat"], view["lon"])
+            args["zoom_start"] = view["zoom"]
+            args["city_folder"] = self.current_city_folder
+        if self.shown_place:
+            lat, lon, name = self.shown_place
+            args["popup_text"], args["marker_location"] = html.escape(name), (lat, lon)
+        print(f"MapView: Restoring map page at {args.get('location')} z{args.get('zoom_start')}")
+        self.generate_and_load_map(**args)
+
+    # --- Instrumentation ---
+
+    def handle_load_started(self):
+        self.page_load_started = time.monotonic()
+
+    def handle_page_stats(self, stats):
+        self.tiles_requested.inc(stats.get("requested", 0))
+        self.tiles_served.inc(stats.get("served", 0))
+        self.tiles_missing.inc(stats.get("missing", 0))
+        if stats.get("firstTileMs") is not None:
+            self.first_tile_time.observe(stats["firstTileMs"] / 1000.0)
+        for frame_ms in stats.get("frames", ()):
+            self.frame_time.observe(frame_ms)
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot()
+
+    def dump_metrics(self):
+        if not self.metrics_dump_path:
+            return
+        try:
+            self.metrics.dump_json(self.metrics_dump_path)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.metrics_dump_path}: {e}")
 
     def on_map_load_finished(self, success):
         page_url_str = self.map_view.url().toString()
+        # Only generated map pages count; the watchdog's notice and error pages are set with setHtml
+        if self.page_load_started is not None and self.map_view.url().isLocalFile():
+            self.page_loads.inc()
+            if success:
+                self.page_load_time.observe(time.monotonic() - self.page_load_started)
+            else:
+                self.page_load_failures.inc()
+        self.page_load_started = None
         if success:
             print(f"MapView: Map HTML loaded successfully: {page_url_str}")
+            # A new page starts without the route layer
+            if self.current_route:
+                self.show_route(self.current_route)
+            elif self.route_start:
+                self.map_view.page().runJavaScript(f"showRouteEnds([{self.route_start[0]}, {self.route_start[1]}], null);")
+            if self.track_downsampler.lats:
+                self.show_track()
         else:
             print(f"MapView: Map HTML FAILED to load: {page_url_str}")
             current_file_str = str(
@@ -148,38 +401,392 @@ class MapsTab(QWidget):
             </body></html>"""
             self.map_view.setHtml(error_html)
 
-    def generate_and_load_map(self, city_folder, location=None, zoom_start=None, popup_text=None, marker_location=None):
+    def handle_tiles_viewed(self, tiles):
+        if not self.tile_storage:
+            return
+        tiles_by_city = {}
+        for city, z, x, y in tiles:
+            city = city if city and city != "null" else self.current_city_folder
+            if city:
+                tiles_by_city.setdefault(city, []).append((z, x, y))
+        for city, city_tiles in tiles_by_city.items():
+            self.tile_storage.record_access(city, city_tiles)
+
+    def flush_tile_access_stats(self):
+        if self.tile_storage:
+            self.tile_storage.flush_access()
+
+    # --- City Selection ---
+
+    def resolve_city_folder(self, lat, lon, requested=None):
+        """Tile set to centre on: the requested folder if it exists, else the best coverage at lat/lon."""
+        if requested and requested in self.coverage_index.cities:
+            return requested
+        city = self.coverage_index.best_city(lat, lon)
+        if city:
+            return city
+        if requested and (self.base_tiles_path / requested).is_dir():
+            return requested
+        ranked = self.coverage_index.ranked_cities()
+        return ranked[0].name if ranked else self.fallback_city_folder
+
+    def tile_source_city(self, z, x, y):
+        if self.coverage_index.cities:
+            return self.coverage_index.city_for_tile(z, x, y, preferred=self.current_city_folder)
+        return self.current_city_folder
+
+    # --- Viewport Prefetch ---
+
+    def local_tile_exists(self, z, x, y):
+        city = self.tile_source_city(z, x, y)
+        if not city:
+            return False
+        return (self.base_tiles_path / city / str(z) / str(x) / f"{y}.png").exists()
+
+    def handle_viewport_changed(self, viewport):
+        # A newer view supersedes any plan still waiting; the page already cancelled its own queue
+        self.pending_viewport = viewport
+        self.last_viewport = viewport
+        if self.prefetch_enabled:
+            self.prefetch_timer.start()
+        self.pending_poi_viewport = viewport
+        self.poi_timer.start()
+        self.store_map_state()
+
+    def run_prefetch(self):
+        if not self.pending_viewport or not self.current_city_folder:
+            return
+        tiles = self.prefetch_planner.plan(self.pending_viewport)
+        self.pending_viewport = None
+        if not tiles:
+            return
+        urls = [f"{self.tiles_base_url}/{self.tile_source_city(z, x, y)}/{z}/{x}/{y}.png" for z, x, y in tiles]
+        self.map_view.page().runJavaScript(f"prefetchTiles({json.dumps(urls)});")
+
+    # --- Nearby POIs ---
+
+    def refresh_nearby_pois(self):
+        view = self.pending_poi_viewport
+        self.pending_poi_viewport = None
+        if not view or not self.poi_store:
+            return
+        center_lat, center_lon = view["lat"], view["lon"]
+        nearby = self.poi_store.nearest(center_lat, center_lon, self.nearby_list_size)
+        self.nearby_list_widget.clear()
+        for distance, poi_id, name, category, lat, lon in nearby:
+            item = QListWidgetItem(f"{name} ({distance:.0f} m)")
+            item.setToolTip(category)
+            item.setData(Qt.ItemDataRole.UserRole, (poi_id, lat, lon))
+            self.nearby_list_widget.addItem(item)
+
+        self.poi_view = view
+        self.update_poi_clusters(view)
+
+    def build_poi_clusters(self, db_path):
+        # Worker thread, on its own connection: SQLite connections stay on the thread that opened them
+        started = time.perf_counter()
+        try:
+            store = PoiStore(db_path)
+            try:
+                clusters = MarkerClusterIndex.from_poi_store(store)
+            finally:
+                store.close()
+        except Exception as e:
+            print(f"Warning: Could not build POI clusters: {e}")
+            return
+        print(f"POI clusters: {clusters.size} POIs indexed in {time.perf_counter() - started:.1f}s")
+        self.poiClustersBuilt.emit(clusters)
+
+    def set_poi_clusters(self, clusters):
+        self.poi_clusters = clusters
+        self.poi_cluster_diff = ClusterViewDiff(clusters)
+        if self.poi_view and self.page_load_started is None:
+            self.update_poi_clusters(self.poi_view)  # A loading page gets them with its first viewport
+
+    def update_poi_clusters(self, view):
+        """Sends the page only the clusters that entered or left the view since the last update."""
+        if self.poi_cluster_diff is None:
+            return  # Still being built; set_poi_clusters() sends the current view once it is ready
+        reset, added, removed = self.poi_cluster_diff.update(view)
+        if not (reset or added or removed):
+            return
+        names = self.poi_store.names(row[4] for row in added if row[3] == 1)
+        for row in added:
+            row.append(html.escape(names.get(row[4], "")))  # Popups take HTML; names are plain text
+        self.map_view.page().runJavaScript(
+            f"updateClusters({json.dumps(reset)}, {json.dumps(added)}, {json.dumps(removed)});")
+
+    def handle_nearby_selected(self, item):
+        poi_id, lat, lon = item.data(Qt.ItemDataRole.UserRole)
+        # Zoom past the clustered levels so the POI has its own marker
+        focus_zoom = self.poi_clusters.max_zoom + 1 if self.poi_clusters else 17
+        self.map_view.page().runJavaScript(f"focusPoi({poi_id}, {lat}, {lon}, {focus_zoom});")
+
+    # --- Place Search ---
+
+    def run_place_search(self):
+        query = self.place_search_input.text().strip()
+        self.search_results_list.clear()
+        if not query:
+            self.search_results_list.setVisible(False)
+            return
+        view = self.last_viewport
+        near = (view["lat"], view["lon"]) if view else tuple(self.default_map_center)
+        for result in self.geocoder.search(query, limit=12, near=near):
+            item = QListWidgetItem(result.label)
+            item.setData(Qt.ItemDataRole.UserRole, (result.name, result.lat, result.lon))
+            self.search_results_list.addItem(item)
+        if not self.search_results_list.count():
+            self.search_results_list.addItem(QListWidgetItem("No matches"))
+        self.search_results_list.setVisible(True)
+
+    def open_first_search_result(self):
+        self.search_timer.stop()
+        self.run_place_search()
+        first = self.search_results_list.item(0)
+        if first and first.data(Qt.ItemDataRole.UserRole):
+            self.handle_search_result_selected(first)
+
+    def handle_search_result_selected(self, item):
+        data = item.data(Qt.ItemDataRole.UserRole)
+        if not data:
+            return
+        name, lat, lon = data
+        self.shown_place = (lat, lon, name)
+        self.store_map_state()
+        self.map_view.page().runJavaScript(f"showPlace({lat}, {lon}, {json.dumps(html.escape(name))});")
+
+    # --- Driver Profile ---
+
+    def store_map_state(self):
+        # Called on every pan; the store only writes once the map has been still for a while
+        if self.profile_store:
+            self.profile_store.set("map", {"viewport": self.last_viewport, "city": self.current_city_folder,
+                                           "place": list(self.shown_place) if self.shown_place else None})
+
+    def apply_driver_profile(self):
+        """
+        Moves the map to the current driver's last view and shown place. Within
+        the loaded city this is one script call on the live page; only another
+        city needs the page regenerated.
         """
-        Generates an HTML file with a Leaflet map pointing to local tiles for a specific city
-        and local Leaflet assets, then loads it into the QWebEngineView.
+        state = self.profile_store.get("map") or {}
+        view = state.get("viewport") or {"lat": self.default_map_center[0], "lon": self.default_map_center[1],
+                                         "zoom": self.default_zoom}
+        place = tuple(state["place"]) if state.get("place") else None
+        city = self.resolve_city_folder(view["lat"], view["lon"], state.get("city"))
+        self.last_viewport, self.shown_place = view, place
+        if city != self.current_city_folder or self.page_load_started is not None:
+            args = {"city_folder": city, "location": (view["lat"], view["lon"]), "zoom_start": view["zoom"]}
+            if place:
+                args["popup_text"], args["marker_location"] = html.escape(place[2]), place[:2]
+            self.generate_and_load_map(**args)
+            return
+        script = f"map.closePopup(); map.setView([{view['lat']}, {view['lon']}], {view['zoom']}, {{animate: false}});"
+        if place:
+            script += (f" L.popup({{autoPan: false}}).setLatLng([{place[0]}, {place[1]}])"
+                       f".setContent({json.dumps(html.escape(place[2]))}).openOn(map);")
+        self.map_view.page().runJavaScript(script)
+
+    # --- Offline Routing ---
+
+    def road_graph_for_city(self, city_folder):
+        if city_folder not in self.road_graphs:
+            graph_path = graph_path_for_city(city_folder)
+            graph = None
+            if graph_path.exists():
+                try:
+                    graph = RoadGraph(graph_path)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Could not open road graph {graph_path}: {e}")
+            self.road_graphs[city_folder] = graph
+        return self.road_graphs[city_folder]
+
+    def handle_route_point(self, lat, lon):
+        if self.route_start is None:
+            self.route_start = (lat, lon)
+            # The old line stays until the new route replaces it, so a similar route only sends its changes
+            self.map_view.page().runJavaScript(f"showRouteEnds([{lat}, {lon}], null);")
+            self.route_status_label.setText("Start set. Right-click the destination.")
+            return
+        start, self.route_start = self.route_start, None
+        city_folder = self.resolve_city_folder(lat, lon, self.current_city_folder)
+        graph = self.road_graph_for_city(city_folder)
+        if graph is None:
+            self.route_status_label.setText(f"No road graph for {city_folder}. "
+                                            f"Build one with road_graph.py --build <extract.osm> --city {city_folder}")
+            self.hide_route()
+            return
+        route = graph.route(start[0], start[1], lat, lon)
+        if route is None:
+            self.route_status_label.setText("No route found between those points.")
+            self.hide_route()
+            return
+        self.current_route = route
+        self.route_status_label.setText(route.summary())
+        self.show_route(route)
+        print(f"Route in {city_folder}: {route.summary()}, {route.settled} nodes settled")
+
+    def show_route(self, route):
+        """Sends the route as an encoded, zoom-leveled polyline; a recomputed route only sends what changed."""
+        lats = [lat for lat, _ in route.points]
+        lons = [lon for _, lon in route.points]
+        script = self.route_line.update_script(lats, lons)
+        if script:
+            self.map_view.page().runJavaScript(script)
+        start, end = route.points[0], route.points[-1]
+        self.map_view.page().runJavaScript(f"showRouteEnds([{start[0]}, {start[1]}], [{end[0]}, {end[1]}]);")
+
+    def hide_route(self):
+        self.map_view.page().runJavaScript(self.route_line.clear_script())
+        self.map_view.page().runJavaScript("showRouteEnds(null, null);")
+
+    def clear_route(self):
+        self.route_start = None
+        self.current_route = None
+        self.route_status_label.setText("Right-click the map to set a start, then a destination.")
+        self.hide_route()
+
+    # --- GPS Track ---
+
+    def gps_source(self):
+        nmea_path = os.environ.get("MAPS_GPS_NMEA")
+        if nmea_path:
+            return NmeaFileSource(nmea_path)
+        view = self.last_viewport
+        lat, lon = (view["lat"], view["lon"]) if view else self.default_map_center
+        return SimulatedSource(lat, lon, duration_sec=12 * 3600)
+
+    def toggle_track_recording(self, checked):
+        if not checked:
+            self.stop_track_feed()
+            return
+        self.replay_track_button.setChecked(False)
+        self.start_track_feed(self.gps_source(), speed=1.0, record_path=new_track_path())
+
+    def toggle_track_replay(self, checked):
+        if not checked:
+            self.stop_track_feed()
+            return
+        track_path = latest_track_path()
+        if track_path is None:
+            self.track_status_label.setText("No recorded track to replay.")
+            self.replay_track_button.setChecked(False)
+            return
+        self.record_track_button.setChecked(False)
+        self.start_track_feed(TrackFileSource(track_path), speed=self.replay_speed_combo.currentData())
+
+    def start_track_feed(self, source, speed, record_path=None):
+        self.stop_track_feed()
+        self.track_downsampler.clear()
+        self.map_view.page().runJavaScript(self.track_line.clear_script())
+        self.map_view.page().runJavaScript("hideVehicle();")
+        if record_path:
+            try:
+                self.track_writer = TrackWriter(record_path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not record track to {record_path}: {e}")
+                self.track_status_label.setText(f"Cannot record to {record_path.name}: {e}")
+                return
+            self.track_status_label.setText(f"Recording to {record_path.name}")
+        else:
+            self.track_status_label.setText(f"Replaying at {speed}x")
+        self.track_feed = PacedFeed(source, self.queue_track_fix, speed=speed,
+                                    on_finished=self.close_track_writer).start()
+        self.track_timer.start()
+
+    def stop_track_feed(self):
+        if self.track_feed:
+            self.track_feed.stop()  # Joins the feed thread, which closes the writer on its way out
+            self.track_feed = None
+        self.update_track_display()
+        self.track_timer.stop()
+
+    def queue_track_fix(self, fix):
+        # Feed thread: the writer is only touched here and in close_track_writer, both on that thread
+        if self.track_writer:
+            self.track_writer.append(fix)
+        with self.track_lock:
+            self.pending_fixes.append(fix)
+
+    def close_track_writer(self):
+        writer, self.track_writer = self.track_writer, None
+        if writer:
+            writer.close()
+            print(f"Track saved: {writer.path} ({writer.count} fixes)")
+
+    def update_track_display(self):
+        with self.track_lock:
+            fixes, self.pending_fixes = self.pending_fixes, []
+        if not fixes:
+            if self.track_feed and not self.track_feed.is_running():
+                self.track_status_label.setText("Track source finished.")
+                self.track_feed = None
+                self.track_timer.stop()
+                self.record_track_button.setChecked(False)
+                self.replay_track_button.setChecked(False)
+            return
+        changed = False
+        for fix in fixes:
+            changed = self.track_downsampler.add(fix) or changed
+        if changed:
+            self.show_track()
+        last = self.track_downsampler.last_fix
+        self.map_view.page().runJavaScript(f"showVehicle({last.lat}, {last.lon}, true);")
+
+    def show_track(self):
+        script = self.track_line.update_script(self.track_downsampler.lats, self.track_downsampler.lons)
+        if script:
+            self.map_view.page().runJavaScript(script)
+
+    def handle_blank_times(self, samples_ms):
+        self.blank_tile_stats.record(samples_ms, self.prefetch_enabled)
+        for sample in samples_ms:
+            self.tile_blank_time.observe(sample)
+
+    def blank_tile_summary(self):
+        """Blank-tile-visible time with prefetch on vs off (see MAPS_PREFETCH)."""
+        return self.blank_tile_stats.summary()
+
+    def generate_and_load_map(self, city_folder=None, location=None, zoom_start=None, popup_text=None, marker_location=None):
         """
+        Generates an HTML file with a Leaflet map pointing to local tiles and local Leaflet
+        assets, then loads it into the QWebEngineView. With a coverage index every downloaded
+        city is served as one merged layer, preferring city_folder (resolved from the
+        coordinates if not given) where tile sets overlap.
+        """
+        self.page_args = {"city_folder": city_folder, "location": location, "zoom_start": zoom_start,
+                          "popup_text": popup_text, "marker_location": marker_location}
         center_lat = location[0] if location else self.default_map_center[0]
         center_lon = location[1] if location else self.default_map_center[1]
         current_zoom = zoom_start if zoom_start is not None else self.default_zoom
-
-        # Construct the local tile URL for the specific city
-        city_tile_path = self.base_tiles_path / city_folder
-        abs_city_tile_path_str = str(city_tile_path.resolve()).replace(os.sep, '/')
-
-        # Ensure correct file:/// prefixing
-        if abs_city_tile_path_str.startswith('/'):  # For Unix-like paths
-            tile_layer_url = f"file://{abs_city_tile_path_str}/{{z}}/{{x}}/{{y}}.png"
-        else:  # For Windows paths (e.g., C:/...)
-            tile_layer_url = f"file:///{abs_city_tile_path_str}/{{z}}/{{x}}/{{y}}.png"
-
-        print(f"Using tile layer URL for {city_folder}: {tile_layer_url}")
+        city_folder = self.resolve_city_folder(center_lat, center_lon, city_folder)
+
+        if self.coverage_index.cities:
+            tile_sources = self.coverage_index.leaflet_sources(preferred=city_folder)
+            tile_layer_js = f"""var tileSources = {json.dumps(tile_sources)};
+                var tileBaseUrl = '{self.tiles_base_url}';
+                {MERGED_LAYER_JS}
+                var tileLayer = new MergedTileLayer('', {{"""
+            print(f"Using merged tile layer over {len(self.coverage_index.cities)} cities, preferring {city_folder}")
+        else:
+            tile_layer_url = f"{self.tiles_base_url}/{city_folder}/{{z}}/{{x}}/{{y}}.png"
+            tile_layer_js = f"""function tileSourceCity(coords) {{ return '{city_folder}'; }}
+                var tileLayer = L.tileLayer('{tile_layer_url}', {{"""
+            print(f"Using tile layer URL for {city_folder}: {tile_layer_url}")
 
         js_url_for_html = self.leaflet_js_url
         css_url_for_html = self.leaflet_css_url
 
         marker_js_snippet = ""
+        if popup_text:
+            # popup_text is popup HTML; as a JS string literal that cannot end the page's <script> early
+            popup_js = json.dumps(popup_text.replace("\n", "<br>")).replace("</", "<\\/")
         if marker_location and popup_text:
             marker_lat, marker_lon = marker_location
-            escaped_popup_text = popup_text.replace("'", "\\'").replace("\n", "<br>")
-            marker_js_snippet = f"L.marker([{marker_lat}, {marker_lon}]).addTo(map).bindPopup('{escaped_popup_text}').openPopup();"
+            marker_js_snippet = f"L.marker([{marker_lat}, {marker_lon}]).addTo(map).bindPopup({popup_js}).openPopup();"
         elif popup_text and location:
-            escaped_popup_text = popup_text.replace("'", "\\'").replace("\n", "<br>")
-            marker_js_snippet = f"map.openPopup('{escaped_popup_text}', [{center_lat}, {center_lon}]);"
+            marker_js_snippet = f"map.openPopup({popup_js}, [{center_lat}, {center_lon}]);"
 
         html_content = f"""
         <!DOCTYPE html>
@@ -190,18 +797,22 @@ class MapsTab(QWidget):
             <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
             <link rel="stylesheet" href="{css_url_for_html}" />
             <script src="{js_url_for_html}"></script>
-            <style>html, body, #map_div {{ height: 100%; width: 100%; margin: 0; padding: 0; background-color: #ddd; }}</style>
+            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+            <style>html, body, #map_div {{ height: 100%; width: 100%; margin: 0; padding: 0; background-color: #ddd; }}
+                .poi-cluster div {{ width: 100%; height: 100%; border-radius: 50%; background: rgba(0, 120, 215, 0.75);
+                                    color: #fff; font: bold 12px sans-serif; display: flex; align-items: center; justify-content: center; }}</style>
         </head>
         <body>
             <div id="map_div"></div>
             <script>
                 var map = L.map('map_div', {{ preferCanvas: true }}).setView([{center_lat}, {center_lon}], {current_zoom});
-                L.tileLayer('{tile_layer_url}', {{
+                {tile_layer_js}
                     attribution: '&copy; OpenStreetMap contributors',
                     minZoom: 1, maxZoom: 18, noWrap: true,
                 }}).addTo(map);
                 {marker_js_snippet}
                 L.control.scale({{imperial: false}}).addTo(map);
+                {BRIDGE_JS}
             </script>
         </body>
         </html>
@@ -226,6 +837,15 @@ class MapsTab(QWidget):
                 self.map_view.setHtml(f"<h1>Error</h1><p>Map HTML file not found.</p>")
                 return
 
+            self.flush_tile_access_stats()  # Views so far belong to the previous city
+            self.current_city_folder = city_folder
+            self.prefetch_timer.stop()
+            self.poi_timer.stop()
+            if self.poi_cluster_diff:
+                self.poi_cluster_diff.reset()  # New page starts with an empty cluster layer
+            self.route_line.reset()
+            self.track_line.reset()
+            self.watchdog.page_loading()
             self.map_view.setUrl(map_qurl)
             print(f"Offline map HTML generated for {city_folder}: {self.current_map_html_file}. Attempted to load.")
 
@@ -250,14 +870,14 @@ class MapsTab(QWidget):
         location_name = item.text()
         location_data = item.data(Qt.ItemDataRole.UserRole)
 
-        if isinstance(location_data, dict) and "coords" in location_data and "city_folder" in location_data:
+        if isinstance(location_data, dict) and "coords" in location_data:
             coords = location_data["coords"]
-            city_folder = location_data["city_folder"]
             popup = location_data.get("popup", location_name)  # Use location name as popup if not specified
             if isinstance(coords, tuple) and len(coords) == 2:
-                self.generate_and_load_map(city_folder=city_folder, location=coords, zoom_start=13, popup_text=popup,
-                                           marker_location=coords)
-                print(f"Map centering on: {location_name} in {city_folder} at {coords}")
+                self.shown_place = None
+                self.generate_and_load_map(city_folder=location_data.get("city_folder"), location=coords, zoom_start=13,
+                                           popup_text=popup, marker_location=coords)
+                print(f"Map centering on: {location_name} in {self.current_city_folder} at {coords}")
             else:
                 print(f"Invalid coordinates format for location: {location_name}")
         else:
@@ -281,6 +901,10 @@ if __name__ == '__main__':
 
 
     def cleanup_temp_maps_on_exit():
+        print(f"Blank tile time: {maps_tab_widget.blank_tile_summary()}")
+        print(f"Map metrics: {json.dumps(maps_tab_widget.metrics_snapshot())}")
+        maps_tab_widget.dump_metrics()
+        maps_tab_widget.stop_track_feed()  # Closes (and fsyncs) a track still being recorded
         if hasattr(maps_tab_widget, 'current_map_html_file') and maps_tab_widget.current_map_html_file:
             if maps_tab_widget.current_map_html_file.exists():
                 try:
@@ -0,0 +1,164 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from tile_selection import deg2frac_array
+
+# --- Constants ---
+CLUSTER_CELL_SHIFT = 2       # Grid cells are 256 px >> 2 = 64 px on screen
+MIN_CLUSTER_ZOOM = 1
+MAX_CLUSTER_ZOOM = 16        # Above this every marker is shown on its own
+MAX_CLUSTERS_PER_VIEW = 1500
+
+
+class _Level:
+    """Clusters of one zoom level, sorted by grid column for viewport range queries."""
+
+    def __init__(self, cx, cy, lat, lon, count, ids, keys):
+        order = np.lexsort((cy, cx))
+        self.cx, self.cy = cx[order], cy[order]
+        self.lat, self.lon = lat[order], lon[order]
+        self.count, self.ids, self.keys = count[order], ids[order], keys[order]
+
+    def __len__(self):
+        return len(self.cx)
+
+
+class MarkerClusterIndex:
+    """
+    Grid clustering of markers for every zoom level, built once in NumPy.
+    The finest level groups points into 64 px cells at MAX_CLUSTER_ZOOM; each
+    coarser level merges the 2x2 child cells of the level below, so cluster
+    counts and centroids nest across zooms. Beyond MAX_CLUSTER_ZOOM points are
+    returned individually.
+    """
+
+    def __init__(self, ids, lats, lons, min_zoom=MIN_CLUSTER_ZOOM, max_zoom=MAX_CLUSTER_ZOOM):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.size = len(ids)
+        self.levels = {}
+
+        fx, fy = deg2frac_array(lats, lons, 0)  # World fractions in [0, 1)
+        cells = float(1 << (max_zoom + CLUSTER_CELL_SHIFT))
+        cx = np.clip(np.floor(fx * cells), 0, cells - 1).astype(np.int64)
+        cy = np.clip(np.floor(fy * cells), 0, cells - 1).astype(np.int64)
+
+        # Individual points: one "cluster" per marker, keyed by marker id
+        ones = np.ones(self.size, dtype=np.int64)
+        self.levels[max_zoom + 1] = _Level(cx, cy, lats, lons, ones, ids, ids)
+
+        # Sums rather than means so parent levels can be folded from their children
+        lat_sum, lon_sum, count = lats, lons, ones
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            cell_keys = (cx << 32) | cy
+            unique_keys, first, inverse = np.unique(cell_keys, return_index=True, return_inverse=True)
+            count_next = np.bincount(inverse, weights=count).astype(np.int64)
+            lat_sum = np.bincount(inverse, weights=lat_sum)
+            lon_sum = np.bincount(inverse, weights=lon_sum)
+            ids = ids[first]  # Only meaningful where the count is 1
+            cx, cy, count = cx[first], cy[first], count_next
+            self.levels[zoom] = _Level(cx, cy, lat_sum / count, lon_sum / count, count,
+                                       np.where(count == 1, ids, -1), unique_keys)
+            cx, cy = cx >> 1, cy >> 1
+
+    @classmethod
+    def from_poi_store(cls, store, **kwargs):
+        rows = np.array(store.points(), dtype=np.float64).reshape(-1, 3)
+        return cls(rows[:, 0].astype(np.int64), rows[:, 1], rows[:, 2], **kwargs)
+
+    def level_zoom(self, zoom):
+        return int(min(max(zoom, self.min_zoom), self.max_zoom + 1))
+
+    def query(self, view, limit=MAX_CLUSTERS_PER_VIEW):
+        """
+        Clusters inside a viewport dict (zoom, west, south, east, north), padded
+        by one cell, as [key, lat, lon, count, marker_id or -1]. If over the
+        limit, the largest clusters are kept.
+        """
+        level_zoom = self.level_zoom(view["zoom"])
+        level = self.levels[level_zoom]
+        if not len(level):
+            return []
+        cells = 1 << (min(level_zoom, self.max_zoom) + CLUSTER_CELL_SHIFT)
+        shift = 1 if level_zoom <= self.max_zoom else 0  # Point level shares the finest grid
+        (west, east), (north, south) = deg2frac_array([view["north"], view["south"]], [view["west"], view["east"]], 0)
+        x_min, x_max = int(west * cells) - shift, int(east * cells) + shift
+        y_min, y_max = int(north * cells) - shift, int(south * cells) + shift
+
+        start, stop = np.searchsorted(level.cx, [x_min, x_max + 1])
+        rows = np.arange(start, stop)
+        rows = rows[(level.cy[rows] >= y_min) & (level.cy[rows] <= y_max)]
+        if len(rows) > limit:
+            rows = rows[np.argsort(-level.count[rows], kind="stable")[:limit]]
+        return [[int(level.keys[i]), float(level.lat[i]), float(level.lon[i]), int(level.count[i]), int(level.ids[i])]
+                for i in rows]
+
+
+class ClusterViewDiff:
+    """
+    Tracks which clusters the page already shows, so a pan only sends the
+    clusters that entered the view and the keys that left it. Moving to a
+    different cluster level resets the page's layer.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.shown_level = None
+        self.shown_keys = set()
+
+    def reset(self):
+        self.shown_level = None
+        self.shown_keys = set()
+
+    def update(self, view):
+        """Returns (reset, added_rows, removed_keys)."""
+        level_zoom = self.index.level_zoom(view["zoom"])
+        rows = self.index.query(view)
+        keys = {row[0] for row in rows}
+        if level_zoom != self.shown_level:
+            reset, added, removed = True, rows, []
+        else:
+            reset = False
+            added = [row for row in rows if row[0] not in self.shown_keys]
+            removed = list(self.shown_keys - keys)
+        self.shown_level = level_zoom
+        self.shown_keys = keys
+        return reset, added, removed
+
+
+# --- Benchmark ---
+
+def benchmark(count, seed=1):
+    rng = np.random.default_rng(seed)
+    lats = 41.0082 + rng.normal(0, 0.3, count)
+    lons = 28.9784 + rng.normal(0, 0.3, count)
+    started = time.perf_counter()
+    index = MarkerClusterIndex(np.arange(count), lats, lons)
+    print(f"Built cluster index over {count} markers in {time.perf_counter() - started:.2f}s")
+    for zoom in (8, 11, 13, 15, 17):
+        span = 360.0 / (1 << zoom) * 3  # About a 3x2 tile viewport
+        view = {"zoom": zoom, "west": 28.9784 - span / 2, "east": 28.9784 + span / 2,
+                "south": 41.0082 - span / 3, "north": 41.0082 + span / 3}
+        t0 = time.perf_counter()
+        rows = index.query(view)
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        print(f"z{zoom:>2}: {len(rows):>5} clusters covering {sum(row[3] for row in rows):>7} markers "
+              f"in {elapsed_ms:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark marker clustering on synthetic markers.")
+    parser.add_argument("--markers", type=int, default=1000000)
+    args = parser.parse_args(argv)
+    benchmark(args.markers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
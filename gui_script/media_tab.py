@@ -21,7 +21,7 @@ class MediaTab(QWidget):
     Media info and controls can be toggled.
     """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profile_store=None):
         super().__init__(parent)
 
         # --- Default Media Source Paths ---
@@ -34,6 +34,15 @@ class MediaTab(QWidget):
             print(f"Warning: Could not determine script path for default media dirs: {e}")
             self.music_source_dir = Path("../media/music")  # Fallback
             self.video_source_dir = Path("../media/video")  # Fallback
+        self.default_music_dir, self.default_video_dir = self.music_source_dir, self.video_source_dir
+
+        # Paths chosen in Settings persist per driver
+        self.profile_store = profile_store
+        stored_paths = self.profile_store.get("media_paths", {}) if self.profile_store else {}
+        if stored_paths.get("music") and Path(stored_paths["music"]).is_dir():
+            self.music_source_dir = Path(stored_paths["music"])
+        if stored_paths.get("video") and Path(stored_paths["video"]).is_dir():
+            self.video_source_dir = Path(stored_paths["video"])
 
         # --- Media-specific State Variables ---
         self.music_media_data = {}
@@ -264,6 +273,9 @@ class MediaTab(QWidget):
                 print(f"Warning: New video path is not a valid directory: {new_video_path}")
             else:
                 self.video_source_dir = new_video_path
+            if self.profile_store:
+                self.profile_store.set("media_paths", {"music": str(self.music_source_dir),
+                                                       "video": str(self.video_source_dir)})
             self.load_media_from_directory()
             if self.media_display_stack:
                 if self.album_list_widget.count() > 0:
@@ -374,7 +386,7 @@ class MediaTab(QWidget):
         else:
             self.collapsible_controls_widget.hide(); self.toggle_controls_button.setText("Show")
 
-    def handle_album_selected(self, item):
+    def handle_album_selected(self, item, song_row=0):
         if item is None: return
         album_name = item.text();
         self.current_album_playing = album_name;
@@ -383,8 +395,9 @@ class MediaTab(QWidget):
         songs = album_data.get("songs", [])
         for song_name in songs: self.song_list_widget.addItem(song_name)
         if self.song_list_widget.count() > 0:
-            self.song_list_widget.setCurrentRow(0); self.music_item_selected(self.song_list_widget.item(0),
-                                                                             auto_play=False)
+            song_row = min(max(song_row, 0), self.song_list_widget.count() - 1)
+            self.song_list_widget.setCurrentRow(song_row); self.music_item_selected(
+                self.song_list_widget.item(song_row), auto_play=False)
         else:
             self.now_playing_title_label.setText("No songs in album");
             self.now_playing_artist_label.setText(album_data.get("artist", "Unknown Artist"))
@@ -420,6 +433,7 @@ class MediaTab(QWidget):
         self.now_playing_artist_label.setText(f"{artist_name} - {album_name if album_name else 'Unknown Album'}")
         if self.album_art_label: self.album_art_label.setText(
             f"Art for\n{album_name}" if album_name else "Album Art / Poster")
+        self.store_media_queue()
         self._load_and_play_media(auto_play)
 
     def movie_item_selected(self, item, auto_play=False):
@@ -435,8 +449,54 @@ class MediaTab(QWidget):
         self.current_artist_playing = "Movie"
         self.now_playing_title_label.setText(movie_title);
         self.now_playing_artist_label.setText("Video File")
+        self.store_media_queue()
         self._load_and_play_media(auto_play)
 
+    # --- Driver Profile ---
+
+    def media_queue(self):
+        """What is selected to play: media type plus album and song row, or movie title."""
+        if self.current_media_type == "movie":
+            return {"type": "movie", "movie": self.current_media_playing}
+        return {"type": "music", "album": self.current_album_playing, "song": self.song_list_widget.currentRow()}
+
+    def store_media_queue(self):
+        if self.profile_store:
+            self.profile_store.set("media_queue", self.media_queue())
+
+    def apply_driver_profile(self):
+        """Switches to the current driver's media folders and queue, without starting playback."""
+        paths = self.profile_store.get("media_paths", {})
+        music_dir = Path(paths["music"]) if paths.get("music") and Path(paths["music"]).is_dir() else self.default_music_dir
+        video_dir = Path(paths["video"]) if paths.get("video") and Path(paths["video"]).is_dir() else self.default_video_dir
+        if (music_dir, video_dir) != (self.music_source_dir, self.video_source_dir):
+            self.music_source_dir, self.video_source_dir = music_dir, video_dir
+            self.load_media_from_directory()
+        self.restore_media_queue(self.profile_store.get("media_queue", {}))
+
+    def restore_media_queue(self, queue):
+        if not self.media_display_stack or queue == self.media_queue():
+            return  # Already showing it; reloading would stop what is playing
+        # The sub-tab change handler would select the previous item first
+        self.media_type_tabs.blockSignals(True)
+        try:
+            if queue.get("type") == "movie":
+                self.media_type_tabs.setCurrentIndex(1)
+                matches = self.movie_list_widget.findItems(queue.get("movie") or "", Qt.MatchFlag.MatchExactly)
+                item = matches[0] if matches else self.movie_list_widget.item(0)
+                if item and item.text() in self.movie_media_data:
+                    self.movie_list_widget.setCurrentItem(item)
+                    self.movie_item_selected(item, auto_play=False)
+            else:
+                self.media_type_tabs.setCurrentIndex(0)
+                matches = self.album_list_widget.findItems(queue.get("album") or "", Qt.MatchFlag.MatchExactly)
+                item = matches[0] if matches else self.album_list_widget.item(0)
+                if item and item.text() in self.music_media_data:
+                    self.album_list_widget.setCurrentItem(item)
+                    self.handle_album_selected(item, song_row=queue.get("song") or 0)
+        finally:
+            self.media_type_tabs.blockSignals(False)
+
     def _load_and_play_media(self, auto_play):
         if not self.player: return
         if self.current_song_path:
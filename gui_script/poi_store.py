@@ -0,0 +1,292 @@
+import argparse
+import bz2
+import gzip
+import math
+import random
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+try:
+    import osmium  # Optional: only needed to import .osm.pbf extracts
+except ImportError:
+    osmium = None
+
+# --- Constants ---
+DEFAULT_POI_DB = Path(__file__).resolve().parent.parent / "media" / "maps" / "poi_index.sqlite"
+EARTH_RADIUS_M = 6371000.0
+POI_TAG_KEYS = ("amenity", "shop", "tourism", "leisure", "historic")  # Tags that make a node a POI
+INSERT_BATCH = 10000
+NEAREST_START_RADIUS_M = 500.0
+NEAREST_MAX_RADIUS_M = 200000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_m):
+    """(south, west, north, east) enclosing a circle; exact enough away from the poles."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * max(0.01, math.cos(math.radians(lat)))))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def poi_category(tags):
+    """'amenity=cafe' style category for the first POI tag present, else None."""
+    for key in POI_TAG_KEYS:
+        value = tags.get(key)
+        if value:
+            return f"{key}={value}"
+    return None
+
+
+# --- Streaming OSM Parsers ---
+
+def _open_osm_xml(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_osm_xml_pois(path):
+    """
+    Yields (osm_id, name, category, lat, lon) for named POI nodes in an .osm
+    (optionally .gz/.bz2) file. Uses iterparse and clears each element after
+    use, so memory stays flat for country-sized extracts.
+    """
+    with _open_osm_xml(Path(path)) as stream:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                name = tags.get("name")
+                category = poi_category(tags) if name else None
+                if category:
+                    yield int(elem.get("id")), name, category, float(elem.get("lat")), float(elem.get("lon"))
+                root.clear()  # Drop this node (and anything before it) from the tree
+            elif elem.tag in ("way", "relation"):
+                root.clear()
+
+
+def iter_osm_pbf_pois(path):
+    """Same as iter_osm_xml_pois() for .osm.pbf, via pyosmium."""
+    if osmium is None:
+        raise RuntimeError("Reading .pbf extracts needs pyosmium (pip install osmium)")
+    for node in osmium.FileProcessor(str(path), osmium.osm.NODE):
+        name = node.tags.get("name")
+        if not name:
+            continue
+        category = poi_category({key: node.tags.get(key) for key in POI_TAG_KEYS})
+        if category and node.location.valid():
+            yield node.id, name, category, node.location.lat, node.location.lon
+
+
+def iter_osm_pois(path):
+    path = Path(path)
+    if path.name.endswith(".pbf"):
+        return iter_osm_pbf_pois(path)
+    return iter_osm_xml_pois(path)
+
+
+class PoiStore:
+    """
+    Offline points of interest in SQLite with an R-tree over their coordinates.
+    Box queries go straight to the R-tree; radius and nearest-N queries use it
+    for candidates and rank them by great-circle distance in Python.
+    """
+
+    def __init__(self, db_path=DEFAULT_POI_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pois (
+                id INTEGER PRIMARY KEY,
+                osm_id INTEGER,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS poi_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+        """)
+
+    # --- Loading ---
+
+    def add_pois(self, pois, batch_size=INSERT_BATCH):
+        """Inserts an iterable of (osm_id, name, category, lat, lon) in batches; returns the count."""
+        total = 0
+        next_id = (self.conn.execute("SELECT MAX(id) FROM pois").fetchone()[0] or 0) + 1
+        batch = []
+        with self.conn:
+            for osm_id, name, category, lat, lon in pois:
+                batch.append((next_id, osm_id, name, category, lat, lon))
+                next_id += 1
+                if len(batch) >= batch_size:
+                    self._insert_batch(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self._insert_batch(batch)
+                total += len(batch)
+        return total
+
+    def _insert_batch(self, batch):
+        self.conn.executemany("INSERT INTO pois (id, osm_id, name, category, lat, lon) VALUES (?, ?, ?, ?, ?, ?)", batch)
+        self.conn.executemany("INSERT INTO poi_rtree VALUES (?, ?, ?, ?, ?)",
+                              [(row[0], row[4], row[4], row[5], row[5]) for row in batch])
+
+    def import_osm(self, path, replace=False):
+        if replace:
+            self.clear()
+        started = time.perf_counter()
+        count = self.add_pois(iter_osm_pois(path))
+        print(f"POI import: {count} POIs from {path} in {time.perf_counter() - started:.1f}s")
+        return count
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM pois")
+            self.conn.execute("DELETE FROM poi_rtree")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pois").fetchone()[0]
+
+    def points(self):
+        """Every POI as (id, lat, lon) rows, for building marker clusters."""
+        return self.conn.execute("SELECT id, lat, lon FROM pois").fetchall()
+
+    def names(self, poi_ids):
+        """{id: name} for the given ids."""
+        names = {}
+        poi_ids = list(poi_ids)
+        for start in range(0, len(poi_ids), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = poi_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            names.update(self.conn.execute(f"SELECT id, name FROM pois WHERE id IN ({placeholders})", chunk))
+        return names
+
+    # --- Queries ---
+
+    def within_bbox(self, south, west, north, east, category=None, limit=500):
+        """POIs inside the box as (id, name, category, lat, lon)."""
+        sql = ("SELECT p.id, p.name, p.category, p.lat, p.lon FROM poi_rtree r JOIN pois p ON p.id = r.id "
+               "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?")
+        params = [south, north, west, east]
+        if category:
+            sql += " AND p.category = ?"
+            params.append(category)
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def within_radius(self, lat, lon, radius_m, category=None, limit=None):
+        """POIs within radius_m, nearest first, as (distance_m, id, name, category, lat, lon)."""
+        south, west, north, east = radius_bbox(lat, lon, radius_m)
+        hits = []
+        for row in self.within_bbox(south, west, north, east, category, limit=None):
+            distance = haversine_m(lat, lon, row[3], row[4])
+            if distance <= radius_m:
+                hits.append((distance,) + tuple(row))
+        hits.sort()
+        return hits[:limit] if limit else hits
+
+    def nearest(self, lat, lon, n=10, category=None, max_radius_m=NEAREST_MAX_RADIUS_M):
+        """
+        The n closest POIs. Searches a growing circle so dense areas stay cheap:
+        once a circle holds n POIs, nothing outside it can be closer.
+        """
+        radius = NEAREST_START_RADIUS_M
+        while True:
+            hits = self.within_radius(lat, lon, radius, category)
+            if len(hits) >= n or radius >= max_radius_m:
+                return hits[:n]
+            radius = min(max_radius_m, radius * 4)
+
+    def close(self):
+        self.conn.close()
+
+
+# --- Benchmark ---
+
+def synthetic_pois(count, center=(41.0082, 28.9784), spread_deg=1.0, seed=1):
+    """Random POIs around a centre, clustered like a city (denser towards the middle)."""
+    rng = random.Random(seed)
+    categories = ["amenity=cafe", "amenity=restaurant", "amenity=fuel", "shop=supermarket", "tourism=museum"]
+    for i in range(count):
+        yield (i, f"POI {i}", rng.choice(categories),
+               center[0] + rng.gauss(0, spread_deg / 3), center[1] + rng.gauss(0, spread_deg / 3))
+
+
+def benchmark(count, db_path, queries=200):
+    store = PoiStore(db_path)
+    store.clear()
+    started = time.perf_counter()
+    store.add_pois(synthetic_pois(count))
+    print(f"Loaded {count} POIs in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(2)
+    points = [(41.0082 + rng.uniform(-0.3, 0.3), 28.9784 + rng.uniform(-0.3, 0.3)) for _ in range(queries)]
+    for label, query in (
+            ("nearest 10", lambda lat, lon: store.nearest(lat, lon, 10)),
+            ("radius 300 m", lambda lat, lon: store.within_radius(lat, lon, 300)),
+            ("viewport (z15)", lambda lat, lon: store.within_bbox(lat - 0.01, lon - 0.015, lat + 0.01, lon + 0.015))):
+        timings = []
+        results = 0
+        for lat, lon in points:
+            t0 = time.perf_counter()
+            results += len(query(lat, lon))
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        timings.sort()
+        print(f"{label:>15}: p50 {timings[len(timings) // 2]:.2f} ms, "
+              f"p99 {timings[int(len(timings) * 0.99)]:.2f} ms, avg {results / queries:.0f} results")
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the offline POI index.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_POI_DB, help="POI database file")
+    parser.add_argument("--import", dest="import_path", type=Path, help="OSM extract (.osm, .osm.gz, .osm.bz2, .osm.pbf)")
+    parser.add_argument("--replace", action="store_true", help="Drop existing POIs before importing")
+    parser.add_argument("--near", nargs=2, type=float, metavar=("LAT", "LON"), help="Print the POIs nearest to a point")
+    parser.add_argument("-n", type=int, default=10, help="Number of results for --near")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="Time queries over COUNT synthetic POIs (uses a temp db)")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        import tempfile
+        with tempfile.TemporaryDirectory(prefix="poi_bench_") as tmp:
+            benchmark(args.benchmark, Path(tmp) / "poi_bench.sqlite")
+        return 0
+
+    store = PoiStore(args.db)
+    try:
+        if args.import_path:
+            store.import_osm(args.import_path, replace=args.replace)
+        if args.near:
+            for distance, _, name, category, lat, lon in store.nearest(args.near[0], args.near[1], args.n):
+                print(f"{distance:8.0f} m  {name} ({category}) at {lat:.5f}, {lon:.5f}")
+        if not args.import_path and not args.near:
+            print(f"{store.count()} POIs in {args.db}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
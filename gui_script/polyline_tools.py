@@ -0,0 +1,230 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from tile_selection import deg2frac_array
+
+# --- Constants ---
+TILE_PX = 256
+DEFAULT_PRECISION = 5     # Google encoded polyline precision (1e-5 deg, about 1 m)
+DEFAULT_TOLERANCE_PX = 1.0
+MAX_LEVEL_ZOOM = 18
+ANCHOR_EVERY = 64         # Average points between content-defined chunk anchors
+
+
+# --- Simplification ---
+
+def dp_importance(x, y, anchors=None):
+    """
+    Douglas-Peucker over the whole line at once, returning per point the
+    tolerance below which it survives simplification (endpoints and anchors:
+    inf). Each stretch between anchors is simplified on its own, but all
+    segments of one recursion depth are split together with NumPy segment
+    reductions, so the Python loop runs once per depth, not once per point.
+    """
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    if anchors is None:
+        anchors = np.array([0, n - 1])
+    importance[anchors] = np.inf
+    starts, ends = anchors[:-1], anchors[1:]
+    parent = np.full(len(starts), np.inf)
+    while len(starts):
+        interior = ends - starts - 1
+        active = interior > 0
+        starts, ends, parent, interior = starts[active], ends[active], parent[active], interior[active]
+        if not len(starts):
+            break
+        segment = np.repeat(np.arange(len(starts)), interior)
+        first_offsets = np.concatenate([[0], np.cumsum(interior)[:-1]])
+        points = np.arange(len(segment)) - first_offsets[segment] + starts[segment] + 1
+
+        ax, ay = x[starts][segment], y[starts][segment]
+        bx, by = x[ends][segment], y[ends][segment]
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(((x[points] - ax) * dx + (y[points] - ay) * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        distance = np.hypot(x[points] - (ax + t * dx), y[points] - (ay + t * dy))
+
+        seg_max = np.maximum.reduceat(distance, first_offsets)
+        is_max = distance == seg_max[segment]
+        split_rows = np.flatnonzero(is_max)
+        split_rows = split_rows[np.concatenate([[True], segment[split_rows[1:]] != segment[split_rows[:-1]]])]
+        split = points[split_rows]
+        # A child never outlives its parent, so one threshold yields a valid DP result
+        importance[split] = np.minimum(seg_max, parent)
+        starts, ends = np.concatenate([starts, split]), np.concatenate([split, ends])
+        parent = np.concatenate([importance[split], importance[split]])
+    return importance
+
+
+def content_anchors(quantized, every=ANCHOR_EVERY):
+    """
+    Indices that always survive simplification, chosen by a hash of each
+    point's coordinates rather than its position, so editing one part of a
+    line leaves the anchors (and simplification) elsewhere unchanged.
+    """
+    h = (quantized[:, 0] * np.int64(73856093)) ^ (quantized[:, 1] * np.int64(19349663))
+    anchors = np.flatnonzero(h % every == 0)
+    return np.unique(np.concatenate([[0, len(quantized) - 1], anchors]))
+
+
+def point_levels(lats, lons, precision=DEFAULT_PRECISION, tolerance_px=DEFAULT_TOLERANCE_PX, max_zoom=MAX_LEVEL_ZOOM):
+    """
+    Minimum zoom at which each point is needed to keep the drawn line within
+    tolerance_px of the full line. Simplification runs per chunk between
+    content anchors; anchors get level 0.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) == 0:
+        return np.zeros(0, dtype=np.int64)
+    fx, fy = deg2frac_array(lats, lons, 0)
+    x, y = fx * TILE_PX, fy * TILE_PX  # Zoom-0 pixels
+    importance = dp_importance(x, y, content_anchors(quantize(lats, lons, precision)))
+    # importance * 2^z >= tolerance  <=>  z >= log2(tolerance / importance)
+    with np.errstate(divide="ignore"):
+        levels = np.ceil(np.log2(tolerance_px / importance))
+    return np.clip(np.nan_to_num(levels, posinf=max_zoom + 1, neginf=0), 0, max_zoom + 1).astype(np.int64)
+
+
+# --- Encoding ---
+
+def quantize(lats, lons, precision=DEFAULT_PRECISION):
+    return np.round(np.column_stack([lats, lons]) * 10 ** precision).astype(np.int64)
+
+
+def encode_quantized(quantized):
+    """Google encoded polyline of already quantized (lat, lon) rows, vectorized over all values."""
+    if len(quantized) == 0:
+        return ""
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).astype(np.uint64)
+    shifts = np.arange(7, dtype=np.uint64) * np.uint64(5)
+    chunks = (values[:, None] >> shifts) & np.uint64(31)
+    chunk_count = 1 + np.sum((values[:, None] >> shifts[1:]) > 0, axis=1)
+    index = np.arange(7)
+    out = chunks + np.uint64(63) + np.uint64(32) * (index < (chunk_count - 1)[:, None])
+    return out[index < chunk_count[:, None]].astype(np.uint8).tobytes().decode("ascii")
+
+
+def encode_polyline(lats, lons, precision=DEFAULT_PRECISION):
+    return encode_quantized(quantize(lats, lons, precision))
+
+
+def decode_polyline(encoded, precision=DEFAULT_PRECISION):
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 31) << shift
+        shift += 5
+        if chunk < 32:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    coords = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return [tuple(row) for row in coords]
+
+
+def encode_levels(levels):
+    """One printable character per point: chr(63 + level)."""
+    return (np.asarray(levels, dtype=np.uint8) + 63).tobytes().decode("ascii")
+
+
+# --- Page Sync ---
+
+class PolylineSync:
+    """
+    Keeps one named polyline on the map page in step with Python. The first
+    update sends the whole line; later ones send only the run of points that
+    differs from what the page already holds (common prefix/suffix kept), as
+    a splice of encoded points and levels.
+    """
+
+    def __init__(self, name, style=None, precision=DEFAULT_PRECISION):
+        self.name = name
+        self.style = style or {}
+        self.precision = precision
+        self.sent_points = None
+        self.sent_levels = None
+
+    def reset(self):
+        """Forget what was sent, e.g. after the page reloads."""
+        self.sent_points = None
+        self.sent_levels = None
+
+    def update_script(self, lats, lons):
+        """JavaScript that brings the page's copy up to date, or None if it already is."""
+        points = quantize(lats, lons, self.precision)
+        levels = point_levels(lats, lons, self.precision)
+        name = json.dumps(self.name)
+        if self.sent_points is None:
+            script = (f"setPolyline({name}, {json.dumps(encode_quantized(points))}, "
+                      f"{json.dumps(encode_levels(levels))}, {self.precision}, {json.dumps(self.style)});")
+        else:
+            old_points, old_levels = self.sent_points, self.sent_levels
+            same = min(len(points), len(old_points))
+            differs = np.flatnonzero((points[:same] != old_points[:same]).any(axis=1) | (levels[:same] != old_levels[:same]))
+            prefix = int(differs[0]) if len(differs) else same
+            tail_room = same - prefix
+            differs = np.flatnonzero((points[::-1][:tail_room] != old_points[::-1][:tail_room]).any(axis=1)
+                                     | (levels[::-1][:tail_room] != old_levels[::-1][:tail_room]))
+            suffix = int(differs[0]) if len(differs) else tail_room
+            if prefix == len(points) == len(old_points):
+                return None
+            removed = len(old_points) - prefix - suffix
+            inserted = slice(prefix, len(points) - suffix)
+            script = (f"splicePolyline({name}, {prefix}, {removed}, "
+                      f"{json.dumps(encode_quantized(points[inserted]))}, {json.dumps(encode_levels(levels[inserted]))});")
+        self.sent_points, self.sent_levels = points, levels
+        return script
+
+    def clear_script(self):
+        self.reset()
+        return f"removePolyline({json.dumps(self.name)});"
+
+
+# --- Benchmark ---
+
+def benchmark(count):
+    rng = np.random.default_rng(1)
+    step = rng.normal(0, 1e-4, (count, 2)) + [2e-5, 3e-5]
+    coords = np.array([41.0, 28.9]) + np.cumsum(step, axis=0)
+    lats, lons = coords[:, 0], coords[:, 1]
+
+    t0 = time.perf_counter()
+    levels = point_levels(lats, lons)
+    t1 = time.perf_counter()
+    encoded = encode_polyline(lats, lons)
+    t2 = time.perf_counter()
+    as_json = json.dumps([[round(lat, 6), round(lon, 6)] for lat, lon in zip(lats, lons)])
+    t3 = time.perf_counter()
+    print(f"{count} points: levels {1000 * (t1 - t0):.1f} ms, encode {1000 * (t2 - t1):.1f} ms "
+          f"(JSON lat/lng list: {1000 * (t3 - t2):.1f} ms)")
+    print(f"Payload: encoded {len(encoded) + len(levels)} bytes vs JSON {len(as_json)} bytes")
+    for zoom in (8, 12, 15, 18):
+        print(f"  z{zoom}: {int(np.sum(levels <= zoom))} points drawn")
+
+    sync = PolylineSync("bench")
+    sync.update_script(lats, lons)
+    lats2, lons2 = lats.copy(), lons.copy()
+    lats2[count // 2:count // 2 + 50] += 1e-3  # Re-route around one block in the middle
+    t4 = time.perf_counter()
+    script = sync.update_script(lats2, lons2)
+    print(f"Recomputed route update: {len(script)} bytes in {1000 * (time.perf_counter() - t4):.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark polyline simplification and encoding.")
+    parser.add_argument("--points", type=int, default=50000)
+    args = parser.parse_args(argv)
+    benchmark(args.points)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
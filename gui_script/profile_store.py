@@ -0,0 +1,164 @@
+import copy
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from PyQt6.QtCore import QObject, QTimer
+
+# --- Constants ---
+DEFAULT_PROFILE_DIR = Path(__file__).resolve().parent.parent / "media" / "profiles"
+DEFAULT_DRIVER = "default"
+ACTIVE_DRIVER_FILE = "active_driver"  # Name of the driver selected last, read at startup
+SAVE_DELAY_MS = 1000         # Quiet time after the last change before writing
+MAX_SAVE_DELAY_SEC = 5.0     # Changes that keep coming are still written at least this often
+
+
+class ProfileStore(QObject):
+    """
+    Persistent per-driver settings: one JSON document per driver with a
+    section per tab (seat presets and positions, climate profiles, media
+    paths, theme). A driver's file is only read when one of its sections is
+    first asked for. set() updates memory and arms a debounce timer, so a
+    slider drag becomes one write SAVE_DELAY_MS after it stops (or one every
+    MAX_SAVE_DELAY_SEC while it goes on) covering every section changed
+    meanwhile. The selected driver is remembered across restarts.
+
+    A write goes to a temp file that is fsynced and renamed over the current
+    file, whose previous version is kept as .bak, so a power cut mid-write
+    leaves a complete old or new document; loading falls back to the temp
+    file and then the backup when the main file is missing or damaged.
+    """
+
+    def __init__(self, profile_dir=DEFAULT_PROFILE_DIR, driver=None, parent=None):
+        super().__init__(parent)
+        self.profile_dir = Path(profile_dir)
+        self.driver = driver or self._read_active_driver() or DEFAULT_DRIVER
+        self._active_dirty = False
+        self.write_count = 0
+        self._documents = {}  # driver -> section dict, loaded on first use
+        self._dirty = set()
+        self._dirty_since = None
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.timeout.connect(self.flush)
+
+    # --- Sections ---
+
+    def get(self, section, default=None, driver=None):
+        """A copy of a section's value, or default if the driver has none stored."""
+        document = self._document(driver or self.driver)
+        return copy.deepcopy(document[section]) if section in document else default
+
+    def set(self, section, value, driver=None):
+        driver = driver or self.driver
+        document = self._document(driver)
+        if document.get(section) == value:
+            return
+        document[section] = copy.deepcopy(value)
+        self._dirty.add(driver)
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        # Restarting the timer on every change debounces; the cap keeps a long drag from deferring forever
+        remaining_ms = int(1000 * (self._dirty_since + MAX_SAVE_DELAY_SEC - now))
+        self.save_timer.start(max(0, min(SAVE_DELAY_MS, remaining_ms)))
+
+    def set_driver(self, driver):
+        """Makes driver the one get()/set() use by default, loading its document now."""
+        self._document(driver)
+        if driver != self.driver:
+            self.driver = driver
+            self._active_dirty = True
+            if not self.save_timer.isActive():
+                self.save_timer.start(SAVE_DELAY_MS)
+
+    def drivers(self):
+        """Drivers with a stored profile, plus any only held in memory so far."""
+        stored = {unquote(path.stem) for path in self.profile_dir.glob("*.json")} if self.profile_dir.is_dir() else set()
+        return sorted(stored | set(self._documents))
+
+    # --- Files ---
+
+    def _path(self, driver):
+        # Percent-encoded, so every name has its own file and drivers() gets the name back exactly
+        # ("Ayşe" -> Ay%C5%9Fe.json); plain [A-Za-z0-9_-] names are unchanged
+        return self.profile_dir / (quote(driver, safe="") + ".json")
+
+    def _document(self, driver):
+        document = self._documents.get(driver)
+        if document is None:
+            document = self._documents[driver] = self._load(driver)
+        return document
+
+    def _read_active_driver(self):
+        try:
+            return (self.profile_dir / ACTIVE_DRIVER_FILE).read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def _load(self, driver):
+        path = self._path(driver)
+        for candidate in (path, path.with_name(path.name + ".tmp"), path.with_name(path.name + ".bak")):
+            try:
+                with open(candidate, "r", encoding="utf-8") as f:
+                    document = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read profile {candidate}: {e}")
+                continue
+            if isinstance(document, dict):
+                if candidate != path:
+                    print(f"ProfileStore: Restored profile '{driver}' from {candidate.name}")
+                return document
+        return {}
+
+    def flush(self):
+        """Writes every driver changed since the last flush (also called on quit)."""
+        self.save_timer.stop()
+        for driver in sorted(self._dirty):
+            try:
+                self._write(driver)
+                self._dirty.discard(driver)
+            except OSError as e:
+                print(f"Warning: Could not save profile '{driver}': {e}")
+        if self._active_dirty:
+            try:
+                # Not fsynced: losing it only means starting with the previous driver
+                tmp_path = self.profile_dir / (ACTIVE_DRIVER_FILE + ".tmp")
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_text(self.driver, encoding="utf-8")
+                os.replace(tmp_path, self.profile_dir / ACTIVE_DRIVER_FILE)
+                self._active_dirty = False
+            except OSError as e:
+                print(f"Warning: Could not save active driver: {e}")
+        self._dirty_since = None if not self._dirty else time.monotonic()
+
+    def _write(self, driver):
+        path = self._path(driver)
+        tmp_path = path.with_name(path.name + ".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._documents[driver], f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            os.replace(path, path.with_name(path.name + ".bak"))
+        os.replace(tmp_path, path)
+        _fsync_directory(path.parent)  # Makes the renames themselves durable
+        self.write_count += 1
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
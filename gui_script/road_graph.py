@@ -0,0 +1,529 @@
+import argparse
+import bz2
+import gzip
+import heapq
+import math
+import mmap
+import random
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# --- Constants ---
+DEFAULT_GRAPH_DIR = Path(__file__).resolve().parent.parent / "media" / "maps" / "routing"
+GRAPH_MAGIC = b"RGRAPH01"
+HEADER = struct.Struct("<8sIIId")  # magic, node_count, edge_count, shape_point_count, heuristic speed (m/s)
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG = math.pi * EARTH_RADIUS_M / 180.0
+MAX_SPEED_KMH = 130.0  # Upper bound used by the A* heuristic; faster tagged roads are capped
+
+# Default speeds (km/h) for car-routable highway classes without a usable maxspeed tag
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 110, "motorway_link": 60, "trunk": 90, "trunk_link": 50,
+    "primary": 60, "primary_link": 40, "secondary": 50, "secondary_link": 40,
+    "tertiary": 40, "tertiary_link": 30, "unclassified": 30, "residential": 30,
+    "living_street": 10, "service": 15, "road": 30,
+}
+
+
+def graph_path_for_city(city_folder, graph_dir=DEFAULT_GRAPH_DIR):
+    return Path(graph_dir) / f"{city_folder}.rgraph"
+
+
+# --- OSM Import ---
+
+def _open_osm_xml(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _way_speed_kmh(tags):
+    speed = HIGHWAY_SPEEDS_KMH[tags["highway"]]
+    maxspeed = tags.get("maxspeed", "")
+    try:
+        if maxspeed.endswith("mph"):
+            speed = float(maxspeed[:-3]) * 1.609
+        elif maxspeed:
+            speed = float(maxspeed)
+    except ValueError:
+        pass
+    return min(max(speed, 5.0), MAX_SPEED_KMH)
+
+
+def _way_direction(tags):
+    """1 = forward only, -1 = backward only, 0 = both ways."""
+    oneway = tags.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway == "no":
+        return 0
+    if tags.get("junction") in ("roundabout", "circular") or tags["highway"] == "motorway":
+        return 1
+    return 0
+
+
+def read_osm_roads(path):
+    """
+    Streams an .osm(.gz/.bz2) extract and returns (node_ids, node_lats, node_lons,
+    ways), where ways is a list of (node_refs, speed_kmh, direction) for
+    car-routable highways. Elements are cleared as they are parsed.
+    """
+    node_ids, node_lats, node_lons = array("q"), array("d"), array("d")
+    ways = []
+    with _open_osm_xml(Path(path)) as stream:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                node_ids.append(int(elem.get("id")))
+                node_lats.append(float(elem.get("lat")))
+                node_lons.append(float(elem.get("lon")))
+                root.clear()
+            elif elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                if tags.get("highway") in HIGHWAY_SPEEDS_KMH and tags.get("access") not in ("no", "private"):
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                    if len(refs) >= 2:
+                        ways.append((refs, _way_speed_kmh(tags), _way_direction(tags)))
+                root.clear()
+            elif elem.tag == "relation":
+                root.clear()
+    return (np.frombuffer(node_ids, dtype=np.int64), np.frombuffer(node_lats, dtype=np.float64),
+            np.frombuffer(node_lons, dtype=np.float64), ways)
+
+
+def _segment_lengths_m(lats, lons):
+    lat1, lat2 = np.radians(lats[:-1]), np.radians(lats[1:])
+    dlon = np.radians(np.diff(lons, axis=0))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def build_edges(node_ids, node_lats, node_lons, ways):
+    """
+    Cuts ways at junctions (nodes shared by several ways, plus way ends) so the
+    graph only has junction nodes; the nodes in between become edge shapes.
+    Returns (lats, lons, sources, targets, seconds, shape_offsets, shape_lats, shape_lons).
+    """
+    order = np.argsort(node_ids)
+    sorted_ids = node_ids[order]
+
+    # Node indices per way, split wherever a clipped extract lacks a referenced node
+    runs = []
+    for refs, speed_kmh, direction in ways:
+        refs = np.asarray(refs, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(sorted_ids, refs), len(sorted_ids) - 1)
+        indices = np.where(sorted_ids[positions] == refs, order[positions], -1)
+        for run in np.split(indices, np.flatnonzero(indices < 0)):
+            run = run[run >= 0]
+            if len(run) >= 2:
+                runs.append((run, speed_kmh, direction))
+
+    use_count = np.bincount(np.concatenate([run for run, _, _ in runs]), minlength=len(node_ids)) \
+        if runs else np.zeros(len(node_ids), dtype=np.int64)
+    junction = use_count >= 2
+    for run, _, _ in runs:
+        junction[run[0]] = junction[run[-1]] = True
+    junction_nodes = np.flatnonzero(junction)
+    graph_id = np.full(len(node_ids), -1, dtype=np.int64)
+    graph_id[junction_nodes] = np.arange(len(junction_nodes))
+
+    sources, targets, seconds = [], [], []
+    shape_offsets, shape_lats, shape_lons = [0], [], []
+
+    def add_edge(a, b, cost, shape):
+        sources.append(a)
+        targets.append(b)
+        seconds.append(cost)
+        for lat, lon in shape:
+            shape_lats.append(lat)
+            shape_lons.append(lon)
+        shape_offsets.append(len(shape_lats))
+
+    for run, speed_kmh, direction in runs:
+        lengths = _segment_lengths_m(node_lats[run], node_lons[run])
+        run_ids = graph_id[run]
+        start, length, shape = 0, 0.0, []
+        for i in range(1, len(run)):
+            length += lengths[i - 1]
+            if run_ids[i] < 0:
+                shape.append((node_lats[run[i]], node_lons[run[i]]))
+                continue
+            a, b = int(run_ids[start]), int(run_ids[i])
+            if a != b and length > 0:
+                cost = length / (speed_kmh / 3.6)
+                if direction >= 0:
+                    add_edge(a, b, cost, shape)
+                if direction <= 0:
+                    add_edge(b, a, cost, shape[::-1])
+            start, length, shape = i, 0.0, []
+
+    return (node_lats[junction_nodes], node_lons[junction_nodes],
+            np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64),
+            np.asarray(seconds, dtype=np.float64), np.asarray(shape_offsets, dtype=np.int64),
+            np.asarray(shape_lats, dtype=np.float64), np.asarray(shape_lons, dtype=np.float64))
+
+
+# --- Graph File ---
+
+def _reorder_ragged(offsets, values, order):
+    """Reorders a ragged array (offsets + flat values) by item order; returns (offsets, gather index)."""
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    gather = np.repeat(offsets[:-1][order] - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return new_offsets, gather
+
+
+def _graph_layout(node_count, edge_count, shape_count):
+    """(name, typecode, length) of each array in file order."""
+    return [
+        ("lat", "d", node_count), ("lon", "d", node_count),
+        ("fwd_offsets", "i", node_count + 1), ("fwd_targets", "i", edge_count), ("fwd_seconds", "f", edge_count),
+        ("rev_offsets", "i", node_count + 1), ("rev_sources", "i", edge_count), ("rev_seconds", "f", edge_count),
+        ("rev_edges", "i", edge_count),
+        ("shape_offsets", "i", edge_count + 1), ("shape_lat", "d", shape_count), ("shape_lon", "d", shape_count),
+    ]
+
+
+def write_graph(path, lats, lons, sources, targets, seconds, shape_offsets, shape_lats, shape_lons):
+    """
+    Writes the graph as one flat file: node coordinates, forward CSR
+    (offsets/targets/seconds), reverse CSR for the backward search
+    (offsets/sources/seconds/forward edge id) and per-edge shape points,
+    each array 8-byte aligned so it can be mapped in place.
+    """
+    node_count, edge_count = len(lats), len(sources)
+    order = np.argsort(sources, kind="stable")
+    fwd_offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=node_count))])
+    fwd_targets = targets[order]
+    shape_offsets, gather = _reorder_ragged(shape_offsets, shape_lats, order)
+    rev_order = np.argsort(fwd_targets, kind="stable")
+    fwd_sources = np.repeat(np.arange(node_count), np.diff(fwd_offsets))
+    # Fastest straight-line progress any edge allows; keeps the A* heuristic admissible yet tight
+    chords = _segment_lengths_m(np.stack([lats[sources], lats[targets]]), np.stack([lons[sources], lons[targets]]))[0]
+    heuristic_mps = float(np.max(chords / np.maximum(seconds, 1e-3))) if edge_count else MAX_SPEED_KMH / 3.6
+    arrays = {
+        "lat": lats, "lon": lons,
+        "fwd_offsets": fwd_offsets, "fwd_targets": fwd_targets, "fwd_seconds": seconds[order],
+        "rev_offsets": np.concatenate([[0], np.cumsum(np.bincount(fwd_targets, minlength=node_count))]),
+        "rev_sources": fwd_sources[rev_order], "rev_seconds": seconds[order][rev_order], "rev_edges": rev_order,
+        "shape_offsets": shape_offsets, "shape_lat": shape_lats[gather], "shape_lon": shape_lons[gather],
+    }
+    dtypes = {"d": "<f8", "i": "<i4", "f": "<f4"}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(GRAPH_MAGIC, node_count, edge_count, len(shape_lats), heuristic_mps))
+        for name, typecode, length in _graph_layout(node_count, edge_count, len(shape_lats)):
+            f.write(b"\0" * (-f.tell() % 8))
+            data = np.ascontiguousarray(arrays[name], dtype=dtypes[typecode])
+            assert len(data) == length, name
+            f.write(data.tobytes())
+    tmp_path.replace(path)
+    return path
+
+
+class Route:
+    def __init__(self, points, seconds, meters, settled, elapsed_ms):
+        self.points = points  # [(lat, lon), ...]
+        self.seconds = seconds
+        self.meters = meters
+        self.settled = settled  # Nodes settled by both searches
+        self.elapsed_ms = elapsed_ms
+
+    def summary(self):
+        return f"{self.meters / 1000.0:.1f} km, {self.seconds / 60.0:.0f} min (computed in {self.elapsed_ms:.0f} ms)"
+
+
+class RoadGraph:
+    """
+    Read-only road graph mapped from its .rgraph file. Arrays are memoryviews
+    over the mapping, so loading costs nothing up front and pages fault in as
+    the search touches them. Routing is bidirectional A* on travel time.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.node_count, self.edge_count, shape_count, self.heuristic_mps = HEADER.unpack_from(self._map, 0)
+        if magic != GRAPH_MAGIC:
+            raise ValueError(f"{self.path} is not a road graph file")
+        self._view = view = memoryview(self._map)
+        offset = HEADER.size
+        for name, typecode, length in _graph_layout(self.node_count, self.edge_count, shape_count):
+            offset += -offset % 8
+            size = length * struct.calcsize(typecode)
+            setattr(self, name, view[offset:offset + size].cast(typecode))
+            offset += size
+        self._has_out = None
+        self._has_in = None
+
+    # --- Snapping ---
+
+    def nearest_node(self, lat, lon, outgoing=True):
+        """Closest node that can start (outgoing=True) or end a route."""
+        if self._has_out is None:
+            self._has_out = np.diff(np.frombuffer(self.fwd_offsets, dtype=np.int32)) > 0
+            self._has_in = np.diff(np.frombuffer(self.rev_offsets, dtype=np.int32)) > 0
+        lats = np.frombuffer(self.lat, dtype=np.float64)
+        lons = np.frombuffer(self.lon, dtype=np.float64)
+        scale = math.cos(math.radians(lat))
+        d2 = (lats - lat) ** 2 + ((lons - lon) * scale) ** 2
+        d2[~(self._has_out if outgoing else self._has_in)] = np.inf
+        node = int(np.argmin(d2))
+        return node if np.isfinite(d2[node]) else None
+
+    # --- Search ---
+
+    def shortest_path(self, source, target):
+        """
+        Bidirectional A* with average potentials p(v) = (h_t(v) - h_s(v)) / 2,
+        which keeps reduced edge costs non-negative in both directions, so the
+        usual bidirectional stop rule (top_f + top_b >= best) stays exact.
+        Returns (forward edge ids, seconds, settled) or None.
+        """
+        if source == target:
+            return [], 0.0, 0
+        lat, lon = self.lat, self.lon
+        s_lat, s_lon, t_lat, t_lon = lat[source], lon[source], lat[target], lon[target]
+        x_scale = math.cos(math.radians((s_lat + t_lat) / 2.0))
+        # Straight-line seconds at the graph's top speed, shaved slightly for the flat-earth approximation
+        sec_per_deg = METERS_PER_DEG / self.heuristic_mps * 0.98
+        potential_cache = {}
+
+        def potential(v):
+            p = potential_cache.get(v)
+            if p is None:
+                v_lat, v_lon = lat[v], lon[v]
+                to_target = math.hypot(v_lat - t_lat, (v_lon - t_lon) * x_scale)
+                from_source = math.hypot(v_lat - s_lat, (v_lon - s_lon) * x_scale)
+                p = potential_cache[v] = (to_target - from_source) * sec_per_deg * 0.5
+            return p
+
+        fwd_offsets, fwd_targets, fwd_seconds = self.fwd_offsets, self.fwd_targets, self.fwd_seconds
+        rev_offsets, rev_sources, rev_seconds, rev_edges = self.rev_offsets, self.rev_sources, self.rev_seconds, self.rev_edges
+        dist_f, dist_b = {source: 0.0}, {target: 0.0}
+        parent_f, parent_b = {source: -1}, {target: -1}  # Node -> forward edge id used to reach it
+        done_f, done_b = set(), set()
+        heap_f, heap_b = [(potential(source), source)], [(-potential(target), target)]
+        best, meeting = math.inf, -1
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        while heap_f and heap_b:
+            if heap_f[0][0] + heap_b[0][0] >= best:
+                break
+            if heap_f[0][0] <= heap_b[0][0]:
+                _, u = heappop(heap_f)
+                if u in done_f:
+                    continue
+                done_f.add(u)
+                du = dist_f[u]
+                for edge in range(fwd_offsets[u], fwd_offsets[u + 1]):
+                    v = fwd_targets[edge]
+                    dv = du + fwd_seconds[edge]
+                    if dv < dist_f.get(v, math.inf):
+                        dist_f[v] = dv
+                        parent_f[v] = edge
+                        heappush(heap_f, (dv + potential(v), v))
+                        other = dist_b.get(v)
+                        if other is not None and dv + other < best:
+                            best, meeting = dv + other, v
+            else:
+                _, u = heappop(heap_b)
+                if u in done_b:
+                    continue
+                done_b.add(u)
+                du = dist_b[u]
+                for slot in range(rev_offsets[u], rev_offsets[u + 1]):
+                    v = rev_sources[slot]
+                    dv = du + rev_seconds[slot]
+                    if dv < dist_b.get(v, math.inf):
+                        dist_b[v] = dv
+                        parent_b[v] = rev_edges[slot]
+                        heappush(heap_b, (dv - potential(v), v))
+                        other = dist_f.get(v)
+                        if other is not None and dv + other < best:
+                            best, meeting = dv + other, v
+
+        if meeting < 0:
+            return None
+        edges = []
+        node = meeting
+        while parent_f[node] >= 0:
+            edge = parent_f[node]
+            edges.append(edge)
+            node = self._edge_source(edge)
+        edges.reverse()
+        node = meeting
+        while parent_b[node] >= 0:
+            edge = parent_b[node]
+            edges.append(edge)
+            node = fwd_targets[edge]
+        return edges, best, len(done_f) + len(done_b)
+
+    def _edge_source(self, edge):
+        # Forward edges are grouped by source: binary search the offsets
+        low, high = 0, self.node_count
+        offsets = self.fwd_offsets
+        while low < high:
+            mid = (low + high) // 2
+            if offsets[mid + 1] <= edge:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def edge_points(self, edge, include_source=True):
+        points = []
+        if include_source:
+            source = self._edge_source(edge)
+            points.append((self.lat[source], self.lon[source]))
+        for i in range(self.shape_offsets[edge], self.shape_offsets[edge + 1]):
+            points.append((self.shape_lat[i], self.shape_lon[i]))
+        target = self.fwd_targets[edge]
+        points.append((self.lat[target], self.lon[target]))
+        return points
+
+    def route(self, from_lat, from_lon, to_lat, to_lon):
+        """Fastest route between two coordinates as a Route, or None if unreachable."""
+        started = time.perf_counter()
+        source = self.nearest_node(from_lat, from_lon, outgoing=True)
+        target = self.nearest_node(to_lat, to_lon, outgoing=False)
+        if source is None or target is None:
+            return None
+        result = self.shortest_path(source, target)
+        if result is None:
+            return None
+        edges, seconds, settled = result
+        points = [(from_lat, from_lon)]
+        for point in [(self.lat[source], self.lon[source])] + \
+                [point for edge in edges for point in self.edge_points(edge, include_source=False)] + \
+                [(to_lat, to_lon)]:
+            if point != points[-1]:
+                points.append(point)
+        lengths = _segment_lengths_m(np.array([p[0] for p in points]), np.array([p[1] for p in points]))
+        return Route(points, seconds, float(lengths.sum()), settled, (time.perf_counter() - started) * 1000.0)
+
+    def close(self):
+        for name, _, _ in _graph_layout(0, 0, 0):
+            getattr(self, name).release()
+        self._view.release()
+        self._has_out = self._has_in = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # A caller still holds a NumPy view; the mapping goes away with it
+        self._file.close()
+
+
+def build_graph_from_osm(osm_path, graph_path):
+    started = time.perf_counter()
+    node_ids, node_lats, node_lons, ways = read_osm_roads(osm_path)
+    edges = build_edges(node_ids, node_lats, node_lons, ways)
+    write_graph(graph_path, *edges)
+    print(f"Road graph: {len(edges[0])} junctions, {len(edges[2])} edges from {len(ways)} ways "
+          f"-> {graph_path} in {time.perf_counter() - started:.1f}s")
+    return graph_path
+
+
+# --- Benchmark ---
+
+def synthetic_city_edges(size, spacing_m=120.0, center=(41.0082, 28.9784), seed=1):
+    """A size x size street grid with arterials, some one-way streets and a few gaps."""
+    rng = np.random.default_rng(seed)
+    step_lat = spacing_m / METERS_PER_DEG
+    step_lon = step_lat / math.cos(math.radians(center[0]))
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lats = center[0] + (rows - size / 2) * step_lat + rng.normal(0, step_lat * 0.05, size * size)
+    lons = center[1] + (cols - size / 2) * step_lon + rng.normal(0, step_lon * 0.05, size * size)
+    sources, targets, seconds = [], [], []
+    for horizontal in (True, False):
+        a = rows * size + cols
+        b = a + (1 if horizontal else size)
+        valid = (cols < size - 1) if horizontal else (rows < size - 1)
+        line = rows if horizontal else cols
+        speed = np.where(line % 10 == 0, 60.0, 30.0)  # Every tenth street is an arterial
+        valid &= rng.random(size * size) > 0.03
+        oneway = (line % 10 != 0) & (line % 3 == 1)
+        a, b, speed, oneway = a[valid], b[valid], speed[valid], oneway[valid]
+        cost = _segment_lengths_m(np.stack([lats[a], lats[b]]), np.stack([lons[a], lons[b]]))[0] / (speed / 3.6)
+        sources += [a, b[~oneway]]
+        targets += [b, a[~oneway]]
+        seconds += [cost, cost[~oneway]]
+    edge_count = sum(len(part) for part in sources)
+    return (lats, lons, np.concatenate(sources), np.concatenate(targets), np.concatenate(seconds),
+            np.zeros(edge_count + 1, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+def benchmark(size, routes, graph_path):
+    started = time.perf_counter()
+    write_graph(graph_path, *synthetic_city_edges(size))
+    print(f"Wrote {size}x{size} grid graph in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    graph = RoadGraph(graph_path)
+    print(f"Mapped {graph.node_count} nodes / {graph.edge_count} edges in "
+          f"{(time.perf_counter() - started) * 1000.0:.2f} ms")
+    rng = random.Random(3)
+    lats = np.frombuffer(graph.lat, dtype=np.float64)
+    lons = np.frombuffer(graph.lon, dtype=np.float64)
+    timings, settled, found = [], [], 0
+    for _ in range(routes):
+        a, b = rng.randrange(graph.node_count), rng.randrange(graph.node_count)
+        route = graph.route(lats[a], lons[a], lats[b], lons[b])
+        if route:
+            found += 1
+            timings.append(route.elapsed_ms)
+            settled.append(route.settled)
+    del lats, lons
+    timings.sort()
+    print(f"{found}/{routes} routes: p50 {timings[len(timings) // 2]:.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)]:.1f} ms, max {timings[-1]:.1f} ms, "
+          f"mean settled {sum(settled) / len(settled):.0f} nodes")
+    graph.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build road graphs from OSM extracts and compute offline routes.")
+    parser.add_argument("--build", type=Path, metavar="OSM", help="OSM extract (.osm, .osm.gz, .osm.bz2)")
+    parser.add_argument("--city", help="City folder name; the graph goes to media/maps/routing/<city>.rgraph")
+    parser.add_argument("--graph", type=Path, help="Graph file (overrides --city)")
+    parser.add_argument("--route", nargs=4, type=float, metavar=("LAT1", "LON1", "LAT2", "LON2"))
+    parser.add_argument("--benchmark", type=int, metavar="GRID_SIZE", help="Route on a synthetic GRID_SIZE^2 street grid")
+    parser.add_argument("--routes", type=int, default=50, help="Number of random routes for --benchmark")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        import tempfile
+        with tempfile.TemporaryDirectory(prefix="road_bench_") as tmp:
+            benchmark(args.benchmark, args.routes, Path(tmp) / "bench.rgraph")
+        return 0
+
+    graph_path = args.graph or (graph_path_for_city(args.city) if args.city else None)
+    if not graph_path:
+        parser.error("--city or --graph is required")
+    if args.build:
+        build_graph_from_osm(args.build, graph_path)
+    if args.route:
+        graph = RoadGraph(graph_path)
+        route = graph.route(*args.route)
+        print(route.summary() if route else "No route found")
+        graph.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from vehicle_data import SignalDecoder, SignalDef
+
+# --- Constants ---
+DEFAULT_COMMAND_LOG = Path(__file__).resolve().parent.parent / "media" / "vehicle" / "seat_commands.log"
+SEAT_AXES = ("fb", "recline", "height")
+# Travel in slider steps per second: a full fore/aft run (10 steps) takes about 10 s, like a real seat motor
+AXIS_RATES = {"fb": 1.0, "recline": 0.8, "height": 0.5}
+SEAT_COMMAND_IDS = {"Driver": 0x4B0, "Front Passenger": 0x4B1}
+# One frame per seat carrying all three axis targets
+SEAT_COMMAND_SIGNALS = tuple(
+    SignalDef(f"seat_{axis}_target", frame_id, 8 * index, 8, 0.1, 0.0, False, float, "")
+    for frame_id in SEAT_COMMAND_IDS.values() for index, axis in enumerate(SEAT_AXES))
+TICK_HZ = 50                 # Motion model and command scheduling rate (worker thread)
+DISPLAY_HZ = 25              # Position updates handed to the UI
+COMMAND_INTERVAL_SEC = 0.1   # At most one command per seat in this time; the newest targets win
+MAX_COMMAND_LOG_BYTES = 1 << 20  # Log is rotated to .1 past this, so at most twice it is kept
+
+
+class SeatCommandLog:
+    """
+    Stand-in for the body CAN bus: appends each command frame to a candump -L
+    style log, so it can be inspected or replayed with the existing tools.
+    Past max_bytes the log is moved to <name>.1 (replacing the previous one)
+    and started afresh.
+    """
+
+    def __init__(self, path=DEFAULT_COMMAND_LOG, channel="vcan0", max_bytes=MAX_COMMAND_LOG_BYTES):
+        self.path = Path(path)
+        self.channel = channel
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="ascii", buffering=1)  # Line buffered
+        self.size = self.path.stat().st_size
+
+    def send(self, frame):
+        line = f"({frame.time:.6f}) {self.channel} {frame.can_id:03X}#{frame.data.hex().upper()}\n"
+        if self.size + len(line) > self.max_bytes:
+            self._file.close()
+            try:
+                os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            finally:
+                self._open()  # Keeps appending to the same file if the rename failed
+        self._file.write(line)
+        self.size += len(line)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class SeatActuatorModel(QObject):
+    """
+    Simulated seat motors. set_target() from the GUI only records the wanted
+    position; a worker thread ticks at tick_hz, sending a seat's targets to
+    the output as one command frame at most once per command_interval (a
+    slider drag through many values sends the newest of them at that rate,
+    always ending with the one it stopped on) and moving each axis towards
+    the last commanded target at AXIS_RATES. A GUI-thread timer emits the
+    positions of seats that moved at display_hz, however often the model
+    ticks or targets change.
+    """
+    positionsUpdated = pyqtSignal(dict)  # {seat: {axis: position}}, only seats that moved
+
+    def __init__(self, output=None, tick_hz=TICK_HZ, display_hz=DISPLAY_HZ,
+                 command_interval=COMMAND_INTERVAL_SEC, parent=None):
+        super().__init__(parent)
+        self.output = output  # Anything with send(frame); nothing is sent without one
+        self.encoder = SignalDecoder(SEAT_COMMAND_SIGNALS)
+        self.tick_interval = 1.0 / tick_hz
+        self.command_interval = command_interval
+        self.targets = {}    # seat -> {axis: value} as last asked for
+        self.positions = {}  # seat -> {axis: value} where the motors are now
+        self.target_count = 0
+        self.command_count = 0
+        self._commanded = {}  # seat -> (monotonic time, targets) of the last command sent
+        self._moved = set()
+        self._last_tick = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.display_timer = QTimer(self)
+        self.display_timer.setInterval(int(1000 / display_hz))
+        self.display_timer.timeout.connect(self.dispatch)
+
+    def set_target(self, seat, position, jump=False):
+        """
+        Asks for seat to move to position. jump means the seat is already
+        there (restored at startup), so nothing is commanded or moved.
+        """
+        target = {axis: float(position[axis]) for axis in SEAT_AXES}
+        with self._lock:
+            self.targets[seat] = target
+            self.target_count += 1
+            if jump or seat not in self.positions:
+                self.positions[seat] = dict(target)
+                self._commanded[seat] = (None, target)
+                self._moved.add(seat)
+
+    def moving(self, seat):
+        with self._lock:
+            return seat in self.positions and self.positions[seat] != self.targets[seat]
+
+    def start(self):
+        self.stop()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="SeatActuators", daemon=True)
+        self._thread.start()
+        self.display_timer.start()
+
+    def stop(self):
+        """Stops the worker; targets still waiting on the rate limit are sent first."""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+            self.tick(force=True)
+        self._thread = None
+        self.display_timer.stop()
+
+    def _run(self, stop_event):
+        while not stop_event.wait(self.tick_interval):
+            self.tick()
+
+    def tick(self, now=None, force=False):
+        """Sends due commands and advances the motors to now (monotonic seconds)."""
+        now = time.monotonic() if now is None else now
+        dt = 0.0 if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        due = []
+        with self._lock:
+            for seat, target in self.targets.items():
+                sent_time, commanded = self._commanded[seat]
+                if target != commanded and (force or sent_time is None or now - sent_time >= self.command_interval):
+                    self._commanded[seat] = (now, target)
+                    commanded = target
+                    due.append((seat, target))
+                position = self.positions[seat]
+                for axis in SEAT_AXES:
+                    error = commanded[axis] - position[axis]
+                    if error:
+                        step = AXIS_RATES[axis] * dt
+                        position[axis] = commanded[axis] if abs(error) <= step else position[axis] + math.copysign(step, error)
+                        self._moved.add(seat)
+        for seat, target in due:  # I/O outside the lock so set_target() never waits on it
+            self.send_command(seat, target)
+
+    def send_command(self, seat, target):
+        if self.output is None or seat not in SEAT_COMMAND_IDS:
+            return
+        values = {f"seat_{axis}_target": value for axis, value in target.items()}
+        try:
+            self.output.send(self.encoder.encode(SEAT_COMMAND_IDS[seat], values, timestamp=time.time()))
+            self.command_count += 1
+        except OSError as e:
+            print(f"SeatActuators: Could not send command for {seat}: {e}")
+
+    def dispatch(self):
+        with self._lock:
+            moved = {seat: dict(self.positions[seat]) for seat in self._moved}
+            self._moved.clear()
+        if moved:
+            self.positionsUpdated.emit(moved)
+
+
+# --- Benchmark ---
+
+class _RecordedCommands(list):
+    def send(self, frame):
+        self.append(frame)
+
+
+def benchmark(drag_sec=3.0, pointer_hz=120):
+    """
+    Drags the driver's fore/aft target back and forth at pointer rate, on a
+    simulated clock, and reports how much of it reaches the command channel.
+    """
+    output = _RecordedCommands()
+    model = SeatActuatorModel(output)
+    model.set_target("Driver", {"fb": 0, "recline": 5, "height": 2}, jump=True)
+    ticks, tick_times, sent_at, display_updates = 0, [], [], 0
+    now, next_pointer, next_display = 0.0, 0.0, 0.0
+    last_target = None
+    while True:
+        if now < drag_sec:
+            while next_pointer <= now:
+                phase = next_pointer / drag_sec
+                last_target = {"fb": round(10 * abs(math.sin(math.pi * 1.5 * phase))), "recline": 5, "height": 2}
+                model.set_target("Driver", last_target)
+                next_pointer += 1.0 / pointer_hz
+        commands_before = len(output)
+        t0 = time.perf_counter()
+        model.tick(now)
+        tick_times.append(time.perf_counter() - t0)
+        sent_at.extend([now] * (len(output) - commands_before))
+        ticks += 1
+        if now >= next_display:
+            display_updates += bool(model._moved)
+            model._moved.clear()
+            next_display += 1.0 / DISPLAY_HZ
+        if now >= drag_sec and not model.moving("Driver"):
+            break
+        now += model.tick_interval
+    decoded = model.encoder.decode(output[-1])
+    tick_times.sort()
+    busiest = max(sum(1 for t in sent_at if start <= t < start + 1.0) for start in sent_at)
+    return {
+        "target_changes": model.target_count - 1,
+        "commands": len(output),
+        "max_commands_per_sec": busiest,
+        "final_command_fb": decoded["seat_fb_target"],
+        "final_target_fb": last_target["fb"],
+        "settled_after_sec": round(now - drag_sec, 2),
+        "display_updates": display_updates,
+        "tick_p50_us": round(1e6 * tick_times[len(tick_times) // 2], 1),
+        "tick_max_us": round(1e6 * tick_times[-1], 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure seat command coalescing under a simulated slider drag.")
+    parser.add_argument("--drag-sec", type=float, default=3.0, help="Length of the drag")
+    parser.add_argument("--pointer-hz", type=float, default=120.0, help="Rate of target changes during the drag")
+    args = parser.parse_args(argv)
+    result = benchmark(args.drag_sec, args.pointer_hz)
+    print("--- Seat Actuator Benchmark ---")
+    for name, value in result.items():
+        print(f"  {name:>22}: {value}")
+    return 0 if result["final_command_fb"] == result["final_target_fb"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,17 +2,20 @@ import sys
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QPushButton, QGroupBox, QFileDialog, QMessageBox, QMainWindow,
-    QButtonGroup, QGridLayout  # Added QButtonGroup
+    QButtonGroup, QGridLayout, QSpinBox, QComboBox  # Added QButtonGroup
 )
 from PyQt6.QtGui import QFont, QPalette, QColor
 from PyQt6.QtCore import Qt
 from pathlib import Path
 
+from map_storage import TileStorageManager
+
 
 # This function will create the settings tab content
 def create_settings_tab(media_tab_ref, main_window_ref):
     """
-    Creates the Settings tab with options to configure media source paths and application theme.
+    Creates the Settings tab with options to pick the driver profile and configure media source
+    paths and application theme.
     Args:
         media_tab_ref: A direct reference to the MediaTab instance.
         main_window_ref: Reference to the main InfotainmentSystem window.
@@ -23,6 +26,43 @@ def create_settings_tab(media_tab_ref, main_window_ref):
     main_layout.setSpacing(25)
     main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
 
+    # --- Driver Profile Group ---
+    driver_group = QGroupBox("Driver Profile")
+    driver_group.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+    driver_layout = QHBoxLayout(driver_group)
+    driver_layout.setSpacing(10)
+
+    driver_layout.addWidget(QLabel("Driver:"))
+    driver_combo = QComboBox()
+    driver_combo.setObjectName("DriverProfileCombo")
+    driver_combo.setEditable(True)  # Typing a new name starts a profile for that driver
+    driver_combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+    driver_layout.addWidget(driver_combo, 1)
+    switch_driver_button = QPushButton("Switch Driver")
+    switch_driver_button.setFont(QFont("Arial", 12, QFont.Weight.Bold))
+    driver_layout.addWidget(switch_driver_button)
+
+    def populate_driver_combo():
+        store = getattr(main_window_ref, 'profile_store', None)
+        driver_combo.blockSignals(True)
+        driver_combo.clear()
+        if store:
+            driver_combo.addItems(store.drivers())
+            driver_combo.setCurrentText(store.driver)
+        driver_combo.blockSignals(False)
+
+    def switch_driver():
+        manager = getattr(main_window_ref, 'driver_profiles', None)
+        if manager is None:
+            QMessageBox.critical(main_window_ref, "Error", "Driver profiles are not available.")
+            return
+        manager.switch_to(driver_combo.currentText())
+
+    driver_combo.activated.connect(lambda index: switch_driver())
+    driver_combo.lineEdit().returnPressed.connect(switch_driver)  # A new name is not in the list to activate
+    switch_driver_button.clicked.connect(switch_driver)
+    populate_driver_combo()
+
     # --- Media Source Paths Group ---
     media_paths_group = QGroupBox("Media Source Directories")
     media_paths_group.setFont(QFont("Arial", 14, QFont.Weight.Bold))
@@ -133,6 +173,75 @@ def create_settings_tab(media_tab_ref, main_window_ref):
     theme_button_group.buttonClicked.connect(on_theme_button_clicked)
     update_theme_button_styles()  # Set initial active button style
 
+    # --- Offline Map Storage Group ---
+    storage_group = QGroupBox("Offline Map Storage")
+    storage_group.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+    storage_layout = QGridLayout(storage_group)
+    storage_layout.setSpacing(10)
+
+    storage_report_label = QLabel("Usage not loaded.")
+    storage_report_label.setObjectName("MapStorageReportLabel")
+    storage_report_label.setFont(QFont("Monospace", 10))
+    storage_report_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+    storage_layout.addWidget(storage_report_label, 0, 0, 1, 4)
+
+    storage_layout.addWidget(QLabel("Quota (MB):"), 1, 0)
+    quota_spin_box = QSpinBox()
+    quota_spin_box.setRange(50, 64000)
+    quota_spin_box.setSingleStep(50)
+    quota_spin_box.setValue(2000)
+    storage_layout.addWidget(quota_spin_box, 1, 1)
+    refresh_usage_button = QPushButton("Refresh Usage")
+    enforce_quota_button = QPushButton("Apply Quota")
+    rebuild_index_button = QPushButton("Rebuild Index")
+    storage_layout.addWidget(refresh_usage_button, 1, 2)
+    storage_layout.addWidget(enforce_quota_button, 1, 3)
+    storage_layout.addWidget(rebuild_index_button, 2, 3)
+
+    def get_tile_storage():
+        """Shares the Maps tab's index so its buffered view stats are included."""
+        maps_tab = getattr(main_window_ref, 'maps_tab_instance', None)
+        storage = getattr(maps_tab, 'tile_storage', None)
+        if storage is None:
+            storage = getattr(settings_tab_widget, '_tile_storage', None)
+            if storage is None:
+                storage = TileStorageManager()
+                settings_tab_widget._tile_storage = storage
+        return storage
+
+    def quota_bytes():
+        return quota_spin_box.value() * 1024 * 1024
+
+    def refresh_storage_report():
+        try:
+            storage = get_tile_storage()
+            storage.flush_access()
+            storage_report_label.setText("\n".join(storage.usage_report_lines(quota_bytes())))
+        except Exception as e:
+            storage_report_label.setText(f"Storage index unavailable: {e}")
+
+    def apply_storage_quota():
+        try:
+            evicted, freed = get_tile_storage().enforce_quota(quota_bytes())
+        except Exception as e:
+            QMessageBox.critical(main_window_ref, "Error", f"Could not apply quota: {e}")
+            return
+        refresh_storage_report()
+        QMessageBox.information(main_window_ref, "Quota Applied",
+                                f"Evicted {evicted} tiles ({freed // (1024 * 1024)} MB freed).")
+
+    def rebuild_storage_index():
+        try:
+            get_tile_storage().rebuild_index()
+        except Exception as e:
+            QMessageBox.critical(main_window_ref, "Error", f"Could not rebuild index: {e}")
+            return
+        refresh_storage_report()
+
+    refresh_usage_button.clicked.connect(refresh_storage_report)
+    enforce_quota_button.clicked.connect(apply_storage_quota)
+    rebuild_index_button.clicked.connect(rebuild_storage_index)
+
     # --- Connections ---
     def browse_music_folder():
         folder_path = QFileDialog.getExistingDirectory(main_window_ref, "Select Music Folder")
@@ -163,8 +272,20 @@ def create_settings_tab(media_tab_ref, main_window_ref):
     video_browse_button.clicked.connect(browse_video_folder)
     update_paths_button.clicked.connect(apply_media_paths)
 
+    def show_driver_settings():
+        """Shows the settings of the driver just switched to (called by the driver profile manager)."""
+        if media_tab_ref and hasattr(media_tab_ref, 'music_source_dir'):
+            music_path_edit.setText(str(media_tab_ref.music_source_dir))
+            video_path_edit.setText(str(media_tab_ref.video_source_dir))
+        update_theme_button_styles()
+        populate_driver_combo()
+
+    settings_tab_widget.apply_driver_profile = show_driver_settings
+
+    main_layout.addWidget(driver_group)
     main_layout.addWidget(media_paths_group)
     main_layout.addWidget(theme_group)
+    main_layout.addWidget(storage_group)
     main_layout.addStretch(1)
 
     return settings_tab_widget
@@ -0,0 +1,362 @@
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PyQt6.QtCore import QLineF, Qt, QTimer
+from PyQt6.QtGui import QColor, QFont, QPainter, QPen, QPixmap
+from PyQt6.QtWidgets import QComboBox, QGroupBox, QHBoxLayout, QLabel, QSizePolicy, QVBoxLayout, QWidget
+
+# --- Constants ---
+LEVEL_BASE_SEC = 1.0 / 32    # Finest bucket width; each level is LEVEL_FACTOR times coarser
+LEVEL_FACTOR = 4
+LEVEL_COUNT = 7              # 1/32 s ... 128 s buckets
+LEVEL_CAPACITY = 8192        # Buckets per level: 4.3 min at the finest level, 12 days at the coarsest
+CHART_FPS = 25
+MIN_SPAN_SEC = 60.0
+ZOOM_SPANS = (("1 min", 60.0), ("5 min", 300.0), ("15 min", 900.0), ("1 h", 3600.0), ("Trip", None))
+BACKGROUND = QColor(42, 42, 42)
+GRID_COLOR = QColor(70, 70, 70)
+TEXT_COLOR = QColor(200, 200, 200)
+
+
+class MinMaxPyramid:
+    """
+    Per-bucket min/max of one signal at several time resolutions, each held
+    in a fixed ring so memory does not grow with the drive. Buckets sit on
+    an absolute time grid (bucket b of a level covers [b*w, (b+1)*w)), so
+    new samples fold into the current bucket and a chart column always maps
+    to a contiguous run of buckets.
+    """
+
+    def __init__(self, base=LEVEL_BASE_SEC, factor=LEVEL_FACTOR, levels=LEVEL_COUNT, capacity=LEVEL_CAPACITY):
+        self.widths = [base * factor ** level for level in range(levels)]
+        self.capacity = capacity
+        self.ids = np.full((levels, capacity), -1, dtype=np.int64)  # Bucket each slot holds
+        self.mins = np.zeros((levels, capacity))
+        self.maxs = np.zeros((levels, capacity))
+        self.first_time = None
+        self.last_time = None
+        self.last_value = None
+
+    def add(self, times, values):
+        """Folds chronological samples into every level."""
+        if not len(times):
+            return
+        if self.first_time is None:
+            self.first_time = float(times[0])
+        self.last_time, self.last_value = float(times[-1]), float(values[-1])
+        for level, width in enumerate(self.widths):
+            buckets = np.floor(times / width).astype(np.int64)
+            starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+            buckets = buckets[starts]
+            mins = np.minimum.reduceat(values, starts)
+            maxs = np.maximum.reduceat(values, starts)
+            slots = buckets % self.capacity
+            held = self.ids[level, slots] == buckets  # Bucket already has samples from an earlier add
+            self.mins[level, slots] = np.where(held, np.minimum(self.mins[level, slots], mins), mins)
+            self.maxs[level, slots] = np.where(held, np.maximum(self.maxs[level, slots], maxs), maxs)
+            self.ids[level, slots] = buckets
+
+    def columns(self, first_column, count, column_width):
+        """
+        (mins, maxs) of `count` chart columns, column k covering
+        [k * column_width, (k + 1) * column_width), starting at first_column;
+        NaN where there is no data. Reads at most a few buckets per column,
+        however many samples went in.
+        """
+        level = self._level_for(column_width, count * column_width)
+        scale = column_width / self.widths[level]
+        edges = np.floor(np.arange(first_column, first_column + count + 1) * scale).astype(np.int64)
+        buckets = np.arange(edges[0], edges[-1] + 1)
+        slots = buckets % self.capacity
+        held = self.ids[level, slots] == buckets
+        bucket_mins = np.where(held, self.mins[level, slots], np.nan)
+        bucket_maxs = np.where(held, self.maxs[level, slots], np.nan)
+        # Column k reduces buckets [edges[k], edges[k+1]); a column narrower than a bucket gets that bucket
+        starts = edges - edges[0]
+        return np.fmin.reduceat(bucket_mins, starts)[:-1], np.fmax.reduceat(bucket_maxs, starts)[:-1]
+
+    def _level_for(self, column_width, span):
+        # Coarsest level no wider than a column that still holds the whole span
+        chosen = None
+        for level, width in enumerate(self.widths):
+            if width * self.capacity < span:
+                continue
+            if chosen is None or width <= column_width:
+                chosen = level
+        return len(self.widths) - 1 if chosen is None else chosen
+
+
+def _nice_ceiling(value):
+    """Smallest 1, 2 or 5 times a power of ten that is >= value."""
+    if value <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if step * magnitude >= value:
+            return step * magnitude
+    return 10 * magnitude
+
+
+class TelemetryChart(QWidget):
+    """
+    Scrolling min/max chart of one signal. Each pixel column draws the range
+    of its time slice from a MinMaxPyramid, so a redraw costs one line per
+    column whatever the sample rate or zoom. The plot lives in a pixmap that
+    is scrolled as time advances: a refresh draws only the columns that are
+    new or still filling, and the whole plot is redrawn only on resize, zoom
+    or when the value axis has to grow.
+    """
+
+    def __init__(self, title, unit, color, y_max, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.unit = unit
+        self.pen = QPen(QColor(color))
+        self.default_y_max = y_max
+        self.y_max = y_max
+        self.pyramid = MinMaxPyramid()
+        self.span = MIN_SPAN_SEC  # Seconds shown, or None for everything since the first sample
+        self.pixmap = None
+        self.column_width = None
+        self.right_column = None  # Absolute column index drawn at the right edge
+        self.full_redraws = 0
+        self.partial_redraws = 0
+        self.setMinimumHeight(90)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+    def set_span(self, span):
+        self.span = span
+        self.refresh()
+
+    def _column_width(self, width):
+        if self.span is not None:
+            return self.span / width
+        # The trip span grows every tick; step the column width in 2^(1/4) increments so the
+        # plot still scrolls incrementally in between
+        span = max(MIN_SPAN_SEC, self.pyramid.last_time - self.pyramid.first_time)
+        return 2.0 ** (math.ceil(4 * math.log2(span / width)) / 4)
+
+    # --- Drawing ---
+
+    def refresh(self):
+        """Brings the plot up to the newest sample; returns the number of columns drawn."""
+        width, height = self.width(), self.height()
+        if self.pyramid.last_time is None or width < 2 or height < 2:
+            return 0
+        column_width = self._column_width(width)
+        right = math.floor(self.pyramid.last_time / column_width)
+        if (self.pixmap is None or self.pixmap.width() != width or self.pixmap.height() != height
+                or column_width != self.column_width or not 0 <= right - self.right_column < width - 1):
+            return self._redraw(column_width, right)
+
+        # Redraw from the previous right column on (it may have been still filling), with the
+        # column before it read only to join the trace
+        first = self.right_column - 1
+        mins, maxs = self.pyramid.columns(first, right - first + 1, column_width)
+        if np.fmax.reduce(maxs) > self.y_max:
+            return self._redraw(column_width, right)
+        shift = right - self.right_column
+        if shift:
+            self.pixmap.scroll(-shift, 0, self.pixmap.rect())
+        x = width - 1 - shift
+        painter = QPainter(self.pixmap)
+        painter.fillRect(x, 0, width - x, height, BACKGROUND)
+        self._draw_columns(painter, x - 1, mins, maxs)
+        painter.end()
+        self.right_column = right
+        self.partial_redraws += 1
+        self.update()
+        return shift + 1
+
+    def _redraw(self, column_width, right):
+        width, height = self.width(), self.height()
+        mins, maxs = self.pyramid.columns(right - width, width + 1, column_width)
+        visible_max = np.fmax.reduce(maxs)
+        self.y_max = _nice_ceiling(max(self.default_y_max, 0.0 if np.isnan(visible_max) else visible_max))
+        if self.pixmap is None or self.pixmap.width() != width or self.pixmap.height() != height:
+            self.pixmap = QPixmap(width, height)
+        self.pixmap.fill(BACKGROUND)
+        painter = QPainter(self.pixmap)
+        self._draw_columns(painter, -1, mins, maxs)
+        painter.end()
+        self.column_width = column_width
+        self.right_column = right
+        self.full_redraws += 1
+        self.update()
+        return width
+
+    def _draw_columns(self, painter, x, mins, maxs):
+        """Draws columns 1.. of mins/maxs from pixel x + 1 on; column 0 only joins the trace."""
+        # Stretch each column's range to meet the previous one so the trace has no breaks
+        previous_mins, previous_maxs = mins[:-1], maxs[:-1]
+        mins, maxs = mins[1:], maxs[1:]
+        lows = np.where(previous_maxs < mins, previous_maxs, mins)
+        highs = np.where(previous_mins > maxs, previous_mins, maxs)
+        scale = (self.pixmap.height() - 1) / self.y_max
+        bottom = self.pixmap.height() - 1
+        y_lows = np.clip(bottom - lows * scale, 0, bottom)
+        y_highs = np.clip(bottom - highs * scale, 0, bottom)
+        columns = np.flatnonzero(~np.isnan(mins)).tolist()
+        if not columns:
+            return
+        painter.setPen(self.pen)
+        y_lows, y_highs = y_lows.tolist(), y_highs.tolist()
+        painter.drawLines([QLineF(x + 1 + c, y_lows[c], x + 1 + c, y_highs[c]) for c in columns])
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.refresh()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.pixmap is not None:
+            painter.drawPixmap(0, 0, self.pixmap)
+        else:
+            painter.fillRect(self.rect(), BACKGROUND)
+        painter.setPen(GRID_COLOR)
+        middle = self.height() // 2
+        painter.drawLine(0, middle, self.width(), middle)
+        painter.setFont(QFont("Arial", 10))
+        painter.setPen(TEXT_COLOR)
+        value = self.pyramid.last_value
+        painter.drawText(6, 14, f"{self.title}: {value:.1f} {self.unit}" if value is not None else self.title)
+        painter.drawText(self.rect().adjusted(0, 2, -6, 0), Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop,
+                         f"{self.y_max:g}")
+        if self.column_width is not None:
+            shown = self.column_width * self.width()
+            label = f"-{shown / 60:.0f} min" if shown >= 90 else f"-{shown:.0f} s"
+            painter.drawText(self.rect().adjusted(6, 0, 0, -2), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignBottom,
+                             label)
+        painter.end()
+
+
+class TelemetryChartPanel(QGroupBox):
+    """
+    Speed and fuel rate history charts with a zoom selector. A display-rate
+    timer moves the samples appended to the telemetry history since the
+    last tick into each chart's pyramid (always, so nothing is missed while
+    the tab is hidden) and refreshes the charts only while they are shown.
+    """
+
+    def __init__(self, telemetry, parent=None):
+        super().__init__("History", parent)
+        self.telemetry = telemetry
+        self.read_positions = {}
+        self.charts = {
+            "speed_kmh": TelemetryChart("Speed", "km/h", "#007ACC", 100),
+            "fuel_rate_lph": TelemetryChart("Fuel Rate", "L/h", "#E0A030", 10),
+        }
+
+        layout = QVBoxLayout()
+        zoom_layout = QHBoxLayout()
+        zoom_layout.addWidget(QLabel("Zoom:"))
+        self.zoom_combo = QComboBox()
+        for label, span in ZOOM_SPANS:
+            self.zoom_combo.addItem(label, span)
+        self.zoom_combo.currentIndexChanged.connect(self.handle_zoom_change)
+        zoom_layout.addWidget(self.zoom_combo)
+        zoom_layout.addStretch(1)
+        layout.addLayout(zoom_layout)
+        for chart in self.charts.values():
+            layout.addWidget(chart)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(1000 // CHART_FPS)
+
+    def handle_zoom_change(self, index):
+        span = self.zoom_combo.itemData(index)
+        for chart in self.charts.values():
+            chart.set_span(span)
+
+    def tick(self):
+        for name, chart in self.charts.items():
+            history = self.telemetry.get(name)
+            if history is None:
+                continue
+            times, values, self.read_positions[name] = history.read_from(self.read_positions.get(name, 0))
+            chart.pyramid.add(times, values)
+            if len(times) and chart.isVisible():
+                chart.refresh()
+
+
+# --- Benchmark ---
+
+def benchmark(sample_count, rate_hz, width):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    rng = np.random.default_rng(1)
+    times = time.time() - sample_count / rate_hz + np.arange(sample_count) / rate_hz
+    values = np.clip(60 + np.cumsum(rng.normal(0, 0.3, sample_count)), 0, 180)
+    chart = TelemetryChart("Speed", "km/h", "#007ACC", 100)
+    chart.resize(width, 120)
+
+    # Fed one second at a time here; the panel feeds a display frame's worth (rate / CHART_FPS)
+    chunk = max(1, int(rate_hz))
+    t0 = time.perf_counter()
+    for start in range(0, sample_count, chunk):
+        chart.pyramid.add(times[start:start + chunk], values[start:start + chunk])
+    elapsed = time.perf_counter() - t0
+    print(f"{sample_count} samples ({sample_count / rate_hz / 3600:.1f} h at {rate_hz:g} Hz) into the pyramid: "
+          f"{1000 * elapsed:.0f} ms ({1e6 * elapsed / sample_count:.2f} us/sample)")
+
+    print(f"Full redraw at {width} px (pyramid) vs min/max over the raw samples in view:")
+    for label, span in ZOOM_SPANS:
+        chart.span = span
+        chart.pixmap = None
+        t1 = time.perf_counter()
+        for _ in range(20):
+            chart.pixmap = None
+            chart.refresh()
+        redraw = (time.perf_counter() - t1) / 20
+        shown = chart.column_width * width
+        t2 = time.perf_counter()
+        in_view = np.searchsorted(times, times[-1] - shown)
+        columns = np.floor((times[in_view:] - times[-1] + shown) / chart.column_width).astype(np.int64)
+        starts = np.flatnonzero(np.diff(columns, prepend=-1))
+        np.minimum.reduceat(values[in_view:], starts)
+        np.maximum.reduceat(values[in_view:], starts)
+        raw = time.perf_counter() - t2
+        print(f"  {label:>6}: {1000 * redraw:6.2f} ms   (raw decimation of {sample_count - in_view:7d} samples "
+              f"alone: {1000 * raw:6.2f} ms)")
+
+    # Incremental: keep appending a display frame's worth of samples and refresh, as the panel does
+    chart.span = 300.0
+    chart.refresh()
+    frame = max(1, int(rate_hz / CHART_FPS))
+    step = np.arange(1, frame + 1) / rate_hz
+    last_time, last_value = times[-1], values[-1]
+    chart.full_redraws = chart.partial_redraws = 0
+    ticks = 1000
+    t3 = time.perf_counter()
+    for _ in range(ticks):
+        new_times = last_time + step
+        new_values = np.clip(last_value + np.cumsum(rng.normal(0, 0.3, frame)), 0, 180)
+        chart.pyramid.add(new_times, new_values)
+        chart.refresh()
+        last_time, last_value = new_times[-1], new_values[-1]
+    elapsed = time.perf_counter() - t3
+    print(f"Display ticks (5 min zoom, {frame} new samples each): {1000 * elapsed / ticks:.3f} ms/tick, "
+          f"{chart.partial_redraws} incremental / {chart.full_redraws} full redraws")
+    del app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the telemetry chart decimation and drawing.")
+    parser.add_argument("--samples", type=int, default=1000000)
+    parser.add_argument("--rate", type=float, default=100.0, help="Sample rate of the generated signal (Hz)")
+    parser.add_argument("--width", type=int, default=800, help="Chart width in pixels")
+    args = parser.parse_args(argv)
+    benchmark(args.samples, args.rate, args.width)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
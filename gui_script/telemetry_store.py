@@ -0,0 +1,271 @@
+import argparse
+import sys
+import time
+from array import array
+from collections import deque, namedtuple
+
+import numpy as np
+
+# --- Constants ---
+DEFAULT_CAPACITY = 1 << 17          # Samples per signal: ~22 min at 100 Hz, ~3.6 h at 10 Hz (2 MB)
+DEFAULT_WINDOWS = (60.0, 300.0)     # Seconds; windowed stats are kept up to date for these
+
+WindowStats = namedtuple("WindowStats", "min max mean count")
+
+
+class SignalHistory:
+    """
+    Fixed-size ring of (time, value) samples for one signal, written by a
+    single producer thread and read by any number of readers without locks.
+
+    The producer writes a slot and only then advances `written`, so readers
+    read `written`, copy, read it again, and drop whatever the producer may
+    have overwritten meanwhile, counting the slot it may be writing right
+    now (the oldest one once the ring is full). Min/max/mean over each configured window are
+    maintained on append (monotonic index deques plus a running sum) and
+    published as one immutable tuple, so a query is a dict lookup.
+
+    Windows and `since` searches rely on times never going backwards, so a
+    sample older than the newest one held is rejected (and counted).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, windows=DEFAULT_WINDOWS):
+        self.capacity = capacity
+        # array('d') keeps per-sample access cheap for the producer; readers copy through NumPy views
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self._times_view = np.frombuffer(self.times, dtype=np.float64)
+        self._values_view = np.frombuffer(self.values, dtype=np.float64)
+        self.written = 0  # Samples ever appended; slot of sample i is i % capacity
+        self.last_time = float("-inf")
+        self.rejected = 0  # Samples dropped for going back in time
+        self._windows = [_WindowState(window, capacity) for window in windows]
+        self.stats = {window: None for window in windows}  # window -> WindowStats, replaced whole
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    # --- Producer ---
+
+    def append(self, timestamp, value):
+        if timestamp < self.last_time:
+            if not self.rejected:
+                print(f"Warning: Telemetry time went back from {self.last_time:.3f} to {timestamp:.3f}, "
+                      f"dropping samples until it catches up")
+            self.rejected += 1
+            return
+        self.last_time = timestamp
+        index = self.written
+        slot = index % self.capacity
+        if index >= self.capacity:
+            for state in self._windows:
+                state.drop(self, index - self.capacity)  # Its slot is about to be reused
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.written = index + 1  # Publish only after the slot holds the new sample
+        for state in self._windows:
+            self.stats[state.window] = state.add(self, index, timestamp, value)
+
+    # --- Readers ---
+
+    def latest(self):
+        written = self.written
+        if not written:
+            return None
+        slot = (written - 1) % self.capacity
+        sample = (self.times[slot], self.values[slot])
+        # A full lap during these reads would mean the slot was rewritten; then just retry
+        return sample if self.written - written < self.capacity else self.latest()
+
+    def snapshot(self, since=None, last=None):
+        """
+        Chronological copies (times, values) of the samples with time >= since
+        and/or the last `last` samples; everything still held if neither is given.
+        """
+        end = self.written
+        start = max(0, end - self.capacity)
+        if last is not None:
+            start = max(start, end - last)
+        if since is not None and end > start:
+            # Ring times are sorted from the oldest held slot, so search the two halves
+            start = self._first_index_at_or_after(since, start, end)
+        times, values = self._copy(start, end)
+        # Samples the producer may have overwritten while we copied are dropped, plus the one it may be writing
+        overwritten = self.written + 1 - self.capacity - start
+        if overwritten > 0:
+            times, values = times[overwritten:], values[overwritten:]
+        return times, values
+
+    def read_from(self, index):
+        """
+        (times, values, next_index) for samples from sample index `index` on,
+        for readers that consume incrementally; samples already overwritten
+        are skipped.
+        """
+        end = self.written
+        start = max(index, end - self.capacity)
+        times, values = self._copy(start, end)
+        overwritten = self.written + 1 - self.capacity - start
+        if overwritten > 0:
+            times, values = times[overwritten:], values[overwritten:]
+        return times, values, end
+
+    def window_stats(self, window):
+        return self.stats.get(window)
+
+    def values_between(self, start, end):
+        """Values of sample indices [start, end), which must still be held."""
+        return self._copy(start, end)[1]
+
+    def _copy(self, start, end):
+        if end <= start:
+            return np.zeros(0), np.zeros(0)
+        times, values = self._times_view, self._values_view
+        first, last = start % self.capacity, (end - 1) % self.capacity
+        if first <= last and end - start <= self.capacity:
+            return times[first:last + 1].copy(), values[first:last + 1].copy()
+        return (np.concatenate([times[first:], times[:last + 1]]),
+                np.concatenate([values[first:], values[:last + 1]]))
+
+    def _first_index_at_or_after(self, timestamp, start, end):
+        first = start % self.capacity
+        count = end - start
+        if first + count <= self.capacity:
+            return start + int(np.searchsorted(self._times_view[first:first + count], timestamp))
+        head = self._times_view[first:]
+        position = int(np.searchsorted(head, timestamp))
+        if position < len(head):
+            return start + position
+        tail = self._times_view[:count - len(head)]
+        return start + len(head) + int(np.searchsorted(tail, timestamp))
+
+
+class _WindowState:
+    """Producer-side state for one sliding time window of a SignalHistory."""
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.start = 0  # Oldest sample index inside the window
+        self.total = 0.0
+        self.evicted_since_resum = 0
+        self.resum_every = capacity
+        self.min_indices = deque()  # Indices with increasing values (front: window min)
+        self.max_indices = deque()  # Indices with decreasing values (front: window max)
+
+    def drop(self, history, index):
+        """Removes sample `index` from the window before the ring overwrites it."""
+        if self.start <= index:
+            self.total -= history.values[index % history.capacity]
+            self.start = index + 1
+            self.evicted_since_resum += 1
+
+    def add(self, history, index, timestamp, value):
+        times, values, capacity = history.times, history.values, history.capacity
+        min_indices, max_indices = self.min_indices, self.max_indices
+        while min_indices and values[min_indices[-1] % capacity] >= value:
+            min_indices.pop()
+        min_indices.append(index)
+        while max_indices and values[max_indices[-1] % capacity] <= value:
+            max_indices.pop()
+        max_indices.append(index)
+        self.total += value
+
+        # Evict samples that left the window
+        cutoff = timestamp - self.window
+        start = self.start
+        while start < index and times[start % capacity] < cutoff:
+            self.total -= values[start % capacity]
+            start += 1
+            self.evicted_since_resum += 1
+        self.start = start
+        while min_indices[0] < start:
+            min_indices.popleft()
+        while max_indices[0] < start:
+            max_indices.popleft()
+
+        count = index + 1 - start
+        if self.evicted_since_resum >= self.resum_every:
+            # Bounds float drift of the running sum; amortized O(1) as it runs once per `capacity` evictions
+            self.total = float(np.sum(history.values_between(start, index + 1)))
+            self.evicted_since_resum = 0
+        return WindowStats(values[min_indices[0] % capacity], values[max_indices[0] % capacity],
+                           self.total / count, count)
+
+
+class TelemetryStore:
+    """
+    One SignalHistory per signal name, created on the first sample. The
+    vehicle data bus worker appends every decoded value (not just the
+    coalesced ones the UI sees); tabs read snapshots and window stats.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, windows=DEFAULT_WINDOWS):
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self.histories = {}
+
+    def append_values(self, timestamp, values):
+        histories = self.histories
+        for name, value in values.items():
+            history = histories.get(name)
+            if history is None:
+                history = histories[name] = SignalHistory(self.capacity, self.windows)
+            history.append(timestamp, float(value))
+
+    def get(self, name):
+        return self.histories.get(name)
+
+    def names(self):
+        return sorted(self.histories)
+
+    def window_stats(self, name, window):
+        history = self.histories.get(name)
+        return history.window_stats(window) if history else None
+
+
+# --- Benchmark ---
+
+def benchmark(sample_count, capacity):
+    rng = np.random.default_rng(1)
+    times = np.cumsum(rng.uniform(0.005, 0.015, sample_count))
+    values = np.cumsum(rng.normal(0, 1, sample_count))
+    history = SignalHistory(capacity, windows=(1.0, 60.0, 300.0))
+    t0 = time.perf_counter()
+    for t, v in zip(times.tolist(), values.tolist()):
+        history.append(t, v)
+    elapsed = time.perf_counter() - t0
+    print(f"{sample_count} appends with 3 windows: {1000 * elapsed:.0f} ms "
+          f"({1e6 * elapsed / sample_count:.2f} us/append)")
+
+    t1 = time.perf_counter()
+    for _ in range(10000):
+        history.window_stats(300.0)
+    t2 = time.perf_counter()
+    snap_times, snap_values = history.snapshot(since=times[-1] - 60.0)
+    t3 = time.perf_counter()
+    print(f"window_stats: {1e6 * (t2 - t1) / 10000:.2f} us/query; "
+          f"60 s snapshot ({len(snap_values)} samples): {1000 * (t3 - t2):.2f} ms")
+
+    for window in (1.0, 60.0, 300.0):
+        held_start = max(0, sample_count - capacity)
+        inside = np.flatnonzero(times[held_start:] >= times[-1] - window) + held_start
+        expected = values[inside]
+        stats = history.window_stats(window)
+        assert stats.count == len(expected), (window, stats.count, len(expected))
+        assert stats.min == expected.min() and stats.max == expected.max()
+        assert abs(stats.mean - expected.mean()) < 1e-6 * max(1.0, abs(expected.mean()))
+        print(f"  {window:>5.0f} s window: {stats.count} samples, min {stats.min:.2f}, "
+              f"max {stats.max:.2f}, mean {stats.mean:.2f} (matches a full scan)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the telemetry ring buffer.")
+    parser.add_argument("--samples", type=int, default=1000000)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    args = parser.parse_args(argv)
+    benchmark(args.samples, args.capacity)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
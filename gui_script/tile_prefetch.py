@@ -0,0 +1,131 @@
+import math
+from collections import deque
+
+from tile_selection import deg2frac_array
+
+# --- Constants ---
+RING_WIDTH = 1          # Tiles of margin around the viewport at the current zoom
+LOOKAHEAD_TILES = 2     # Extra tiles ahead of the direction of travel
+MAX_PREFETCH_TILES = 96
+MIN_TILE_ZOOM = 1
+MAX_TILE_ZOOM = 18
+BLANK_TILE_SAMPLES = 5000  # Most recent tiles kept per mode; map_tile_blank_ms keeps the long run
+
+
+class PrefetchPlanner:
+    """
+    Decides which tiles to warm after the map view settles: the ring just outside
+    the viewport (stretched towards the direction of travel), then the viewport
+    one zoom out and one zoom in. Heading comes from successive view centres
+    unless set explicitly (e.g. from GPS).
+    """
+
+    def __init__(self, tile_exists=None, ring_width=RING_WIDTH, lookahead=LOOKAHEAD_TILES,
+                 max_tiles=MAX_PREFETCH_TILES):
+        self.tile_exists = tile_exists
+        self.ring_width = ring_width
+        self.lookahead = lookahead
+        self.max_tiles = max_tiles
+        self._last_center = None  # (lat, lon)
+        self.heading = None  # Unit (dx, dy) in tile space, y pointing south
+
+    def set_heading_degrees(self, bearing_deg):
+        """Compass bearing (0 = north, 90 = east) from an external source such as GPS."""
+        radians = math.radians(bearing_deg)
+        self.heading = (math.sin(radians), -math.cos(radians))
+
+    def _update_heading(self, lat, lon, zoom):
+        if self._last_center is not None:
+            (x0, x1), (y0, y1) = deg2frac_array([self._last_center[0], lat], [self._last_center[1], lon], zoom)
+            dx, dy = float(x1 - x0), float(y1 - y0)
+            length = math.hypot(dx, dy)
+            if length > 0.25:  # Ignore jitter smaller than a quarter tile
+                self.heading = (dx / length, dy / length)
+        self._last_center = (lat, lon)
+
+    @staticmethod
+    def _tile_range(view, zoom):
+        (west_x, east_x), (north_y, south_y) = deg2frac_array(
+            [view["north"], view["south"]], [view["west"], view["east"]], zoom)
+        last = (1 << zoom) - 1
+        return (max(0, int(math.floor(west_x))), min(last, int(math.floor(east_x))),
+                max(0, int(math.floor(north_y))), min(last, int(math.floor(south_y))))
+
+    def plan(self, view):
+        """
+        view: dict with zoom, west, south, east, north, lat, lon (as sent by the page).
+        Returns a prioritized list of (z, x, y) tiles not currently visible.
+        """
+        zoom = int(view["zoom"])
+        self._update_heading(view["lat"], view["lon"], zoom)
+        x_min, x_max, y_min, y_max = self._tile_range(view, zoom)
+        last = (1 << zoom) - 1
+        heading_x, heading_y = self.heading or (0.0, 0.0)
+
+        # Ring: grow the viewport by ring_width, plus lookahead on the leading sides
+        grow_west = self.ring_width + (self.lookahead if heading_x < -0.3 else 0)
+        grow_east = self.ring_width + (self.lookahead if heading_x > 0.3 else 0)
+        grow_north = self.ring_width + (self.lookahead if heading_y < -0.3 else 0)
+        grow_south = self.ring_width + (self.lookahead if heading_y > 0.3 else 0)
+        center_x = (x_min + x_max + 1) / 2.0
+        center_y = (y_min + y_max + 1) / 2.0
+        ring = []
+        for x in range(max(0, x_min - grow_west), min(last, x_max + grow_east) + 1):
+            for y in range(max(0, y_min - grow_north), min(last, y_max + grow_south) + 1):
+                if x_min <= x <= x_max and y_min <= y <= y_max:
+                    continue
+                offset_x, offset_y = x + 0.5 - center_x, y + 0.5 - center_y
+                distance = math.hypot(offset_x, offset_y) or 1.0
+                alignment = (offset_x * heading_x + offset_y * heading_y) / distance
+                # Tiles ahead first, then nearest; tiles behind go last
+                ring.append((-alignment, distance, zoom, x, y))
+        ring.sort()
+        candidates = [(z, x, y) for _, _, z, x, y in ring]
+
+        for neighbour_zoom in (zoom - 1, zoom + 1):
+            if not MIN_TILE_ZOOM <= neighbour_zoom <= MAX_TILE_ZOOM:
+                continue
+            nx_min, nx_max, ny_min, ny_max = self._tile_range(view, neighbour_zoom)
+            scale = 2.0 ** (neighbour_zoom - zoom)
+            neighbour = sorted(
+                (math.hypot(x + 0.5 - center_x * scale, y + 0.5 - center_y * scale), neighbour_zoom, x, y)
+                for x in range(nx_min, nx_max + 1) for y in range(ny_min, ny_max + 1))
+            candidates.extend((z, x, y) for _, z, x, y in neighbour)
+
+        planned = []
+        for tile in candidates:
+            if self.tile_exists is None or self.tile_exists(*tile):
+                planned.append(tile)
+                if len(planned) >= self.max_tiles:
+                    break
+        return planned
+
+
+class BlankTileStats:
+    """
+    Per-tile time between Leaflet creating a tile (blank) and the image arriving,
+    kept separately for prefetch on/off so the two can be compared, over the
+    most recent max_samples tiles of each.
+    """
+
+    def __init__(self, max_samples=BLANK_TILE_SAMPLES):
+        self.samples = {True: deque(maxlen=max_samples), False: deque(maxlen=max_samples)}
+
+    def record(self, samples_ms, prefetch_enabled):
+        self.samples[bool(prefetch_enabled)].extend(samples_ms)
+
+    @staticmethod
+    def _summarize(samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return {
+            "tiles": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered), 1),
+            "p50_ms": ordered[len(ordered) // 2],
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+
+    def summary(self):
+        return {"prefetch_on": self._summarize(self.samples[True]),
+                "prefetch_off": self._summarize(self.samples[False])}
@@ -0,0 +1,341 @@
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+# --- Constants ---
+EARTH_RADIUS_M = 6378137.0
+MAX_MERCATOR_LAT = 85.05112878  # Web Mercator cuts off the poles here
+
+# Rough size of an OpenStreetMap PNG tile, used when no downloaded tiles exist to sample
+DEFAULT_AVG_TILE_BYTES = 20 * 1024
+
+
+# --- Vectorized Tile Coordinates ---
+
+def deg2frac_array(lat_deg, lon_deg, zoom):
+    """
+    NumPy version of deg2num() that keeps the fractional part.
+    Returns (x, y) float arrays in tile units for the given zoom.
+    """
+    lat = np.clip(np.asarray(lat_deg, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    lon = np.asarray(lon_deg, dtype=np.float64)
+    n = 2.0 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+    return x, y
+
+
+def deg2num_array(lat_deg, lon_deg, zoom):
+    """NumPy version of deg2num(): integer tile X/Y arrays, clamped to the valid tile range."""
+    x, y = deg2frac_array(lat_deg, lon_deg, zoom)
+    last = (1 << zoom) - 1
+    return (np.clip(np.floor(x), 0, last).astype(np.int64),
+            np.clip(np.floor(y), 0, last).astype(np.int64))
+
+
+# --- Tile Coverage ---
+
+class TileCoverage:
+    """
+    The set of tiles selected at one zoom level, stored as merged runs per tile row:
+    row ``rows[i]`` covers x from ``x_starts[i]`` to ``x_ends[i]`` inclusive.
+    """
+
+    def __init__(self, zoom, rows, x_starts, x_ends):
+        self.zoom = zoom
+        self.rows = rows
+        self.x_starts = x_starts
+        self.x_ends = x_ends
+
+    def count(self):
+        return int(np.sum(self.x_ends - self.x_starts + 1)) if len(self.rows) else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        """Yields (x, y) for every selected tile."""
+        for y, x_start, x_end in zip(self.rows.tolist(), self.x_starts.tolist(), self.x_ends.tolist()):
+            for x in range(x_start, x_end + 1):
+                yield x, y
+
+    def x_range(self):
+        if not len(self.rows):
+            return None
+        return int(self.x_starts.min()), int(self.x_ends.max())
+
+    def y_range(self):
+        if not len(self.rows):
+            return None
+        return int(self.rows.min()), int(self.rows.max())
+
+
+def _merge_runs(zoom, rows, starts, ends):
+    """Clips runs to the world and merges overlapping or adjacent runs on the same row."""
+    last = (1 << zoom) - 1
+    keep = (rows >= 0) & (rows <= last) & (ends >= 0) & (starts <= last)
+    rows = rows[keep]
+    starts = np.clip(starts[keep], 0, last)
+    ends = np.clip(ends[keep], 0, last)
+    if not len(rows):
+        empty = np.empty(0, dtype=np.int64)
+        return TileCoverage(zoom, empty, empty, empty)
+
+    order = np.lexsort((starts, rows))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+
+    # Offsetting each row by more than the width of the world lets one running
+    # maximum track the furthest covered x per row without a Python loop.
+    stride = np.int64(last + 3)
+    keyed_ends = np.maximum.accumulate(rows * stride + ends)
+    keyed_starts = rows * stride + starts
+    new_run = np.ones(len(rows), dtype=bool)
+    new_run[1:] = keyed_starts[1:] > keyed_ends[:-1] + 1
+
+    run_ids = np.cumsum(new_run) - 1
+    merged_ends = np.zeros(run_ids[-1] + 1, dtype=np.int64)
+    np.maximum.at(merged_ends, run_ids, ends)
+    return TileCoverage(zoom, rows[new_run], starts[new_run], merged_ends)
+
+
+def _expand_rows(first_rows, row_counts):
+    """For edge i, emits rows first_rows[i] .. first_rows[i] + row_counts[i] - 1."""
+    row_counts = np.maximum(row_counts, 0)
+    edge_idx = np.repeat(np.arange(len(row_counts)), row_counts)
+    offsets = np.cumsum(row_counts) - row_counts
+    rows = first_rows[edge_idx] + (np.arange(len(edge_idx)) - offsets[edge_idx])
+    return edge_idx, rows
+
+
+def rasterize_rings(rings, zoom):
+    """
+    Scanline rasterization of closed rings given in fractional tile coordinates.
+    Inside-ness uses the nonzero winding rule, so overlapping rings with the same
+    orientation are unioned and rings of opposite orientation cut holes.
+    Every tile touched by an edge is included, so the result is conservative.
+    """
+    edge_parts = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        if len(ring) < 2:
+            continue
+        closed = np.vstack([ring, ring[:1]]) if not np.array_equal(ring[0], ring[-1]) else ring
+        edge_parts.append(np.hstack([closed[:-1], closed[1:]]))
+    if not edge_parts:
+        return _merge_runs(zoom, *(np.empty(0, dtype=np.int64),) * 3)
+    edges = np.vstack(edge_parts)
+    x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    y_lo = np.minimum(y0, y1)
+    y_hi = np.maximum(y0, y1)
+    dy = y1 - y0
+    sloped = dy != 0
+    inv_slope = np.zeros_like(dy)
+    inv_slope[sloped] = (x1[sloped] - x0[sloped]) / dy[sloped]
+
+    # 1. Interior spans: winding crossings of the scanline on each tile row's top edge.
+    #    Half-open [y_lo, y_hi) so a vertex on a scanline is counted once.
+    first_row = np.ceil(y_lo).astype(np.int64)
+    edge_idx, scan_rows = _expand_rows(first_row, np.ceil(y_hi).astype(np.int64) - first_row)
+    cross_x = x0[edge_idx] + (scan_rows - y0[edge_idx]) * inv_slope[edge_idx]
+    winding = np.where(dy[edge_idx] > 0, 1, -1)
+
+    order = np.lexsort((cross_x, scan_rows))
+    scan_rows, cross_x, winding = scan_rows[order], cross_x[order], winding[order]
+    inside = np.cumsum(winding) != 0
+    inside[-1:] = False  # closed rings always end a row with zero winding
+    span_idx = np.nonzero(inside)[0]
+    interior_rows = scan_rows[span_idx]
+    interior_starts = np.floor(cross_x[span_idx]).astype(np.int64)
+    interior_ends = np.floor(cross_x[span_idx + 1]).astype(np.int64)
+
+    # 2. Boundary spans: every tile row an edge passes through, clipped to that row.
+    first_row = np.floor(y_lo).astype(np.int64)
+    edge_idx, edge_rows = _expand_rows(first_row, np.floor(y_hi).astype(np.int64) - first_row + 1)
+    clip_top = np.maximum(y_lo[edge_idx], edge_rows)
+    clip_bottom = np.minimum(y_hi[edge_idx], edge_rows + 1)
+    xa = x0[edge_idx] + (clip_top - y0[edge_idx]) * inv_slope[edge_idx]
+    xb = x0[edge_idx] + (clip_bottom - y0[edge_idx]) * inv_slope[edge_idx]
+    flat = ~sloped[edge_idx]
+    xa[flat] = x0[edge_idx][flat]
+    xb[flat] = x1[edge_idx][flat]
+    boundary_starts = np.floor(np.minimum(xa, xb)).astype(np.int64)
+    boundary_ends = np.floor(np.maximum(xa, xb)).astype(np.int64)
+
+    return _merge_runs(
+        zoom,
+        np.concatenate([interior_rows, edge_rows]),
+        np.concatenate([interior_starts, boundary_starts]),
+        np.concatenate([interior_ends, boundary_ends]),
+    )
+
+
+def _oriented(ring_xy, clockwise):
+    """Returns the ring with the requested orientation (in tile space, where y grows downwards)."""
+    x, y = ring_xy[:, 0], ring_xy[:, 1]
+    signed_area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+    if (signed_area > 0) != clockwise:
+        return ring_xy[::-1]
+    return ring_xy
+
+
+def _lonlat_to_frac(coords, zoom):
+    coords = np.asarray(coords, dtype=np.float64)
+    x, y = deg2frac_array(coords[:, 1], coords[:, 0], zoom)
+    return np.column_stack([x, y])
+
+
+# --- GeoJSON Helpers ---
+
+def load_geojson(source, base_dir=None):
+    """Accepts a GeoJSON dict or a path to a .geojson/.json file (relative to base_dir)."""
+    if isinstance(source, dict):
+        return source
+    path = Path(source)
+    if not path.is_absolute() and base_dir is not None:
+        path = Path(base_dir) / path
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_geometries(geojson):
+    """Flattens Feature/FeatureCollection/GeometryCollection into plain geometries."""
+    kind = geojson.get("type")
+    if kind == "FeatureCollection":
+        for feature in geojson.get("features", []):
+            yield from iter_geometries(feature)
+    elif kind == "Feature":
+        if geojson.get("geometry"):
+            yield from iter_geometries(geojson["geometry"])
+    elif kind == "GeometryCollection":
+        for geometry in geojson.get("geometries", []):
+            yield from iter_geometries(geometry)
+    else:
+        yield geojson
+
+
+def polygon_coverage(geojson, zoom):
+    """Tiles intersecting the Polygon/MultiPolygon geometries in a GeoJSON object."""
+    rings = []
+    for geometry in iter_geometries(geojson):
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        for polygon in polygons:
+            for ring_index, ring in enumerate(polygon):
+                # Exterior and holes get opposite orientations whatever the file used
+                rings.append(_oriented(_lonlat_to_frac(ring, zoom), clockwise=ring_index == 0))
+    return rasterize_rings(rings, zoom)
+
+
+def _buffer_in_tiles(buffer_m, lat_deg, zoom):
+    """Converts a ground distance to tile units at the given latitude (Mercator scale grows with 1/cos)."""
+    metres_per_tile = 2 * math.pi * EARTH_RADIUS_M * math.cos(math.radians(lat_deg)) / (2 ** zoom)
+    return buffer_m / metres_per_tile
+
+
+def corridor_rings(lines_latlon, buffer_m, zoom):
+    """
+    Buffers polylines of (lat, lon) points into rings in tile space: one quad per
+    segment plus an octagon around every vertex to round off joints and ends.
+    All rings share one orientation so the winding rule unions them.
+    """
+    rings = []
+    octagon = np.array([(math.cos(a), math.sin(a)) for a in np.arange(8) * math.pi / 4 + math.pi / 8])
+    for line in lines_latlon:
+        line = np.asarray(line, dtype=np.float64)
+        if not len(line):
+            continue
+        x, y = deg2frac_array(line[:, 0], line[:, 1], zoom)
+        points = np.column_stack([x, y])
+        buffers = np.array([_buffer_in_tiles(buffer_m, lat, zoom) for lat in line[:, 0]])
+        # Octagon radius chosen so its flat sides sit at the buffer distance
+        cap_scale = buffers / math.cos(math.pi / 8)
+        for point, radius in zip(points, cap_scale):
+            rings.append(_oriented(point + octagon * radius, clockwise=True))
+
+        deltas = points[1:] - points[:-1]
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        valid = lengths > 0
+        if not np.any(valid):
+            continue
+        normals = np.column_stack([-deltas[valid, 1], deltas[valid, 0]]) / lengths[valid, None]
+        seg_buffer = np.maximum(buffers[:-1], buffers[1:])[valid, None]
+        start, end = points[:-1][valid], points[1:][valid]
+        quads = np.stack([start + normals * seg_buffer, end + normals * seg_buffer,
+                          end - normals * seg_buffer, start - normals * seg_buffer], axis=1)
+        rings.extend(_oriented(quad, clockwise=True) for quad in quads)
+    return rings
+
+
+def corridor_coverage(geojson, buffer_m, zoom):
+    """Tiles within buffer_m metres of the LineString/MultiLineString geometries in a GeoJSON object."""
+    lines = []
+    for geometry in iter_geometries(geojson):
+        if geometry["type"] == "LineString":
+            lines.append(geometry["coordinates"])
+        elif geometry["type"] == "MultiLineString":
+            lines.extend(geometry["coordinates"])
+    # GeoJSON is [lon, lat]; corridor_rings takes (lat, lon) like the rest of the GUI
+    lines_latlon = [np.asarray(line, dtype=np.float64)[:, ::-1] for line in lines if len(line)]
+    return rasterize_rings(corridor_rings(lines_latlon, buffer_m, zoom), zoom)
+
+
+def bbox_coverage(min_lat, max_lat, min_lon, max_lon, zoom):
+    """Tiles for an axis-aligned bounding box, matching the original deg2num() ranges."""
+    xs, ys = deg2num_array([max_lat, min_lat], [min_lon, max_lon], zoom)
+    rows = np.arange(ys[0], ys[1] + 1, dtype=np.int64)
+    return TileCoverage(zoom, rows, np.full(len(rows), xs[0], dtype=np.int64),
+                        np.full(len(rows), xs[1], dtype=np.int64))
+
+
+def coverage_for_location(location_info, zoom, base_dir=None):
+    """
+    Picks the selection mode from a LOCATIONS entry:
+      "polygon":  GeoJSON (dict or file path) with Polygon/MultiPolygon geometries
+      "corridor": GeoJSON with LineString geometries, buffered by "buffer_m" metres
+      otherwise the min_lat/max_lat/min_lon/max_lon bounding box.
+    """
+    if "polygon" in location_info:
+        return polygon_coverage(load_geojson(location_info["polygon"], base_dir), zoom)
+    if "corridor" in location_info:
+        return corridor_coverage(load_geojson(location_info["corridor"], base_dir),
+                                 location_info.get("buffer_m", 500), zoom)
+    return bbox_coverage(location_info["min_lat"], location_info["max_lat"],
+                         location_info["min_lon"], location_info["max_lon"], zoom)
+
+
+# --- Estimates ---
+
+def average_tile_bytes(tiles_dir, sample_limit=500):
+    """Average size of already downloaded tiles under tiles_dir, or the default if there are none."""
+    total_bytes = 0
+    sampled = 0
+    tiles_dir = Path(tiles_dir)
+    if tiles_dir.is_dir():
+        for tile_path in tiles_dir.rglob("*.png"):
+            total_bytes += tile_path.stat().st_size
+            sampled += 1
+            if sampled >= sample_limit:
+                break
+    return total_bytes / sampled if sampled else DEFAULT_AVG_TILE_BYTES
+
+
+def estimate_location(location_info, min_zoom, max_zoom, avg_tile_bytes=DEFAULT_AVG_TILE_BYTES, base_dir=None):
+    """Returns a list of (zoom, TileCoverage, estimated_bytes) for the location's zoom range."""
+    estimates = []
+    for z in range(min_zoom, max_zoom + 1):
+        coverage = coverage_for_location(location_info, z, base_dir)
+        estimates.append((z, coverage, int(coverage.count() * avg_tile_bytes)))
+    return estimates
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024.0
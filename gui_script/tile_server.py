@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# --- Constants ---
+TILE_SIZE = 256
+TILE_PATH_RE = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+
+# --- Deterministic Tile Synthesis ---
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+@lru_cache(maxsize=4096)
+def synthesize_tile(z, x, y):
+    """
+    Builds a valid 256x256 RGB PNG whose colours and grid depend only on z/x/y,
+    so every run of a benchmark downloads byte-identical tiles.
+    """
+    seed = hashlib.blake2b(f"{z}/{x}/{y}".encode(), digest_size=6).digest()
+    background = bytes(seed[:3])
+    line = bytes(seed[3:])
+    grid_step = 16 << (z % 3)
+    plain_row = background * TILE_SIZE
+    grid_row = line * TILE_SIZE
+    crossed_row = bytearray(plain_row)
+    for px in range(0, TILE_SIZE, grid_step):
+        crossed_row[px * 3:px * 3 + 3] = line
+    crossed_row = bytes(crossed_row)
+    raw = b"".join(b"\x00" + (grid_row if row % grid_step == 0 else crossed_row) for row in range(TILE_SIZE))
+    header = struct.pack(">IIBBBBB", TILE_SIZE, TILE_SIZE, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw, 6)) + _png_chunk(b"IEND", b""))
+
+
+# --- Fault Injection ---
+
+class FaultConfig:
+    """
+    Knobs for misbehaviour. All rates are probabilities per request and are
+    drawn from a seeded RNG, so a given request sequence fails the same way each run.
+    Can be changed while running via GET /_control?error_rate=0.1&...
+    """
+    FIELDS = {
+        "latency_ms": float, "jitter_ms": float, "error_rate": float,
+        "rate_limit_rate": float, "retry_after": float, "truncate_rate": float, "seed": int,
+    }
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=0.0, truncate_rate=0.0, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def update(self, values):
+        with self.lock:
+            for name, raw_value in values.items():
+                if name in self.FIELDS:
+                    setattr(self, name, self.FIELDS[name](raw_value))
+            if "seed" in values:
+                self.rng = random.Random(self.seed)
+
+    def draw(self):
+        """Returns (delay_sec, outcome) where outcome is 'ok', 'error', 'rate_limit' or 'truncate'."""
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            roll = self.rng.random()
+            if roll < self.rate_limit_rate:
+                return delay, "rate_limit"
+            roll -= self.rate_limit_rate
+            if roll < self.error_rate:
+                return delay, "error"
+            roll -= self.error_rate
+            if roll < self.truncate_rate:
+                return delay, "truncate"
+            return delay, "ok"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class TileServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"ok": 0, "error": 0, "rate_limit": 0, "truncate": 0, "not_found": 0}
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def to_dict(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like real tile servers
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+    server_version = "LocalTileServer/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b"", content_type="text/plain", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/_control":
+            self.server.faults.update({k: v[-1] for k, v in parse_qs(parsed.query).items()})
+            self._send(200, json.dumps(self.server.faults.to_dict()).encode(), "application/json")
+            return
+        if parsed.path == "/_stats":
+            self._send(200, json.dumps(self.server.stats.to_dict()).encode(), "application/json")
+            return
+
+        match = TILE_PATH_RE.match(parsed.path)
+        if not match:
+            self.server.stats.count("not_found")
+            self._send(404, b"not a tile path")
+            return
+        z, x, y = (int(part) for part in match.groups())
+        if z > 22 or x >= (1 << z) or y >= (1 << z):
+            self.server.stats.count("not_found")
+            self._send(404, b"tile out of range")
+            return
+
+        delay, outcome = self.server.faults.draw()
+        if delay:
+            time.sleep(delay)
+        self.server.stats.count(outcome)
+        if outcome == "rate_limit":
+            self._send(429, b"slow down", headers={"Retry-After": f"{self.server.faults.retry_after:g}"})
+        elif outcome == "error":
+            self._send(500, b"injected failure")
+        elif outcome == "truncate":
+            tile = synthesize_tile(z, x, y)
+            self._send(200, tile[:len(tile) // 2], "image/png")
+        else:
+            self._send(200, synthesize_tile(z, x, y), "image/png",
+                       headers={"Cache-Control": "max-age=86400"})
+
+
+class LocalTileServer(ThreadingHTTPServer):
+    """
+    Stand-in for tile.openstreetmap.org that serves synthetic tiles on
+    http://host:port/{z}/{x}/{y}.png with optional injected latency and failures.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, faults=None, verbose=False):
+        super().__init__((host, port), TileRequestHandler)
+        self.faults = faults or FaultConfig()
+        self.stats = TileServerStats()
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url_template(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{{z}}/{{x}}/{{y}}.png"
+
+    def start_background(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="LocalTileServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve deterministic synthetic map tiles for downloader tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of tiles cut in half")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                         args.retry_after, args.truncate_rate, args.seed)
+    server = LocalTileServer(args.host, args.port, faults, args.verbose)
+    print(f"Serving synthetic tiles at {server.url_template}")
+    print(f"Fault injection: {faults.to_dict()}  (change at /_control, counters at /_stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
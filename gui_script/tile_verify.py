@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+# --- Constants ---
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+READ_BLOCK_SIZE = 64 * 1024
+WHOLE_FILE_LIMIT = 1024 * 1024  # Tiles up to this size are checked from a single read
+_CHUNK_HEADER = struct.Struct(">I4s")
+_CRC = struct.Struct(">I")
+MAX_PNG_CHUNK_LENGTH = 2 ** 31 - 1
+TILE_SUFFIXES = (".png", ".webp")
+
+
+class TileCorrupt(Exception):
+    """Raised by the checkers with a short reason such as 'truncated in IDAT'."""
+
+
+# --- Format Checkers ---
+
+def _read_exact(stream, size, where):
+    data = stream.read(size)
+    if len(data) != size:
+        raise TileCorrupt(f"truncated in {where}")
+    return data
+
+
+def check_png_stream(stream):
+    """
+    Validates a PNG by structure only: signature, chunk lengths, every chunk CRC,
+    IHDR first and IEND last. Chunk data is streamed in blocks, never decoded.
+    """
+    if stream.read(8) != PNG_SIGNATURE:
+        raise TileCorrupt("bad PNG signature")
+    first_chunk = True
+    saw_idat = False
+    while True:
+        header = stream.read(8)
+        if not header:
+            raise TileCorrupt("missing IEND")
+        if len(header) != 8:
+            raise TileCorrupt("truncated chunk header")
+        length, chunk_type = struct.unpack(">I4s", header)
+        if length > MAX_PNG_CHUNK_LENGTH:
+            raise TileCorrupt(f"bad chunk length in {chunk_type!r}")
+        if first_chunk and chunk_type != b"IHDR":
+            raise TileCorrupt("first chunk is not IHDR")
+        first_chunk = False
+
+        where = chunk_type.decode("latin-1")
+        crc = zlib.crc32(chunk_type)
+        remaining = length
+        while remaining:
+            block = _read_exact(stream, min(remaining, READ_BLOCK_SIZE), where)
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+        (stored_crc,) = struct.unpack(">I", _read_exact(stream, 4, f"{where} CRC"))
+        if stored_crc != crc:
+            raise TileCorrupt(f"CRC mismatch in {where}")
+
+        if chunk_type == b"IDAT":
+            saw_idat = True
+        elif chunk_type == b"IEND":
+            if not saw_idat:
+                raise TileCorrupt("no IDAT before IEND")
+            if stream.read(1):
+                raise TileCorrupt("data after IEND")
+            return
+
+
+def check_png_buffer(data):
+    """In-memory twin of check_png_stream(): same checks, without per-chunk reads."""
+    view = memoryview(data)
+    if view[:8] != PNG_SIGNATURE:
+        raise TileCorrupt("bad PNG signature")
+    end = len(view)
+    offset = 8
+    saw_idat = False
+    while True:
+        if offset + 8 > end:
+            raise TileCorrupt("missing IEND" if offset == end else "truncated chunk header")
+        length, chunk_type = _CHUNK_HEADER.unpack_from(view, offset)
+        if offset == 8 and chunk_type != b"IHDR":
+            raise TileCorrupt("first chunk is not IHDR")
+        data_end = offset + 8 + length
+        if data_end + 4 > end:
+            raise TileCorrupt(f"truncated in {chunk_type.decode('latin-1')}")
+        if _CRC.unpack_from(view, data_end)[0] != zlib.crc32(view[offset + 4:data_end]):
+            raise TileCorrupt(f"CRC mismatch in {chunk_type.decode('latin-1')}")
+        offset = data_end + 4
+        if chunk_type == b"IDAT":
+            saw_idat = True
+        elif chunk_type == b"IEND":
+            if not saw_idat:
+                raise TileCorrupt("no IDAT before IEND")
+            if offset != end:
+                raise TileCorrupt("data after IEND")
+            return
+
+
+def check_webp_stream(stream, total_size):
+    """Validates the RIFF/WEBP container header and that the file holds the declared size."""
+    header = _read_exact(stream, 16, "RIFF header")
+    riff, riff_size, webp, first_chunk = struct.unpack("<4sI4s4s", header)
+    if riff != b"RIFF" or webp != b"WEBP":
+        raise TileCorrupt("bad WebP signature")
+    if first_chunk not in (b"VP8 ", b"VP8L", b"VP8X"):
+        raise TileCorrupt(f"unknown WebP chunk {first_chunk!r}")
+    if total_size < riff_size + 8:
+        raise TileCorrupt("truncated WebP data")
+    if total_size > riff_size + 9:  # RIFF allows one pad byte
+        raise TileCorrupt("data after WebP RIFF")
+
+
+def check_tile_bytes(data):
+    """Checks an in-memory tile (e.g. a fresh download). Raises TileCorrupt if invalid."""
+    if data.startswith(b"RIFF"):
+        check_webp_stream(BytesIO(data), len(data))
+    else:
+        check_png_buffer(data)
+
+
+def check_tile_file(path):
+    """Returns None for a valid tile, or the reason it is corrupt."""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return "empty file"
+            if str(path).endswith(".webp"):
+                check_webp_stream(f, size)
+            elif size <= WHOLE_FILE_LIMIT:
+                check_png_buffer(f.readall())
+            else:
+                check_png_stream(f)
+    except TileCorrupt as e:
+        return str(e)
+    except OSError as e:
+        return f"unreadable: {e.strerror or e}"
+    return None
+
+
+def check_tile_file_pil(path):
+    """Reference check with a PIL decode, used by the benchmark for comparison."""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except Exception as e:
+        return str(e)
+    return None
+
+
+# --- Pyramid Scanning ---
+
+def iter_tile_files(city_dir):
+    """Yields (z, x, y, path) for every tile in a city_dir/z/x/y.png pyramid."""
+    with os.scandir(city_dir) as z_entries:
+        for z_entry in z_entries:
+            if not (z_entry.is_dir() and z_entry.name.isdigit()):
+                continue
+            with os.scandir(z_entry.path) as x_entries:
+                for x_entry in x_entries:
+                    if not (x_entry.is_dir() and x_entry.name.isdigit()):
+                        continue
+                    with os.scandir(x_entry.path) as y_entries:
+                        for y_entry in y_entries:
+                            stem, dot, suffix = y_entry.name.partition(".")
+                            if stem.isdigit() and "." + suffix in TILE_SUFFIXES:
+                                yield int(z_entry.name), int(x_entry.name), int(stem), y_entry.path
+
+
+def _check_batch(batch, checker):
+    return [(z, x, y, path, checker(path)) for z, x, y, path in batch]
+
+
+def verify_city(city_dir, workers=None, checker=check_tile_file, batch_size=256):
+    """
+    Checks every tile of a city in parallel. File reads and zlib.crc32 release
+    the GIL, so a thread pool scales without pickling overhead; with a single
+    worker the batches run inline.
+    Returns a report dict whose 'corrupt' list can be fed to map_download --redownload-from.
+    """
+    city_dir = Path(city_dir)
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+    started_at = time.perf_counter()
+    checked = 0
+    corrupt = []
+
+    def batches():
+        batch = []
+        for tile in iter_tile_files(city_dir):
+            batch.append(tile)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def collect(results):
+        nonlocal checked
+        checked += len(results)
+        for z, x, y, path, reason in results:
+            if reason is not None:
+                corrupt.append({"z": z, "x": x, "y": y, "path": path, "reason": reason})
+
+    if workers <= 1:
+        for batch in batches():
+            collect(_check_batch(batch, checker))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for results in executor.map(lambda b: _check_batch(b, checker), batches()):
+                collect(results)
+
+    elapsed = time.perf_counter() - started_at
+    return {
+        "city": city_dir.name,
+        "city_dir": str(city_dir.resolve()),
+        "checked": checked,
+        "corrupt_count": len(corrupt),
+        "elapsed_sec": round(elapsed, 3),
+        "tiles_per_sec": round(checked / elapsed, 1) if elapsed > 0 else None,
+        "corrupt": sorted(corrupt, key=lambda t: (t["z"], t["x"], t["y"])),
+    }
+
+
+def load_report(report_path):
+    with open(report_path, "r", encoding="utf-8") as f:
+        reports = json.load(f)
+    return reports if isinstance(reports, list) else [reports]
+
+
+def benchmark(city_dir, workers=None):
+    """Times the header/CRC path against the PIL path on the same pyramid."""
+    fast = verify_city(city_dir, workers)
+    slow = verify_city(city_dir, workers, checker=check_tile_file_pil)
+    print(f"Tiles checked: {fast['checked']}")
+    print(f"  header/CRC: {fast['elapsed_sec']:.2f}s ({fast['tiles_per_sec']} tiles/s), "
+          f"{fast['corrupt_count']} corrupt")
+    print(f"  PIL verify: {slow['elapsed_sec']:.2f}s ({slow['tiles_per_sec']} tiles/s), "
+          f"{slow['corrupt_count']} corrupt")
+    if fast["elapsed_sec"]:
+        print(f"  Speedup: {slow['elapsed_sec'] / fast['elapsed_sec']:.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check downloaded tile pyramids for corrupt or truncated tiles.")
+    parser.add_argument("city_dirs", nargs="+", type=Path, help="City tile directories (containing z/x/y.png)")
+    parser.add_argument("--report", type=Path, help="Write the JSON report here (input for map_download --redownload-from)")
+    parser.add_argument("--workers", type=int, help="Worker threads (default: 2 per CPU, max 32)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare against a full PIL verify")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for city_dir in args.city_dirs:
+            benchmark(city_dir, args.workers)
+        return 0
+
+    reports = []
+    for city_dir in args.city_dirs:
+        if not city_dir.is_dir():
+            print(f"Not a directory: {city_dir}", file=sys.stderr)
+            return 2
+        report = verify_city(city_dir, args.workers)
+        reports.append(report)
+        print(f"{report['city']}: {report['checked']} tiles checked in {report['elapsed_sec']}s, "
+              f"{report['corrupt_count']} corrupt")
+        for tile in report["corrupt"][:20]:
+            print(f"  {tile['z']}/{tile['x']}/{tile['y']}: {tile['reason']}")
+        if report["corrupt_count"] > 20:
+            print(f"  ... and {report['corrupt_count'] - 20} more")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 1 if any(report["corrupt_count"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# --- Constants ---
+DEFAULT_STATE_PATH = Path(__file__).resolve().parent.parent / "media" / "vehicle" / "trip_computer.json"
+MAX_GAP_SEC = 2.0            # Don't integrate across gaps in the data (bus stopped, source switched)
+MOVING_KMH = 0.5
+REFUEL_JUMP_L = 3.0          # Fuel level rising by this much counts as a refuel
+EWMA_DISTANCE_KM = 50.0      # Consumption average forgets with this distance constant
+EWMA_CHUNK_KM = 0.1          # Consumption samples are taken over at least this distance
+SNAPSHOT_INTERVAL_MS = 30000
+# Starting consumption per performance mode (L/100km) until driving data replaces it
+DEFAULT_MODE_CONSUMPTION = {"Eco": 6.0, "Comfort": 7.5, "Sport": 9.75}
+
+
+class TripAccumulator:
+    """Distance, fuel and moving time since the last reset."""
+
+    def __init__(self, started=None):
+        self.distance_km = 0.0
+        self.fuel_l = 0.0
+        self.moving_s = 0.0
+        self.started = time.time() if started is None else started
+
+    def add(self, distance_km, fuel_l, moving_s):
+        self.distance_km += distance_km
+        self.fuel_l += fuel_l
+        self.moving_s += moving_s
+
+    def reset(self):
+        self.__init__()
+
+    def avg_consumption(self):
+        """L/100km, or None until there is enough distance to be meaningful."""
+        return self.fuel_l / self.distance_km * 100.0 if self.distance_km >= 0.5 else None
+
+    def avg_speed(self):
+        return self.distance_km / (self.moving_s / 3600.0) if self.moving_s > 0 else None
+
+    def to_dict(self):
+        return {"distance_km": self.distance_km, "fuel_l": self.fuel_l, "moving_s": self.moving_s,
+                "started": self.started}
+
+    @classmethod
+    def from_dict(cls, data):
+        trip = cls(data.get("started"))
+        trip.add(data.get("distance_km", 0.0), data.get("fuel_l", 0.0), data.get("moving_s", 0.0))
+        return trip
+
+
+def _trapezoid(times, values, previous):
+    """
+    Integral (value * seconds) and moving seconds over consecutive samples,
+    continuing from previous (time, value); gaps over MAX_GAP_SEC are skipped.
+    """
+    if previous is not None:
+        times = np.concatenate([[previous[0]], times])
+        values = np.concatenate([[previous[1]], values])
+    if len(times) < 2:
+        return 0.0, 0.0
+    dt = np.diff(times)
+    valid = (dt > 0) & (dt <= MAX_GAP_SEC)
+    area = float(np.sum(((values[1:] + values[:-1]) * 0.5 * dt)[valid]))
+    moving = float(np.sum(dt[valid & (values[1:] > MOVING_KMH)]))
+    return area, moving
+
+
+class TripComputer(QObject):
+    """
+    Integrates speed and fuel rate from the telemetry history into trip A,
+    trip B and since-refuel accumulators, and estimates range from an
+    exponentially weighted consumption average kept per performance mode.
+    Reads only the samples added since the last update, once a second, and
+    snapshots its state to a small JSON file every 30 s when it changed.
+    """
+    updated = pyqtSignal()
+
+    def __init__(self, telemetry, state_path=DEFAULT_STATE_PATH, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.state_path = Path(state_path)
+        self.trips = {"A": TripAccumulator(), "B": TripAccumulator(), "refuel": TripAccumulator()}
+        self.mode = "Comfort"
+        self.mode_consumption = dict(DEFAULT_MODE_CONSUMPTION)
+        self.fuel_level_l = None
+        self.read_positions = {}   # signal -> next sample index to read
+        self.last_samples = {}     # signal -> (time, value) joining one update's samples to the next
+        self.pending_km = 0.0
+        self.pending_fuel_l = 0.0
+        self.dirty = False
+        self.load()
+
+        self.update_timer = QTimer(self)
+        self.update_timer.timeout.connect(self.update)
+        self.update_timer.start(1000)
+        self.snapshot_timer = QTimer(self)
+        self.snapshot_timer.timeout.connect(self.save)
+        self.snapshot_timer.start(SNAPSHOT_INTERVAL_MS)
+
+    # --- Integration ---
+
+    def _new_samples(self, name):
+        history = self.telemetry.get(name)
+        if history is None:
+            return None
+        times, values, self.read_positions[name] = history.read_from(self.read_positions.get(name, 0))
+        return times, values
+
+    def update(self):
+        distance_km, fuel_l, moving_s = 0.0, 0.0, 0.0
+        speed = self._new_samples("speed_kmh")
+        if speed is not None and len(speed[0]):
+            area, moving_s = _trapezoid(speed[0], speed[1], self.last_samples.get("speed_kmh"))
+            distance_km = area / 3600.0
+            self.last_samples["speed_kmh"] = (speed[0][-1], speed[1][-1])
+        rate = self._new_samples("fuel_rate_lph")
+        if rate is not None and len(rate[0]):
+            area, _ = _trapezoid(rate[0], rate[1], self.last_samples.get("fuel_rate_lph"))
+            fuel_l = area / 3600.0
+            self.last_samples["fuel_rate_lph"] = (rate[0][-1], rate[1][-1])
+        level = self._new_samples("fuel_level_l")
+        if level is not None and len(level[1]):
+            self._track_fuel_level(level[1])
+        if distance_km == 0.0 and fuel_l == 0.0:
+            return
+
+        for trip in self.trips.values():
+            trip.add(distance_km, fuel_l, moving_s)
+        self._update_consumption_average(distance_km, fuel_l)
+        self.dirty = True
+        self.updated.emit()
+
+    def _track_fuel_level(self, levels):
+        previous = self.fuel_level_l if self.fuel_level_l is not None else levels[0]
+        jumps = np.diff(np.concatenate([[previous], levels]))
+        if np.any(jumps >= REFUEL_JUMP_L):
+            self.trips["refuel"].reset()
+            print(f"TripComputer: Refuel detected ({levels[-1]:.1f} L)")
+        self.fuel_level_l = float(levels[-1])
+
+    def _update_consumption_average(self, distance_km, fuel_l):
+        # Averaged by distance, so idling in traffic shows up as it would on the next tank
+        self.pending_km += distance_km
+        self.pending_fuel_l += fuel_l
+        if self.pending_km < EWMA_CHUNK_KM:
+            return
+        sample = self.pending_fuel_l / self.pending_km * 100.0
+        weight = 1.0 - math.exp(-self.pending_km / EWMA_DISTANCE_KM)
+        average = self.mode_consumption.get(self.mode, DEFAULT_MODE_CONSUMPTION["Comfort"])
+        self.mode_consumption[self.mode] = average + weight * (sample - average)
+        self.pending_km = 0.0
+        self.pending_fuel_l = 0.0
+
+    # --- Queries ---
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.pending_km = 0.0  # A chunk straddling modes would blend both
+        self.pending_fuel_l = 0.0
+        self.updated.emit()
+
+    def consumption_average(self, mode=None):
+        return self.mode_consumption.get(mode or self.mode, DEFAULT_MODE_CONSUMPTION["Comfort"])
+
+    def range_km(self, mode=None):
+        """Range on the fuel left at the averaged consumption for a mode (None until a fuel level arrives)."""
+        if self.fuel_level_l is None:
+            return None
+        return self.fuel_level_l / self.consumption_average(mode) * 100.0
+
+    def reset_trip(self, name):
+        self.trips[name].reset()
+        self.dirty = True
+        self.updated.emit()
+
+    # --- Persistence ---
+
+    def load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read trip computer state {self.state_path}: {e}")
+            return
+        for name, data in state.get("trips", {}).items():
+            if name in self.trips:
+                self.trips[name] = TripAccumulator.from_dict(data)
+        self.mode_consumption.update(state.get("mode_consumption", {}))
+        self.fuel_level_l = state.get("fuel_level_l")
+
+    def save(self):
+        """Writes the accumulators if they changed since the last save (temp file + rename)."""
+        if not self.dirty:
+            return
+        state = {"trips": {name: trip.to_dict() for name, trip in self.trips.items()},
+                 "mode_consumption": self.mode_consumption, "fuel_level_l": self.fuel_level_l,
+                 "saved": time.time()}
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save trip computer state: {e}")
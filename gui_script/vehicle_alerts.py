@@ -0,0 +1,429 @@
+import argparse
+import bisect
+import re
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from pathlib import Path
+
+import numpy as np
+from PyQt6.QtCore import QEvent, QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QFrame, QHBoxLayout, QLabel, QPushButton
+
+# --- Constants ---
+EVAL_HZ = 10           # Rule evaluation rate, matching the bus's display dispatch
+COST_HISTORY = 600     # Evaluation costs kept for cost_summary()
+SEVERITIES = ("info", "warning", "critical")
+SEVERITY_STYLES = {
+    "info": "background-color: #007ACC; color: white;",
+    "warning": "background-color: #F39C12; color: black;",
+    "critical": "background-color: #C0392B; color: white;",
+}
+# name: [rate(]signal[, window s)] <|> level [clear level] [for seconds] [severity] ["message"]
+DEFAULT_RULES = """
+low_fuel:      fuel_level_l < 8 clear 10 for 5 warning "Low fuel: {value:.1f} L left"
+fuel_reserve:  fuel_level_l < 4 clear 5 for 5 critical "Fuel reserve: {value:.1f} L left"
+low_range:     range_km < 50 clear 60 warning "Range down to {value:.0f} km"
+overspeed:     speed_kmh > 130 clear 125 for 3 warning "Overspeed: {value:.0f} km/h"
+high_rpm:      engine_rpm > 5500 clear 5000 for 2 warning "High engine speed: {value:.0f} rpm"
+hard_braking:  rate(speed_kmh, 1) < -10 clear -4 critical "Hard braking: {value:.0f} km/h per s"
+icy_road:      outside_temp_c < 3 clear 4 for 10 info "Outside {value:.1f} °C: watch for ice"
+"""
+
+AlertRule = namedtuple("AlertRule", "name signal op threshold clear rate_window duration severity message")
+Alert = namedtuple("Alert", "rule active time value")  # value: the signal's value, or its rate for rate rules
+
+_RULE_RE = re.compile(
+    r'^(\w+)\s*:\s*(?:rate\(\s*(\w+)\s*,\s*([\d.]+)\s*\)|(\w+))\s*([<>])\s*([-+\d.eE]+)'
+    r'(?:\s+clear\s+([-+\d.eE]+))?(?:\s+for\s+([\d.]+))?(?:\s+(info|warning|critical))?(?:\s+"([^"]*)")?\s*$')
+
+
+# --- Rules ---
+
+def parse_rules(text):
+    """AlertRules from rule lines (see DEFAULT_RULES); blank lines and # comments are skipped."""
+    rules, names = [], set()
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _RULE_RE.match(line)
+        if not match:
+            raise ValueError(f"line {number}: not a rule: {line}")
+        name, rate_signal, window, signal, op, threshold, clear, duration, severity, message = match.groups()
+        threshold = float(threshold)
+        clear = threshold if clear is None else float(clear)
+        if (clear > threshold) if op == ">" else (clear < threshold):
+            raise ValueError(f"line {number}: clear level {clear} is beyond the alert level {threshold}")
+        if name in names:
+            raise ValueError(f"line {number}: duplicate rule name {name}")
+        names.add(name)
+        rules.append(AlertRule(name, rate_signal or signal, op, threshold, clear,
+                               float(window) if window else None, float(duration or 0.0),
+                               severity or "warning", message or f"{name}: {{value:.1f}}"))
+    return rules
+
+
+def load_rules(path=None):
+    """Rules from a file (VEHICLE_ALERTS), else the built-in DEFAULT_RULES."""
+    if path:
+        try:
+            return parse_rules(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load alert rules {path}, using built-in rules: {e}")
+    return parse_rules(DEFAULT_RULES)
+
+
+def format_alert(alert):
+    try:
+        return alert.rule.message.format(value=alert.value)
+    except (ValueError, KeyError, IndexError):
+        return alert.rule.message
+
+
+# --- Engine ---
+
+class _RuleGroup:
+    """
+    Rules on one input (a signal, or its rate over one window) as arrays, one
+    row per rule, plus the state each rule was left in by the previous batch.
+    Every rule is normalized to "input * sign above level", so < and > rules
+    share the same comparisons.
+    """
+
+    def __init__(self, rules, rate_window):
+        self.rules = rules
+        self.rate_window = rate_window
+        sign = np.array([1.0 if rule.op == ">" else -1.0 for rule in rules])
+        self.sign = sign[:, None]
+        self.on = (sign * np.array([rule.threshold for rule in rules]))[:, None]
+        self.off = (sign * np.array([rule.clear for rule in rules]))[:, None]
+        self.duration = np.array([rule.duration for rule in rules])[:, None]
+        self.latched = np.zeros(len(rules), dtype=bool)  # Past the alert level and not yet back past clear
+        self.since = np.full(len(rules), np.nan)         # When the current latched run started
+        self.active = np.zeros(len(rules), dtype=bool)   # Latched for at least the rule's duration
+        self.tail = (np.zeros(0), np.zeros(0))           # Rate input: last window of samples
+
+    def _input(self, times, values):
+        if self.rate_window is None:
+            return values
+        window = self.rate_window
+        all_times = np.concatenate([self.tail[0], times])
+        all_values = np.concatenate([self.tail[1], values])
+        # Rate against the last sample at least one window older; NaN (no decision) until there is one
+        base = np.searchsorted(all_times, times - window, side="right") - 1
+        valid = base >= 0
+        base = np.maximum(base, 0)
+        elapsed = times - all_times[base]
+        valid &= (elapsed > 0) & (elapsed <= 2 * window)  # Not across a gap in the data
+        rate = np.full(len(times), np.nan)
+        rate[valid] = (values[valid] - all_values[base[valid]]) / elapsed[valid]
+        keep = max(0, int(np.searchsorted(all_times, all_times[-1] - window, side="right")) - 1)
+        self.tail = (all_times[keep:], all_values[keep:])
+        return rate
+
+    def evaluate(self, times, values):
+        x = self._input(times, values)
+        columns = np.arange(len(x))
+        level = self.sign * x[None, :]
+        above = level > self.on
+        decided = above | (level <= self.off)  # NaN and values between the levels keep the previous state
+        last = np.maximum.accumulate(np.where(decided, columns, -1), axis=1)
+        latched = np.where(last >= 0, np.take_along_axis(above, np.maximum(last, 0), axis=1), self.latched[:, None])
+        before = np.concatenate([self.latched[:, None], latched[:, :-1]], axis=1)
+        run_start = np.maximum.accumulate(np.where(latched & ~before, columns, -1), axis=1)
+        since = np.where(run_start >= 0, times[np.maximum(run_start, 0)], self.since[:, None])
+        active = latched & (times[None, :] - since >= self.duration)
+
+        before = np.concatenate([self.active[:, None], active[:, :-1]], axis=1)
+        rows, samples = np.nonzero(active != before)
+        alerts = [Alert(self.rules[row], bool(active[row, sample]), float(times[sample]), float(x[sample]))
+                  for row, sample in zip(rows.tolist(), samples.tolist())]
+        self.latched = latched[:, -1].copy()
+        self.since = np.where(self.latched, since[:, -1], np.nan)
+        self.active = active[:, -1].copy()
+        return alerts
+
+
+class AlertEngine:
+    """
+    Alert rules compiled once into a group of arrays per signal and rate
+    window. A batch of new samples is checked against all of a signal's
+    rules with a handful of NumPy operations over a rules x samples matrix,
+    continuing from the state the previous batch left, so the cost follows
+    the new samples, never the history. Rate rules only keep their window's
+    worth of recent samples. Each evaluation's time is recorded.
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        by_input = {}
+        for rule in self.rules:
+            by_input.setdefault((rule.signal, rule.rate_window), []).append(rule)
+        self.groups = {}  # signal -> [_RuleGroup]
+        for (signal, window), rules in by_input.items():
+            self.groups.setdefault(signal, []).append(_RuleGroup(rules, window))
+        self.signals = sorted(self.groups)
+        self.costs = deque(maxlen=COST_HISTORY)  # (seconds, samples, rules) per evaluate()
+
+    def evaluate(self, signal, times, values):
+        """Alerts raised or cleared by new samples of signal (times ascending), in time order."""
+        groups = self.groups.get(signal)
+        if not groups or not len(times):
+            return []
+        started = time.perf_counter()
+        alerts = []
+        for group in groups:
+            alerts.extend(group.evaluate(times, values))
+        self.costs.append((time.perf_counter() - started, len(times), sum(len(group.rules) for group in groups)))
+        alerts.sort(key=lambda alert: alert.time)
+        return alerts
+
+    def cost_summary(self):
+        """Recent evaluation cost: median and p99 per call, and per rule-sample checked."""
+        if not self.costs:
+            return None
+        seconds = np.array([cost[0] for cost in self.costs])
+        checks = sum(cost[1] * cost[2] for cost in self.costs)
+        return {"calls": len(seconds), "p50_us": round(1e6 * float(np.percentile(seconds, 50)), 1),
+                "p99_us": round(1e6 * float(np.percentile(seconds, 99)), 1),
+                "ns_per_check": round(1e9 * float(seconds.sum()) / checks, 2) if checks else None}
+
+
+class AlertMonitor(QObject):
+    """
+    Hands the rule engine each signal's samples added to the telemetry
+    history since the previous update, eval_hz times a second, and announces
+    alerts as they are raised and cleared (printing raised ones unless
+    log_alerts is off, as in benchmarks, where console I/O would be timed).
+    """
+    alertRaised = pyqtSignal(object)   # Alert
+    alertCleared = pyqtSignal(object)  # Alert
+
+    def __init__(self, telemetry, rules=None, eval_hz=EVAL_HZ, log_alerts=True, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.log_alerts = log_alerts
+        self.engine = AlertEngine(rules if rules is not None else load_rules())
+        self.read_positions = {}  # signal -> next sample index to read
+        self.active = {}          # rule name -> Alert that raised it
+        self.update_timer = QTimer(self)
+        self.update_timer.timeout.connect(self.update)
+        self.update_timer.start(int(1000 / eval_hz))
+
+    def update(self):
+        alerts = []
+        for signal in self.engine.signals:
+            history = self.telemetry.get(signal)
+            if history is None:
+                continue
+            times, values, self.read_positions[signal] = history.read_from(self.read_positions.get(signal, 0))
+            alerts.extend(self.engine.evaluate(signal, times, values))
+        alerts.sort(key=lambda alert: alert.time)
+        for alert in alerts:
+            if alert.active:
+                self.active[alert.rule.name] = alert
+                if self.log_alerts:
+                    print(f"Alert ({alert.rule.severity}): {format_alert(alert)}")
+                self.alertRaised.emit(alert)
+            elif self.active.pop(alert.rule.name, None) is not None:
+                self.alertCleared.emit(alert)
+
+
+# --- Notification Surface ---
+
+class AlertBanner(QFrame):
+    """
+    Strip laid over the top of a QTabWidget's pages, below the tab bar, so
+    it shows over whichever tab is active. It shows the most severe active
+    alert (the latest among equals) and how many others are active; Dismiss
+    hides the current ones until they are raised again.
+    """
+
+    def __init__(self, tab_widget):
+        super().__init__(tab_widget)
+        self.setObjectName("AlertBanner")
+        self.tab_widget = tab_widget
+        self.active = {}  # rule name -> Alert
+        self.dismissed = set()
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(12, 6, 8, 6)
+        self.text_label = QLabel()
+        self.text_label.setFont(QFont("Arial", 13, QFont.Weight.Bold))
+        layout.addWidget(self.text_label, 1)
+        self.more_label = QLabel()
+        layout.addWidget(self.more_label)
+        dismiss_button = QPushButton("Dismiss")
+        dismiss_button.clicked.connect(self.dismiss)
+        layout.addWidget(dismiss_button)
+        tab_widget.installEventFilter(self)
+        self.hide()
+
+    def show_alert(self, alert):
+        self.active[alert.rule.name] = alert
+        self.dismissed.discard(alert.rule.name)
+        self.refresh()
+
+    def clear_alert(self, alert):
+        self.active.pop(alert.rule.name, None)
+        self.dismissed.discard(alert.rule.name)
+        self.refresh()
+
+    def dismiss(self):
+        self.dismissed.update(self.active)
+        self.refresh()
+
+    def refresh(self):
+        shown = [alert for name, alert in self.active.items() if name not in self.dismissed]
+        if not shown:
+            self.hide()
+            return
+        top = max(shown, key=lambda alert: (SEVERITIES.index(alert.rule.severity), alert.time))
+        self.text_label.setText(format_alert(top))
+        self.more_label.setText(f"+{len(shown) - 1} more" if len(shown) > 1 else "")
+        self.setStyleSheet(f"QFrame#AlertBanner {{ {SEVERITY_STYLES.get(top.rule.severity, '')} }} "
+                           f"QFrame#AlertBanner QLabel {{ background: transparent; color: inherit; }}")
+        self._place()
+        self.show()
+        self.raise_()
+
+    def _place(self):
+        top = self.tab_widget.tabBar().height()
+        self.setGeometry(0, top, self.tab_widget.width(), self.sizeHint().height())
+
+    def eventFilter(self, obj, event):
+        if obj is self.tab_widget and event.type() == QEvent.Type.Resize and self.isVisible():
+            self._place()
+        return False
+
+
+# --- Benchmark ---
+
+SIGNAL_RANGES = {  # Value ranges of the simulated drive, for generating rules that actually fire
+    "speed_kmh": (0.0, 120.0), "engine_rpm": (800.0, 3300.0), "fuel_rate_lph": (0.9, 5.0),
+    "fuel_level_l": (43.0, 45.0), "range_km": (500.0, 900.0), "outside_temp_c": (15.0, 21.0),
+}
+
+
+def generate_rules(count, seed=1):
+    """count rules over the simulated signals: thresholds with hysteresis and durations, a fifth on rates."""
+    rng = np.random.default_rng(seed)
+    signals = sorted(SIGNAL_RANGES)
+    lines = []
+    for index in range(count):
+        signal = signals[index % len(signals)]
+        low, high = SIGNAL_RANGES[signal]
+        op = ">" if rng.random() < 0.5 else "<"
+        if rng.random() < 0.2:
+            span = (high - low) / 20.0
+            threshold = float(rng.uniform(-span, span))
+            source = f"rate({signal}, {rng.choice([0.5, 1.0, 2.0])})"
+        else:
+            span = high - low
+            threshold = float(rng.uniform(low, high))
+            source = signal
+        clear = threshold - span * 0.05 if op == ">" else threshold + span * 0.05
+        lines.append(f"rule{index}: {source} {op} {threshold:.4f} clear {clear:.4f} "
+                     f"for {rng.choice([0, 0, 1, 5])} {SEVERITIES[index % 3]}")
+    return parse_rules("\n".join(lines))
+
+
+def reference_alerts(rule, times, values):
+    """The same semantics one sample at a time, to check the vectorized engine against."""
+    alerts, latched, since, active = [], False, None, False
+    sign = 1.0 if rule.op == ">" else -1.0
+    for index, (t, value) in enumerate(zip(times, values)):
+        if rule.rate_window is not None:
+            base = bisect.bisect_right(times, t - rule.rate_window, 0, index) - 1
+            if base < 0 or not 0 < t - times[base] <= 2 * rule.rate_window:
+                value = None
+            else:
+                value = (value - values[base]) / (t - times[base])
+        if value is not None:
+            if sign * value > sign * rule.threshold:
+                if not latched:
+                    latched, since = True, t
+            elif sign * value <= sign * rule.clear:
+                latched = False
+        now_active = latched and t - since >= rule.duration
+        if now_active != active:
+            active = now_active
+            alerts.append((rule.name, active, t))
+    return alerts
+
+
+def benchmark(rule_count, minutes, verify_rules):
+    from PyQt6.QtCore import QCoreApplication
+    from telemetry_store import TelemetryStore
+    from vehicle_data import SimulatedVehicleSource, VehicleDataBus
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    rules = generate_rules(rule_count)
+    telemetry = TelemetryStore()
+    bus = VehicleDataBus(history=telemetry)
+    monitor = AlertMonitor(telemetry, rules, log_alerts=False)
+    monitor.update_timer.stop()
+    raised = []
+    monitor.alertRaised.connect(lambda alert: raised.append((alert.rule.name, True, alert.time)))
+    monitor.alertCleared.connect(lambda alert: raised.append((alert.rule.name, False, alert.time)))
+    monitor.engine.costs = deque()  # Keep every cost for the report
+
+    source = SimulatedVehicleSource(speed=0, duration_sec=60 * minutes, start_time=1.7e9)
+    frames = list(source.frames(threading.Event()))
+    samples = {signal: ([], []) for signal in monitor.engine.signals}
+    batch, next_update, update_times = [], frames[0].time + 1.0 / EVAL_HZ, []
+    for frame in frames + [None]:
+        if frame is None or frame.time >= next_update:
+            bus.feed(batch)
+            batch = []
+            for signal, (times, values) in samples.items():
+                history = telemetry.get(signal)
+                if history is not None:  # Kept for the reference check; read_from leaves the monitor's position alone
+                    new_times, new_values, _ = history.read_from(monitor.read_positions.get(signal, 0))
+                    times.extend(new_times.tolist())
+                    values.extend(new_values.tolist())
+            t0 = time.perf_counter()
+            monitor.update()
+            update_times.append(time.perf_counter() - t0)
+            next_update += 1.0 / EVAL_HZ
+        if frame is not None:
+            batch.append(frame)
+    app.processEvents()
+
+    summary = monitor.engine.cost_summary()
+    update_times = np.array(update_times)
+    result = {"rules": len(rules), "drive_min": minutes, "frames": len(frames), "updates": len(update_times),
+              "alert_events": len(raised), "active_at_end": len(monitor.active),
+              "update_p50_us": round(1e6 * float(np.percentile(update_times, 50)), 1),
+              "update_p99_us": round(1e6 * float(np.percentile(update_times, 99)), 1),
+              "evaluate_p50_us": summary["p50_us"], "ns_per_check": summary["ns_per_check"],
+              "share_of_real_time": f"{100 * update_times.sum() / (60 * minutes):.3f}%"}
+    if verify_rules:
+        expected = []
+        for rule in rules[:verify_rules]:
+            times, values = samples[rule.signal]
+            expected.extend(reference_alerts(rule, times, values))
+        checked = {rule.name for rule in rules[:verify_rules]}
+        got = [event for event in raised if event[0] in checked]
+        result["verified"] = f"{len(expected)} events on {verify_rules} rules: " + (
+            "match" if sorted(got) == sorted(expected) else "MISMATCH")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure alert rule evaluation cost on a simulated drive.")
+    parser.add_argument("--rules", type=int, default=500, help="Number of generated rules")
+    parser.add_argument("--minutes", type=float, default=20.0, help="Length of the simulated drive")
+    parser.add_argument("--verify-rules", type=int, default=60, help="Rules to check against the reference")
+    args = parser.parse_args(argv)
+    result = benchmark(args.rules, args.minutes, args.verify_rules)
+    print("--- Alert Rule Benchmark ---")
+    for name, value in result.items():
+        print(f"  {name:>18}: {value}")
+    return 1 if "MISMATCH" in result.get("verified", "") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
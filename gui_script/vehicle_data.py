@@ -0,0 +1,451 @@
+import argparse
+import math
+import os
+import random
+import socket
+import stat
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from can_dbc import CompiledDecoder
+
+# --- Signal Definitions ---
+
+CanFrame = namedtuple("CanFrame", "time can_id data")
+# Little-endian (Intel) signal: raw = bits [start_bit, start_bit + length) of the payload,
+# value = kind(raw * scale + offset)
+SignalDef = namedtuple("SignalDef", "name frame_id start_bit length scale offset signed kind unit")
+
+VEHICLE_SIGNALS = (
+    SignalDef("speed_kmh", 0x3E9, 0, 16, 0.01, 0.0, False, float, "km/h"),
+    SignalDef("engine_rpm", 0x3E9, 16, 16, 0.25, 0.0, False, float, "rpm"),
+    SignalDef("gear", 0x3E9, 32, 4, 1, 0, False, int, ""),
+    SignalDef("brake_pressed", 0x3E9, 36, 1, 1, 0, False, bool, ""),
+    SignalDef("fuel_rate_lph", 0x3EA, 0, 16, 0.001, 0.0, False, float, "L/h"),
+    SignalDef("fuel_level_l", 0x3EA, 16, 16, 0.01, 0.0, False, float, "L"),
+    SignalDef("avg_fuel_l100km", 0x3EA, 32, 16, 0.01, 0.0, False, float, "L/100km"),
+    SignalDef("range_km", 0x3EB, 0, 16, 1, 0, False, int, "km"),
+    SignalDef("outside_temp_c", 0x3EB, 16, 8, 0.5, 0.0, True, float, "C"),
+)
+
+SOCKETCAN_FRAME = struct.Struct("<IB3x8s")  # Linux struct can_frame: id, dlc, padding, data
+CAN_EFF_FLAG = 0x80000000
+CAN_EFF_MASK = 0x1FFFFFFF
+LOOP_GAP_SEC = 0.1  # A looped log's next lap starts this long after the previous lap's last frame
+
+
+class SignalDecoder:
+    """
+    Decodes CAN frames into {signal name: typed value} for the frame ids it
+    knows by interpreting each SignalDef per frame. The bus uses the compiled
+    decoder from load_vehicle_decoder(); this one stays as the encoder and as
+    the reference the compiled extractors are checked against.
+    """
+
+    def __init__(self, signals=VEHICLE_SIGNALS):
+        self.signals = tuple(signals)
+        self.by_frame = {}
+        for signal in self.signals:
+            self.by_frame.setdefault(signal.frame_id, []).append(signal)
+
+    def decode(self, frame):
+        signals = self.by_frame.get(frame.can_id)
+        if not signals:
+            return None
+        payload = int.from_bytes(frame.data, "little")
+        values = {}
+        for signal in signals:
+            raw = (payload >> signal.start_bit) & ((1 << signal.length) - 1)
+            if signal.signed and raw >> (signal.length - 1):
+                raw -= 1 << signal.length
+            values[signal.name] = signal.kind(raw * signal.scale + signal.offset)
+        return values
+
+    def encode(self, frame_id, values, timestamp=0.0):
+        """CanFrame carrying values (missing signals are zero); used by the simulator and tests."""
+        payload, size = 0, 0
+        for signal in self.by_frame[frame_id]:
+            raw = int(round((float(values.get(signal.name, signal.offset)) - signal.offset) / signal.scale))
+            raw = max(-(1 << (signal.length - 1)) if signal.signed else 0,
+                      min(raw, (1 << (signal.length - (1 if signal.signed else 0))) - 1))
+            payload |= (raw & ((1 << signal.length) - 1)) << signal.start_bit
+            size = max(size, (signal.start_bit + signal.length + 7) // 8)
+        return CanFrame(timestamp, frame_id, payload.to_bytes(size, "little"))
+
+
+# --- Sources ---
+
+def parse_candump_line(line):
+    """CanFrame from a `candump -L` line: (1436509052.249713) can0 3E9#10270000, else None."""
+    try:
+        stamp, _, frame = line.split()
+        can_id, _, data = frame.partition("#")
+        return CanFrame(float(stamp.strip("()")), int(can_id, 16), bytes.fromhex(data))
+    except ValueError:
+        return None
+
+
+class CanLogSource:
+    """
+    Replays a candump log, paced by its timestamps divided by speed (0: as
+    fast as possible). When looping, each lap is shifted to follow the
+    previous one, so frame times keep going forward.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+
+    def frames(self, stop_event):
+        offset, first_time, last_time = 0.0, None, None
+        while not stop_event.is_set():
+            started = None
+            with open(self.path, "r", encoding="ascii", errors="replace") as f:
+                for line in f:
+                    frame = parse_candump_line(line)
+                    if frame is None:
+                        continue
+                    if first_time is None:
+                        first_time = frame.time
+                    if offset:
+                        frame = frame._replace(time=frame.time + offset)
+                    last_time = frame.time
+                    if self.speed > 0:
+                        if started is None:
+                            started = (time.monotonic(), frame.time)
+                        delay = started[0] + (frame.time - started[1]) / self.speed - time.monotonic()
+                        if delay > 0 and stop_event.wait(delay):
+                            return
+                    elif stop_event.is_set():
+                        return
+                    yield frame
+            if not self.loop or last_time is None:
+                return
+            offset = last_time + LOOP_GAP_SEC - first_time
+
+
+class SocketSource:
+    """
+    Frames from a local datagram socket, each datagram holding one or more
+    16-byte SocketCAN can_frame structs (as written by a CAN gateway process).
+    address: "udp://host:port" or "unix:///path/to.sock".
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+    def _open(self):
+        if self.address.startswith("udp://"):
+            host, _, port = self.address[6:].rpartition(":")
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((host or "127.0.0.1", int(port)))
+        elif self.address.startswith("unix://"):
+            path = self.address[7:]
+            if os.path.lexists(path):
+                # Only a stale socket from an earlier run is removed, never a file a mistyped address points at
+                if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                    raise FileExistsError(f"{path} exists and is not a socket")
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+        else:
+            raise ValueError(f"unsupported vehicle socket address: {self.address}")
+        sock.settimeout(0.2)  # Lets the reader notice stop requests
+        return sock
+
+    def frames(self, stop_event):
+        sock = self._open()
+        try:
+            while not stop_event.is_set():
+                try:
+                    datagram = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                now = time.time()
+                for offset in range(0, len(datagram) - SOCKETCAN_FRAME.size + 1, SOCKETCAN_FRAME.size):
+                    can_id, dlc, data = SOCKETCAN_FRAME.unpack_from(datagram, offset)
+                    can_id = can_id & CAN_EFF_MASK if can_id & CAN_EFF_FLAG else can_id & 0x7FF
+                    yield CanFrame(now, can_id, data[:min(dlc, 8)])
+        finally:
+            sock.close()
+
+
+class SimulatedVehicleSource:
+    """
+    A drive that speeds up, cruises and stops, broadcast like an ECU would:
+    speed/rpm at 100 Hz, fuel at 10 Hz, range at 1 Hz. rate_scale multiplies
+    every frame rate (for load testing); speed 0 generates without pacing.
+    Timestamps start at start_time (default: now).
+    """
+
+    def __init__(self, rate_scale=1.0, speed=1.0, seed=1, duration_sec=None, fuel_level_l=45.0, start_time=None):
+        self.rate_scale = rate_scale
+        self.speed = speed
+        self.seed = seed
+        self.duration_sec = duration_sec
+        self.fuel_level_l = fuel_level_l
+        self.start_time = start_time
+        self.decoder = SignalDecoder()
+
+    def frames(self, stop_event):
+        rng = random.Random(self.seed)
+        tick = 0.01 / self.rate_scale
+        sim_time, speed, target = 0.0, 0.0, 50.0
+        fuel_level, fuel_used, distance_km = self.fuel_level_l, 0.0, 0.0
+        started = time.monotonic()
+        base_time = time.time() if self.start_time is None else self.start_time
+        step = 0
+        while not stop_event.is_set() and (self.duration_sec is None or sim_time < self.duration_sec):
+            if rng.random() < 0.002 / self.rate_scale:  # About one new target speed per 5 s
+                target = rng.choice((0.0, 30.0, 50.0, 90.0, 120.0))
+            speed += max(-0.08, min(0.05, target - speed)) * (tick / 0.01)
+            speed = max(0.0, speed)
+            gear = 0 if speed < 1 else min(6, 1 + int(speed // 22))
+            rpm = 800.0 if gear == 0 else 900.0 + (speed % 22) * 110.0
+            fuel_rate = 0.6 + 0.0004 * rpm + 0.00025 * speed * speed / 10.0  # L/h
+            fuel_used += fuel_rate * tick / 3600.0
+            fuel_level = max(0.0, self.fuel_level_l - fuel_used)
+            distance_km += speed * tick / 3600.0
+            avg_fuel = fuel_used / distance_km * 100.0 if distance_km > 0.05 else 0.0
+            now = base_time + sim_time  # Simulated clock, so unpaced logs still carry real spacing
+            yield self.decoder.encode(0x3E9, {"speed_kmh": speed, "engine_rpm": rpm, "gear": gear,
+                                              "brake_pressed": int(target < speed - 1)}, now)
+            if step % 10 == 0:
+                yield self.decoder.encode(0x3EA, {"fuel_rate_lph": fuel_rate, "fuel_level_l": fuel_level,
+                                                  "avg_fuel_l100km": avg_fuel}, now)
+            if step % 100 == 0:
+                range_km = fuel_level / (avg_fuel or 7.5) * 100.0
+                yield self.decoder.encode(0x3EB, {"range_km": range_km,
+                                                  "outside_temp_c": 18.0 + 3.0 * math.sin(sim_time / 600.0)}, now)
+            step += 1
+            sim_time += tick
+            if self.speed > 0:
+                delay = started + sim_time / self.speed - time.monotonic()
+                if delay > 0 and stop_event.wait(delay):
+                    return
+
+
+def load_vehicle_decoder(dbc_path=None):
+    """Compiled decoder for a DBC file (VEHICLE_DBC), else for the built-in VEHICLE_SIGNALS."""
+    dbc_path = dbc_path or os.environ.get("VEHICLE_DBC")
+    if dbc_path:
+        try:
+            return CompiledDecoder.from_dbc(dbc_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load DBC {dbc_path}, using built-in signals: {e}")
+    return CompiledDecoder.from_signal_defs(VEHICLE_SIGNALS)
+
+
+def source_from_spec(spec):
+    """
+    Vehicle source from a VEHICLE_SOURCE style string: "sim" (default),
+    "sim:<rate scale>", "canlog:<path>[@<speed>]", "vlog:<path>[@<speed>]" (a vehicle
+    log, speed 0 for as fast as possible), "udp://host:port" or "unix:///path".
+    """
+    spec = spec or "sim"
+    if spec.startswith("sim"):
+        _, _, scale = spec.partition(":")
+        return SimulatedVehicleSource(rate_scale=float(scale or 1.0))
+    if spec.startswith("canlog:"):
+        path, _, speed = spec[7:].partition("@")
+        return CanLogSource(path, speed=float(speed or 1.0), loop=True)
+    if spec.startswith("vlog:"):
+        from vehicle_log import VehicleLogSource
+        path, _, speed = spec[5:].partition("@")
+        return VehicleLogSource(path, speed=float(speed or 1.0), loop=True)
+    if spec.startswith(("udp://", "unix://")):
+        return SocketSource(spec)
+    raise ValueError(f"unknown vehicle source: {spec}")
+
+
+# --- Dispatch ---
+
+class VehicleDataBus(QObject):
+    """
+    Reads and decodes frames on a worker thread, keeping only the latest
+    value per signal. A GUI-thread timer hands tabs the signals that changed
+    since the previous tick in one signalsUpdated(dict) emit, so the UI is
+    touched at display_hz however fast frames arrive.
+    """
+    signalsUpdated = pyqtSignal(dict)  # {signal name: value}, only signals that changed
+
+    def __init__(self, source=None, decoder=None, display_hz=10, history=None, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.decoder = decoder or load_vehicle_decoder()
+        self.history = history  # Optional TelemetryStore; gets every decoded value, not just coalesced ones
+        self.recorder = None  # Optional VehicleLogWriter; gets every frame as received
+        self.values = {}  # Latest value of every signal seen (GUI thread view)
+        self.frame_count = 0
+        self.decode_errors = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._rate_base = (time.monotonic(), 0)
+        self.dispatch_timer = QTimer(self)
+        self.dispatch_timer.setInterval(int(1000 / display_hz))
+        self.dispatch_timer.timeout.connect(self.dispatch)
+
+    def start(self, source=None):
+        self.stop()
+        self.source = source or self.source
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self.source, self._stop),
+                                        name="VehicleDataBus", daemon=True)
+        self._thread.start()
+        self.dispatch_timer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        self.dispatch_timer.stop()
+
+    def _run(self, source, stop_event):
+        try:
+            self.feed(source.frames(stop_event))
+        except (OSError, ValueError) as e:
+            print(f"VehicleDataBus: Source stopped: {e}")
+
+    def feed(self, frames):
+        """
+        Records and decodes frames into the history and the pending display
+        values. The worker thread runs this over its source; replay harnesses
+        call it directly and dispatch() on log time.
+        """
+        decode = self.decoder.decode
+        lock, pending = self._lock, self._pending
+        history = self.history
+        for frame in frames:
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.append(frame)
+            try:
+                values = decode(frame)
+            except (ValueError, TypeError):
+                self.decode_errors += 1
+                continue
+            self.frame_count += 1
+            if values:
+                if history is not None:
+                    history.append_values(frame.time, values)
+                with lock:
+                    pending.update(values)
+
+    def start_recording(self, path=None):
+        """Starts logging every incoming frame to a vehicle log; returns its path."""
+        from vehicle_log import VehicleLogWriter, new_log_path
+        self.stop_recording()
+        self.recorder = VehicleLogWriter(path or new_log_path())
+        print(f"VehicleDataBus: Recording to {self.recorder.path}")
+        return self.recorder.path
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+            print(f"VehicleDataBus: Recorded {recorder.count} frames to {recorder.path}")
+
+    def dispatch(self):
+        with self._lock:
+            latest = dict(self._pending)
+            self._pending.clear()
+        changed = {name: value for name, value in latest.items() if self.values.get(name) != value}
+        if changed:
+            self.values.update(changed)
+            self.signalsUpdated.emit(changed)
+
+    def frames_per_second(self):
+        """Frame rate since the previous call."""
+        now, count = time.monotonic(), self.frame_count
+        base_time, base_count = self._rate_base
+        self._rate_base = (now, count)
+        return (count - base_count) / (now - base_time) if now > base_time else 0.0
+
+
+# --- Command Line ---
+
+def write_candump_log(path, seconds, rate_scale=1.0):
+    source = SimulatedVehicleSource(rate_scale=rate_scale, speed=0, duration_sec=seconds)
+    count = 0
+    with open(path, "w", encoding="ascii") as f:
+        for frame in source.frames(threading.Event()):
+            f.write(f"({frame.time:.6f}) vcan0 {frame.can_id:03X}#{frame.data.hex().upper()}\n")
+            count += 1
+    return count
+
+
+def send_frames(address, seconds, rate_scale=1.0):
+    """Streams simulated frames to a SocketSource address, batching one tick of frames per datagram."""
+    if address.startswith("udp://"):
+        host, _, port = address[6:].rpartition(":")
+        sock, target = socket.socket(socket.AF_INET, socket.SOCK_DGRAM), (host or "127.0.0.1", int(port))
+    else:
+        sock, target = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM), address[7:]
+    batch, last = bytearray(), None
+    for frame in SimulatedVehicleSource(rate_scale=rate_scale, duration_sec=seconds).frames(threading.Event()):
+        if frame.time != last and batch:
+            sock.sendto(batch, target)
+            batch.clear()
+        batch += SOCKETCAN_FRAME.pack(frame.can_id, len(frame.data), frame.data.ljust(8, b"\0"))
+        last = frame.time
+    if batch:
+        sock.sendto(batch, target)
+    sock.close()
+
+
+def benchmark(frame_count):
+    decoder = load_vehicle_decoder()
+    source = SimulatedVehicleSource(rate_scale=10.0, speed=0)
+    stop = threading.Event()
+    frames = []
+    for frame in source.frames(stop):
+        frames.append(frame)
+        if len(frames) >= frame_count:
+            break
+    pending, lock = {}, threading.Lock()
+    t0 = time.perf_counter()
+    for frame in frames:
+        values = decoder.decode(frame)
+        if values:
+            with lock:
+                pending.update(values)
+    elapsed = time.perf_counter() - t0
+    print(f"Decoded {len(frames)} frames in {1000 * elapsed:.0f} ms "
+          f"({len(frames) / elapsed:,.0f} frames/s, {1e6 * elapsed / len(frames):.2f} us/frame)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vehicle signal sources and decoder tools.")
+    parser.add_argument("--write-log", type=Path, help="Write a simulated candump log")
+    parser.add_argument("--send", metavar="ADDRESS", help="Stream simulated frames to udp://host:port or unix:///path")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="Multiply simulated frame rates")
+    parser.add_argument("--benchmark", type=int, metavar="FRAMES", help="Decode this many simulated frames")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return 0
+    if args.write_log:
+        count = write_candump_log(args.write_log, args.seconds, args.rate_scale)
+        print(f"Wrote {count} frames to {args.write_log}")
+        return 0
+    if args.send:
+        send_frames(args.send, args.seconds, args.rate_scale)
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+import argparse
+import bisect
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from vehicle_data import LOOP_GAP_SEC, CanFrame, SimulatedVehicleSource, parse_candump_line
+
+# --- Constants ---
+DEFAULT_LOG_DIR = Path(__file__).resolve().parent.parent / "media" / "vehicle" / "logs"
+LOG_MAGIC = b"VEHLOG01"
+INDEX_MAGIC = b"VEHIDX01"
+HEADER = struct.Struct("<8sI")              # magic, time ticks per second
+BLOCK_MARKER = b"VBLK"
+BLOCK_HEADER = struct.Struct("<4sIqqII")    # marker, frame count, first/last frame tick, compressed length, crc32
+INDEX_ENTRY = struct.Struct("<QqqI")        # block offset, first/last frame tick, frame count
+TRAILER = struct.Struct("<QI8s")            # index offset, block count, magic
+TIME_SCALE = 1000000                        # Microsecond timestamps
+BLOCK_SECONDS = 2.0
+BLOCK_MAX_FRAMES = 4096
+FSYNC_INTERVAL_SEC = 5.0
+
+BlockInfo = namedtuple("BlockInfo", "offset first_time last_time count")
+
+
+# --- Block Encoding ---
+
+def _encode_block(times, ids, payloads):
+    """
+    Column-wise block body: time deltas in ticks (uint32), ids (uint32),
+    lengths (uint8) and 8-byte payloads XORed with the previous payload of
+    the same id in the block, so signals that did not change are zeros and
+    zlib squeezes them out.
+    """
+    count = len(times)
+    ticks = np.round(np.asarray(times) * TIME_SCALE).astype(np.int64)
+    deltas = np.diff(ticks, prepend=ticks[0]).astype("<u4")
+    ids = np.asarray(ids, dtype="<u4")
+    lengths = np.fromiter((min(len(p), 8) for p in payloads), dtype=np.uint8, count=count)
+    data = np.frombuffer(b"".join(p[:8].ljust(8, b"\0") for p in payloads), dtype=np.uint8).reshape(count, 8)
+    order = np.argsort(ids, kind="stable")
+    grouped = data[order]
+    same_id = ids[order][1:] == ids[order][:-1]
+    xored = grouped.copy()
+    xored[1:][same_id] ^= grouped[:-1][same_id]
+    data = np.empty_like(xored)
+    data[order] = xored
+    body = deltas.tobytes() + ids.tobytes() + lengths.tobytes() + data.tobytes()
+    return int(ticks[0]), int(ticks[-1]), zlib.compress(body, 6)
+
+
+def _decode_block(blob, count, first_tick):
+    """(times, ids, lengths, payload rows) of one block body."""
+    body = zlib.decompress(blob)
+    if len(body) != 17 * count:
+        raise ValueError("block length mismatch")
+    deltas = np.frombuffer(body, dtype="<u4", count=count)
+    ids = np.frombuffer(body, dtype="<u4", count=count, offset=4 * count)
+    lengths = np.frombuffer(body, dtype=np.uint8, count=count, offset=8 * count)
+    xored = np.frombuffer(body, dtype=np.uint8, count=8 * count, offset=9 * count).reshape(count, 8)
+    times = (first_tick + np.cumsum(deltas, dtype=np.int64)) / TIME_SCALE
+    order = np.argsort(ids, kind="stable")
+    grouped = xored[order]
+    group_starts = np.flatnonzero(np.diff(ids[order], prepend=-1))
+    for start, end in zip(group_starts, np.append(group_starts[1:], count)):
+        grouped[start:end] = np.bitwise_xor.accumulate(grouped[start:end], axis=0)
+    data = np.empty_like(grouped)
+    data[order] = grouped
+    return times, ids, lengths, data
+
+
+# --- Writer ---
+
+class VehicleLogWriter:
+    """
+    Append-only log of raw CAN frames. Frames are gathered into blocks of up
+    to BLOCK_SECONDS (or BLOCK_MAX_FRAMES), each encoded column-wise, zlib
+    compressed and written with a CRC, at about 1-2 bytes per frame. Blocks
+    are fsynced every fsync_interval seconds; close() appends an index of
+    the blocks so readers can seek by time. A log cut short by a crash has
+    no index and is re-indexed from the block headers when read.
+
+    append() runs on the vehicle data bus worker while close() comes from
+    the GUI thread, so both take the writer's lock.
+    """
+
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL_SEC):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.file = open(self.path, "wb")
+        self.file.write(HEADER.pack(LOG_MAGIC, TIME_SCALE))
+        self.index = []
+        self.count = 0
+        self._times, self._ids, self._payloads = [], [], []
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def append(self, frame):
+        with self._lock:
+            if self.file is None:
+                return
+            times = self._times
+            if times and (frame.time - times[0] >= BLOCK_SECONDS or frame.time < times[-1]
+                          or len(times) >= BLOCK_MAX_FRAMES):
+                self._write_block()
+            self._times.append(frame.time)
+            self._ids.append(frame.can_id)
+            self._payloads.append(frame.data)
+            self.count += 1
+
+    def _write_block(self):
+        first_tick, last_tick, blob = _encode_block(self._times, self._ids, self._payloads)
+        offset = self.file.tell()
+        self.file.write(BLOCK_HEADER.pack(BLOCK_MARKER, len(self._times), first_tick, last_tick, len(blob),
+                                          zlib.crc32(blob)))
+        self.file.write(blob)
+        self.index.append((offset, first_tick, last_tick, len(self._times)))
+        self._times, self._ids, self._payloads = [], [], []
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self.file is None:
+                return
+            if self._times:
+                self._write_block()
+            index_offset = self.file.tell()
+            for entry in self.index:
+                self.file.write(INDEX_ENTRY.pack(*entry))
+            self.file.write(TRAILER.pack(index_offset, len(self.index), INDEX_MAGIC))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+
+# --- Reader ---
+
+class VehicleLogReader:
+    """Block index and decoding of a vehicle log; `recovered` is set when the index had to be rebuilt."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.recovered = False
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size or header[:8] != LOG_MAGIC:
+                raise ValueError(f"not a vehicle log: {self.path}")
+            self.time_scale = HEADER.unpack(header)[1]
+            self.blocks_info = self._read_index(f)
+            if self.blocks_info is None:
+                self.recovered = True
+                self.blocks_info = self._scan_blocks(f)
+        self._first_times = [block.first_time for block in self.blocks_info]
+
+    def _read_index(self, f):
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER.size + TRAILER.size:
+            return None
+        f.seek(size - TRAILER.size)
+        index_offset, block_count, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != INDEX_MAGIC or index_offset + block_count * INDEX_ENTRY.size != size - TRAILER.size:
+            return None
+        f.seek(index_offset)
+        data = f.read(block_count * INDEX_ENTRY.size)
+        return [self._block_info(*INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size)) for i in range(block_count)]
+
+    def _scan_blocks(self, f):
+        """Walks the block headers after a crash; stops at the first torn or damaged block."""
+        blocks = []
+        offset = HEADER.size
+        while True:
+            f.seek(offset)
+            header = f.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                break
+            marker, count, first_tick, last_tick, length, crc = BLOCK_HEADER.unpack(header)
+            blob = f.read(length)
+            if marker != BLOCK_MARKER or len(blob) < length or zlib.crc32(blob) != crc:
+                break
+            blocks.append(self._block_info(offset, first_tick, last_tick, count))
+            offset += BLOCK_HEADER.size + length
+        return blocks
+
+    def _block_info(self, offset, first_tick, last_tick, count):
+        return BlockInfo(offset, first_tick / self.time_scale, last_tick / self.time_scale, count)
+
+    @property
+    def frame_count(self):
+        return sum(block.count for block in self.blocks_info)
+
+    @property
+    def start_time(self):
+        return self.blocks_info[0].first_time if self.blocks_info else None
+
+    @property
+    def end_time(self):
+        return self.blocks_info[-1].last_time if self.blocks_info else None
+
+    def blocks(self, start_time=None):
+        """
+        Yields (times, ids, lengths, payload rows) NumPy arrays per block, from
+        the block holding start_time on (seeking through the index).
+        """
+        first = 0
+        if start_time is not None:
+            first = max(0, bisect.bisect_right(self._first_times, start_time) - 1)
+        with open(self.path, "rb") as f:
+            for block in self.blocks_info[first:]:
+                f.seek(block.offset)
+                marker, count, first_tick, _, length, crc = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+                blob = f.read(length)
+                if marker != BLOCK_MARKER or zlib.crc32(blob) != crc:
+                    print(f"Warning: Damaged block at offset {block.offset} in {self.path}, stopping there")
+                    return
+                times, ids, lengths, data = _decode_block(blob, count, first_tick)
+                if start_time is not None and times[0] < start_time:
+                    keep = np.searchsorted(times, start_time)
+                    times, ids, lengths, data = times[keep:], ids[keep:], lengths[keep:], data[keep:]
+                yield times, ids, lengths, data
+
+    def frames(self, start_time=None):
+        for times, ids, lengths, data in self.blocks(start_time):
+            rows = data.tobytes()
+            for i, (t, can_id, length) in enumerate(zip(times.tolist(), ids.tolist(), lengths.tolist())):
+                yield CanFrame(t, can_id, rows[8 * i:8 * i + length])
+
+
+class VehicleLogSource:
+    """
+    Replays a vehicle log, paced by its timestamps divided by speed (0: as
+    fast as possible). When looping, each lap is shifted to follow the
+    previous one, so frame times keep going forward.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, start_time=None):
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+        self.start_time = start_time
+
+    def frames(self, stop_event):
+        offset, first_time, last_time = 0.0, None, None
+        while not stop_event.is_set():
+            started = None
+            for frame in VehicleLogReader(self.path).frames(self.start_time):
+                if first_time is None:
+                    first_time = frame.time
+                if offset:
+                    frame = frame._replace(time=frame.time + offset)
+                last_time = frame.time
+                if self.speed > 0:
+                    if started is None:
+                        started = (time.monotonic(), frame.time)
+                    delay = started[0] + (frame.time - started[1]) / self.speed - time.monotonic()
+                    if delay > 0 and stop_event.wait(delay):
+                        return
+                elif stop_event.is_set():
+                    return
+                yield frame
+            if not self.loop or last_time is None:
+                return
+            offset = last_time + LOOP_GAP_SEC - first_time
+
+
+def new_log_path(log_dir=DEFAULT_LOG_DIR):
+    return Path(log_dir) / f"drive_{datetime.now().strftime('%Y%m%d_%H%M%S')}.vlog"
+
+
+# --- Command Line ---
+
+def log_info(path):
+    reader = VehicleLogReader(path)
+    size = Path(path).stat().st_size
+    count = reader.frame_count
+    if not count:
+        return f"{path}: empty ({size} bytes)"
+    return (f"{path}: {count} frames, {(reader.end_time - reader.start_time) / 60:.1f} min, "
+            f"{len(reader.blocks_info)} blocks, {size} bytes ({size / count:.2f} bytes/frame)"
+            + (", index rebuilt (log was not closed)" if reader.recovered else ""))
+
+
+def write_log(path, frames):
+    writer = VehicleLogWriter(path)
+    for frame in frames:
+        writer.append(frame)
+    writer.close()
+    return writer.count
+
+
+def candump_frames(path):
+    with open(path, "r", encoding="ascii", errors="replace") as f:
+        for line in f:
+            frame = parse_candump_line(line)
+            if frame is not None:
+                yield frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write, convert and inspect vehicle logs.")
+    parser.add_argument("--simulate", type=float, metavar="SECONDS", help="Record a simulated drive of this length")
+    parser.add_argument("--from-candump", type=Path, help="Convert a candump -L log")
+    parser.add_argument("--out", type=Path, help="Output log (default: a new file in the log folder)")
+    parser.add_argument("--info", type=Path, help="Print a summary of a vehicle log")
+    args = parser.parse_args(argv)
+
+    if args.info:
+        print(log_info(args.info))
+        return 0
+    if args.simulate or args.from_candump:
+        frames = candump_frames(args.from_candump) if args.from_candump else \
+            SimulatedVehicleSource(speed=0, duration_sec=args.simulate).frames(threading.Event())
+        out = args.out or new_log_path()
+        t0 = time.perf_counter()
+        count = write_log(out, frames)
+        print(f"Wrote {count} frames in {time.perf_counter() - t0:.1f} s")
+        print(log_info(out))
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())